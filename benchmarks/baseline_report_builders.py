@@ -0,0 +1,378 @@
+"""The three PDF builders as they were before report_templates.py, for bench_report_render.py.
+
+Each call builds its own stylesheet, paragraph styles and table styles inline.
+Kept byte-for-byte apart from the imports so the benchmark has a baseline to
+compare the shared-template builders against.
+"""
+import io
+from datetime import datetime
+
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+from utils import safe_get, safe_float, safe_str, safe_int, format_ngn, safe_bool
+
+def _build_maintenance_pdf(request, invoice):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, 
+                           topMargin=72, bottomMargin=18)
+    
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#1e3a8a')
+    )
+    
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        spaceAfter=12,
+        textColor=colors.HexColor('#3b82f6')
+    )
+    
+    normal_style = ParagraphStyle(
+        'Normal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=6
+    )
+    
+    # Story container for PDF elements
+    story = []
+    
+    # Title
+    story.append(Paragraph("MAINTENANCE JOB COMPLETION REPORT", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Job Details
+    story.append(Paragraph("Job Details", heading_style))
+    
+    job_data = [
+        ["Job ID:", str(safe_get(request, 'id', ''))],
+        ["Title:", safe_str(safe_get(request, 'title', ''))],
+        ["Location:", safe_str(safe_get(request, 'location', 'N/A'))],
+        ["Facility Type:", safe_str(safe_get(request, 'facility_type', ''))],
+        ["Priority:", safe_str(safe_get(request, 'priority', ''))],
+        ["Created By:", safe_str(safe_get(request, 'created_by', ''))],
+        ["Created Date:", safe_str(safe_get(request, 'created_date', ''))],
+        ["Assigned Vendor:", safe_str(safe_get(request, 'assigned_vendor', 'N/A'))],
+        ["Status:", safe_str(safe_get(request, 'status', ''))],
+        ["Completed Date:", safe_str(safe_get(request, 'completed_date', 'N/A'))]
+    ]
+    
+    job_table = Table(job_data, colWidths=[2*inch, 4*inch])
+    job_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    
+    story.append(job_table)
+    story.append(Spacer(1, 20))
+    
+    # Description
+    story.append(Paragraph("Job Description", heading_style))
+    story.append(Paragraph(safe_str(safe_get(request, 'description', '')), normal_style))
+    story.append(Spacer(1, 20))
+    
+    # Completion Notes
+    if safe_get(request, 'completion_notes'):
+        story.append(Paragraph("Completion Notes", heading_style))
+        story.append(Paragraph(safe_str(safe_get(request, 'completion_notes', '')), normal_style))
+        story.append(Spacer(1, 20))
+    
+    # Job Breakdown
+    if safe_get(request, 'job_breakdown'):
+        story.append(Paragraph("Job Breakdown", heading_style))
+        story.append(Paragraph(safe_str(safe_get(request, 'job_breakdown', '')), normal_style))
+        story.append(Spacer(1, 20))
+    
+    # Invoice Details
+    if invoice:
+        invoice = invoice[0]
+        story.append(Paragraph("Invoice Details", heading_style))
+        
+        invoice_data = [
+            ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
+            ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
+            ["Details of Work:", safe_str(safe_get(invoice, 'details_of_work', ''))],
+            ["Quantity:", str(safe_int(safe_get(invoice, 'quantity', 0)))],
+            ["Unit Cost:", format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0)))],
+            ["Material Cost:", format_ngn(safe_float(safe_get(invoice, 'amount', 0)))],
+            ["Labour Charges:", format_ngn(safe_float(safe_get(invoice, 'labour_charge', 0)))],
+            ["VAT Amount:", format_ngn(safe_float(safe_get(invoice, 'vat_amount', 0)))],
+            ["Total Amount:", format_ngn(safe_float(safe_get(invoice, 'total_amount', 0)))],
+            ["Invoice Status:", safe_str(safe_get(invoice, 'status', ''))]
+        ]
+        
+        invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
+        invoice_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+        ]))
+        
+        story.append(invoice_table)
+        story.append(Spacer(1, 20))
+    
+    # Approval Status
+    story.append(Paragraph("Approval Status", heading_style))
+    
+    approval_data = [
+        ["Department Approval:", "Approved" if safe_bool(safe_get(request, 'requesting_dept_approval')) else "Pending"],
+        ["Department Approval Date:", safe_str(safe_get(request, 'department_approval_date', 'N/A'))],
+        ["Manager Approval:", "Approved" if safe_bool(safe_get(request, 'facilities_manager_approval')) else "Pending"],
+        ["Manager Approval Date:", safe_str(safe_get(request, 'manager_approval_date', 'N/A'))]
+    ]
+    
+    approval_table = Table(approval_data, colWidths=[2*inch, 4*inch])
+    approval_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    
+    story.append(approval_table)
+    
+    # Footer
+    story.append(Spacer(1, 40))
+    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
+    story.append(Paragraph("A-Z Facilities Management Pro APP™", normal_style))
+    
+    # Build PDF
+    doc.build(story)
+    
+    return buffer.getvalue()
+
+def create_ppm_pdf_report(schedule_id):
+    """Create PDF report for PPM completion"""
+    # Get schedule details
+    schedule = execute_query('SELECT * FROM ppm_schedules WHERE id = ?', (schedule_id,))
+    if not schedule:
+        return None
+    schedule = schedule[0]
+    
+    # Get assignment details
+    assignment = execute_query('SELECT * FROM ppm_assignments WHERE schedule_id = ?', (schedule_id,))
+    
+    return cached_pdf('ppm', schedule_id, (schedule, assignment),
+                      lambda: _build_ppm_pdf(schedule, assignment))
+
+def _build_ppm_pdf(schedule, assignment):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    styles = getSampleStyleSheet()
+    
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        textColor=colors.HexColor('#1e3a8a')
+    )
+    
+    story = []
+    
+    # Title
+    story.append(Paragraph("PPM COMPLETION REPORT", title_style))
+    story.append(Spacer(1, 20))
+    
+    # Schedule Details
+    story.append(Paragraph("PPM Schedule Details", styles['Heading2']))
+    
+    schedule_data = [
+        ["Schedule ID:", str(safe_get(schedule, 'id', ''))],
+        ["Schedule Name:", safe_str(safe_get(schedule, 'schedule_name', ''))],
+        ["Facility Category:", safe_str(safe_get(schedule, 'facility_category', ''))],
+        ["Sub-Category:", safe_str(safe_get(schedule, 'sub_category', ''))],
+        ["Frequency:", safe_str(safe_get(schedule, 'frequency', ''))],
+        ["Next Maintenance Date:", safe_str(safe_get(schedule, 'next_maintenance_date', ''))],
+        ["Status:", safe_str(safe_get(schedule, 'status', ''))],
+        ["Assigned Vendor:", safe_str(safe_get(schedule, 'assigned_vendor', 'N/A'))],
+        ["Created By:", safe_str(safe_get(schedule, 'created_by', ''))],
+        ["Estimated Cost:", format_ngn(safe_float(safe_get(schedule, 'estimated_cost', 0)))],
+        ["Actual Completion Date:", safe_str(safe_get(schedule, 'actual_completion_date', 'N/A'))],
+        ["Actual Cost:", format_ngn(safe_float(safe_get(schedule, 'actual_cost', 0))) if safe_get(schedule, 'actual_cost') else "N/A"]
+    ]
+    
+    schedule_table = Table(schedule_data, colWidths=[2*inch, 4*inch])
+    schedule_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+    ]))
+    
+    story.append(schedule_table)
+    story.append(Spacer(1, 20))
+    
+    # Description
+    story.append(Paragraph("Description", styles['Heading2']))
+    story.append(Paragraph(safe_str(safe_get(schedule, 'description', '')), styles['Normal']))
+    
+    # Notes
+    if safe_get(schedule, 'notes'):
+        story.append(Spacer(1, 10))
+        story.append(Paragraph("Notes", styles['Heading2']))
+        story.append(Paragraph(safe_str(safe_get(schedule, 'notes', '')), styles['Normal']))
+    
+    # Assignment Details
+    if assignment:
+        assignment = assignment[0]
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Assignment Details", styles['Heading2']))
+        
+        assign_data = [
+            ["Assigned To:", safe_str(safe_get(assignment, 'vendor_username', ''))],
+            ["Assigned Date:", safe_str(safe_get(assignment, 'assigned_date', ''))],
+            ["Due Date:", safe_str(safe_get(assignment, 'due_date', ''))],
+            ["Completed Date:", safe_str(safe_get(assignment, 'completed_date', 'N/A'))],
+            ["Status:", safe_str(safe_get(assignment, 'status', ''))]
+        ]
+        
+        assign_table = Table(assign_data, colWidths=[2*inch, 4*inch])
+        story.append(assign_table)
+        
+        if safe_get(assignment, 'completion_notes'):
+            story.append(Spacer(1, 10))
+            story.append(Paragraph("Completion Notes", styles['Heading2']))
+            story.append(Paragraph(safe_str(safe_get(assignment, 'completion_notes', '')), styles['Normal']))
+    
+    # Approval Status
+    story.append(Spacer(1, 20))
+    story.append(Paragraph("Approval Status", styles['Heading2']))
+    
+    approval_data = [
+        ["User Approved:", "Yes" if safe_bool(safe_get(schedule, 'user_approved')) else "No"],
+        ["Manager Approved:", "Yes" if safe_bool(safe_get(schedule, 'manager_approved')) else "No"]
+    ]
+    
+    approval_table = Table(approval_data, colWidths=[2*inch, 4*inch])
+    story.append(approval_table)
+    
+    # Footer
+    story.append(Spacer(1, 40))
+    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
+    story.append(Paragraph("A-Z Facilities Management Pro APP™", styles['Normal']))
+    
+    doc.build(story)
+    return buffer.getvalue()
+
+def create_invoice_pdf(invoice_id):
+    """Create PDF invoice"""
+    # Get invoice details
+    invoice = execute_query('SELECT * FROM invoices WHERE id = ?', (invoice_id,))
+    if not invoice:
+        return None
+    invoice = invoice[0]
+    
+    # Get request details
+    request = execute_query('SELECT * FROM maintenance_requests WHERE id = ?', (invoice['request_id'],))
+    
+    return cached_pdf('invoice', invoice_id, (invoice, request),
+                      lambda: _build_invoice_pdf(invoice, request))
+
+def _build_invoice_pdf(invoice, request):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    
+    story = []
+    styles = getSampleStyleSheet()
+    
+    # Header
+    story.append(Paragraph("INVOICE", styles['Title']))
+    story.append(Spacer(1, 20))
+    
+    # Invoice Details
+    story.append(Paragraph("Invoice Details", styles['Heading2']))
+    
+    invoice_details = [
+        ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
+        ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
+        ["Vendor:", safe_str(safe_get(invoice, 'vendor_username', ''))],
+        ["Status:", safe_str(safe_get(invoice, 'status', ''))]
+    ]
+    
+    if request:
+        request = request[0]
+        invoice_details.append(["Job Title:", safe_str(safe_get(request, 'title', ''))])
+        invoice_details.append(["Location:", safe_str(safe_get(request, 'location', 'N/A'))])
+    
+    inv_table = Table(invoice_details, colWidths=[2*inch, 4*inch])
+    story.append(inv_table)
+    story.append(Spacer(1, 20))
+    
+    # Work Details
+    story.append(Paragraph("Work Details", styles['Heading2']))
+    story.append(Paragraph(safe_str(safe_get(invoice, 'details_of_work', '')), styles['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Cost Breakdown
+    story.append(Paragraph("Cost Breakdown", styles['Heading2']))
+    
+    amount = safe_float(safe_get(invoice, 'amount', 0))
+    labour_charge = safe_float(safe_get(invoice, 'labour_charge', 0))
+    vat_amount = safe_float(safe_get(invoice, 'vat_amount', 0))
+    total_amount = safe_float(safe_get(invoice, 'total_amount', 0))
+    
+    cost_data = [
+        ["Description", "Quantity", "Unit Cost", "Amount"],
+        ["Materials", str(safe_int(safe_get(invoice, 'quantity', 0))), format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0))), format_ngn(amount)],
+        ["Labour Charges", "1", format_ngn(labour_charge), format_ngn(labour_charge)],
+        ["Subtotal", "", "", format_ngn(amount + labour_charge)],
+        ["VAT (7.5%)" if safe_bool(safe_get(invoice, 'vat_applicable')) else "VAT", "", "", format_ngn(vat_amount)],
+        ["TOTAL", "", "", format_ngn(total_amount)]
+    ]
+    
+    cost_table = Table(cost_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
+    cost_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f1f5f9')),
+    ]))
+    
+    story.append(cost_table)
+    
+    # Footer
+    story.append(Spacer(1, 40))
+    story.append(Paragraph("Thank you for your business!", styles['Normal']))
+    story.append(Paragraph("A-Z Facilities Management Pro APP™", styles['Normal']))
+    
+    doc.build(story)
+    return buffer.getvalue()
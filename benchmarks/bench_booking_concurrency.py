@@ -0,0 +1,97 @@
+"""Concurrent writers booking the same rooms: separate check and insert vs space.book_room.
+
+Every writer thread books random half-hour-aligned slots in a handful of rooms,
+so most attempts collide. Afterwards the live bookings are self-joined to count
+overlapping pairs, which must be zero for space.book_room.
+
+Run from the repository root:  python benchmarks/bench_booking_concurrency.py [writers]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as clock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+import space
+
+WRITERS = 8
+ATTEMPTS = 200
+ROOMS = ['Conference Room A', 'Board Room', 'Training Room']
+DAYS = [date(2024, 1, day) for day in range(1, 6)]
+
+def attempts(seed):
+    rng = random.Random(seed)
+    for _ in range(ATTEMPTS):
+        start = rng.randrange(16, 36)
+        length = rng.choice([1, 2, 3, 4])
+        yield (rng.randrange(len(ROOMS)) + 1, rng.choice(DAYS),
+               clock(start // 2, 30 * (start % 2)), clock((start + length) // 2, 30 * ((start + length) % 2)))
+
+def legacy_book(room_id, booking_date, start_time, end_time):
+    # Check and insert as separate statements, as show_room_booking did
+    if space.find_booking_conflicts(room_id, booking_date, start_time, end_time):
+        return False
+    return db.execute_update(
+        '''INSERT INTO room_bookings (room_id, room_name, room_type, booking_date, start_time, end_time,
+        booked_by, purpose) VALUES (?, ?, 'Conference Room', ?, ?, ?, 'bench', 'bench')''',
+        (room_id, ROOMS[room_id - 1], booking_date.strftime('%Y-%m-%d'),
+         start_time.strftime('%H:%M'), end_time.strftime('%H:%M'))
+    )
+
+def engine_book(room_id, booking_date, start_time, end_time):
+    booking_id, _ = space.book_room(room_id, booking_date, start_time, end_time, 'bench', 'bench')
+    return booking_id is not None
+
+def overlapping_pairs():
+    rows = db.execute_query('''
+        SELECT COUNT(*) as count FROM room_bookings a
+        JOIN room_bookings b ON b.room_id = a.room_id AND b.booking_date = a.booking_date
+        AND b.id > a.id AND b.start_minute < a.end_minute AND b.end_minute > a.start_minute
+        WHERE a.status != 'Cancelled' AND b.status != 'Cancelled'
+    ''')
+    return rows[0]['count']
+
+def run(label, book, writers):
+    db.execute_update('DELETE FROM room_bookings')
+    booked = [0] * writers
+    
+    def writer(index):
+        for slot in attempts(index):
+            if book(*slot):
+                booked[index] += 1
+    
+    threads = [threading.Thread(target=writer, args=(index,)) for index in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    total = writers * ATTEMPTS
+    print(f"{label:<22} {total / elapsed:>8,.0f} attempts/sec  {sum(booked):>5} booked  "
+          f"{overlapping_pairs():>4} overlapping pairs")
+
+def main():
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else WRITERS
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'bench.db'))
+        migrations.migrate()
+        db.set_query_cache(False)
+        db.executemany('INSERT INTO rooms (id, room_name, room_type) VALUES (?, ?, ?)',
+                       [(index + 1, name, 'Conference Room') for index, name in enumerate(ROOMS)])
+        
+        print(f"{writers} writers x {ATTEMPTS} attempts, {len(ROOMS)} rooms, {len(DAYS)} days")
+        run('check, then insert', legacy_book, writers)
+        run('space.book_room', engine_book, writers)
+        
+        db.close_pool()
+
+if __name__ == '__main__':
+    main()
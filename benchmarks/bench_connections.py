@@ -0,0 +1,87 @@
+"""Queries/sec through a fresh connection per call vs the pooled data layer.
+
+The pooled figure is measured with the read cache off, so it reflects the
+connection reuse alone; the cached figure is printed separately.
+
+Run from the repository root:  python benchmarks/bench_connections.py
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+
+ROWS = 20000
+QUERIES = 5000
+VENDORS = ['hvac_vendor', 'generator_vendor', 'fixture_vendor', 'building_vendor', 'plumbing_vendor']
+STATUSES = ['Pending', 'Assigned', 'Completed', 'Approved']
+
+def seed(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE maintenance_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            status TEXT DEFAULT 'Pending',
+            created_by TEXT NOT NULL,
+            assigned_vendor TEXT,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    random.seed(42)
+    conn.executemany(
+        'INSERT INTO maintenance_requests (title, status, created_by, assigned_vendor) VALUES (?, ?, ?, ?)',
+        [(f'Job {i}', random.choice(STATUSES), 'facility_user', random.choice(VENDORS)) for i in range(ROWS)]
+    )
+    conn.commit()
+    conn.close()
+
+def workload():
+    random.seed(7)
+    for _ in range(QUERIES):
+        if random.random() < 0.5:
+            yield 'SELECT * FROM maintenance_requests WHERE id = ?', (random.randint(1, ROWS),)
+        else:
+            yield ('SELECT COUNT(*) as count FROM maintenance_requests WHERE assigned_vendor = ? AND status = ?',
+                   (random.choice(VENDORS), random.choice(STATUSES)))
+
+def legacy_query(path, query, params):
+    # What execute_query did before: connect, run, close on every call
+    conn = sqlite3.connect(path, check_same_thread=False)
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    columns = [column[0] for column in cursor.description]
+    rows = cursor.fetchall()
+    conn.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+def run(label, fn):
+    start = time.perf_counter()
+    for query, params in workload():
+        fn(query, params)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {QUERIES / elapsed:>10,.0f} queries/sec")
+    return elapsed
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(path)
+        db.configure(path)
+        
+        before = run('connect per query', lambda q, p: legacy_query(path, q, p))
+        db.set_query_cache(False)
+        after = run('pooled, cache off', db.execute_query)
+        db.set_query_cache(True)
+        cached = run('pooled, cache on', db.execute_query)
+        print(f"pooling speedup: {before / after:.1f}x  (with the read cache: {before / cached:.1f}x)")
+        
+        db.close_pool()
+
+if __name__ == '__main__':
+    main()
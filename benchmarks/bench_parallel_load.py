@@ -0,0 +1,93 @@
+"""Wall-clock time to load the dashboard datasets one after another vs db.load_parallel.
+
+Run from the repository root:  python benchmarks/bench_parallel_load.py [rows]
+
+The worker count defaults to the CPU count (at most 4); set FM_LOAD_WORKERS
+to force the thread pool on a single CPU.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+
+ROWS = 100000
+ROUNDS = 5
+STATUSES = ['Pending', 'Assigned', 'Completed', 'Approved']
+
+DATASETS = {
+    'maintenance_requests': ('SELECT id, status, priority, created_date FROM maintenance_requests',
+                             {'created_date': 'datetime64[ns]'}),
+    'ppm_schedules': ('SELECT id, status, assigned_vendor, estimated_cost FROM ppm_schedules',
+                      {'estimated_cost': 'float64'}),
+    'generator_records': ('SELECT generator_type, net_hours, net_diesel_consumed FROM generator_records',
+                          {'net_hours': 'float64', 'net_diesel_consumed': 'float64'}),
+}
+
+def seed(rows):
+    random.seed(42)
+    with db.transaction():
+        db.executemany(
+            '''INSERT INTO maintenance_requests (title, description, location, facility_type, priority,
+            created_by, status, created_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            [(f'Job {i}', 'Bench', 'Block A', 'HVAC', random.choice(['Low', 'Medium', 'High']),
+              'facility_user', random.choice(STATUSES), f'2024-{random.randint(1, 12):02d}-15 09:00:00')
+             for i in range(rows)]
+        )
+        db.executemany(
+            '''INSERT INTO ppm_schedules (schedule_name, facility_category, sub_category, frequency,
+            next_maintenance_date, status, assigned_vendor, created_by, estimated_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            [(f'PPM {i}', 'HVAC', 'Servicing', 'Monthly', '2024-06-01', random.choice(STATUSES),
+              'hvac_vendor', 'facility_user', random.uniform(1000, 50000)) for i in range(rows)]
+        )
+        db.executemany(
+            '''INSERT INTO generator_records (record_date, generator_type, opening_hours, closing_hours,
+            net_hours, opening_inventory_liters, purchase_liters, closing_inventory_liters,
+            net_diesel_consumed, recorded_by) VALUES (?, ?, 0, ?, ?, 500, 0, ?, ?, 'facility_user')''',
+            [(f'2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}', 'Standby Generator',
+              hours, hours, 500 - hours * 5, hours * 5) for hours in (random.uniform(1, 10) for _ in range(rows))]
+        )
+
+def loaders():
+    return {name: (lambda query=query, dtypes=dtypes: db.execute_query_df(query, dtypes=dtypes))
+            for name, (query, dtypes) in DATASETS.items()}
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'bench.db'))
+        migrations.migrate()
+        seed(rows)
+        # Measure the reads themselves, not cache hits
+        db.set_query_cache(False)
+        
+        serial = []
+        parallel = []
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for load in loaders().values():
+                load()
+            serial.append(time.perf_counter() - start)
+            
+            start = time.perf_counter()
+            db.load_parallel(loaders(), label='bench')
+            parallel.append(time.perf_counter() - start)
+        
+        timing = db.load_timings()['bench']
+        for name, elapsed in timing['datasets'].items():
+            print(f"{name:<22} {elapsed:>8.1f} ms")
+        print(f"{'one after another':<22} {min(serial) * 1000:>8.1f} ms")
+        print(f"{'load_parallel':<22} {min(parallel) * 1000:>8.1f} ms "
+              f"({db.LOAD_MAX_WORKERS} workers, {os.cpu_count()} CPUs)")
+        print(f"speedup: {min(serial) / min(parallel):.2f}x")
+        
+        db.close_pool()
+
+if __name__ == '__main__':
+    main()
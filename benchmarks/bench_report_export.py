@@ -0,0 +1,63 @@
+"""Reports/sec for a bulk ZIP export rendered in process vs on a process pool.
+
+Each run starts with an empty report cache so every PDF is rendered. The
+export is job reports plus their invoices, so it holds twice [reports] PDFs.
+
+Run from the repository root:  python benchmarks/bench_report_export.py [reports] [workers]
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+import reports
+
+JOBS = 300
+
+def seed(count):
+    rows = [
+        (f'Job {i}', 'Replace faulty fittings and test the circuit', 'Block A', 'Electrical',
+         'High', 'facility_user', 'fixture_vendor', 'Completed', '2024-03-15 10:00:00', 'Done')
+        for i in range(count)
+    ]
+    db.executemany(
+        '''INSERT INTO maintenance_requests 
+        (title, description, location, facility_type, priority, created_by, 
+         assigned_vendor, status, completed_date, completion_notes) 
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        rows
+    )
+    db.executemany(
+        '''INSERT INTO invoices 
+        (invoice_number, request_id, vendor_username, invoice_date, details_of_work, 
+         quantity, unit_cost, amount, labour_charge, vat_applicable, vat_amount, total_amount) 
+        VALUES (?, ?, 'fixture_vendor', '2024-03-16', 'Fittings', 2, 5000, 10000, 4000, 1, 1050, 15050)''',
+        [(f'INV-{i}', i) for i in range(1, count + 1)]
+    )
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else JOBS
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'bench.db'))
+        migrations.migrate()
+        seed(count)
+        items = [('job', i) for i in range(1, count + 1)] + [('invoice', i) for i in range(1, count + 1)]
+        
+        runs = [('in process', 1), (f'{workers} processes', workers), ('default', None)]
+        for label, pool_size in runs:
+            reports.REPORT_CACHE_DIR = os.path.join(tmp, f'cache_{label}')
+            result = reports.export_reports_zip(items, os.path.join(tmp, f'export_{label}.zip'),
+                                                workers=pool_size)
+            print(f"{label:<12} {result['reports']:>6} reports in {result['seconds']:6.1f}s "
+                  f"{result['reports_per_sec']:>8.1f} reports/sec ({result['workers']} worker(s), "
+                  f"{os.cpu_count()} CPUs)")
+        
+        db.close_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Per-report render time for the three PDF builders, bypassing the disk cache.
+
+Each builder is timed with the shared report_templates styles and with the
+inline per-report styles it used before (baseline_report_builders.py).
+
+Run from the repository root:  python benchmarks/bench_report_render.py [reports]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import baseline_report_builders as baseline
+import reports
+
+REPORTS = 1000
+
+# The two paths take turns in rounds so drift in machine load hits both alike;
+# the fastest round of each is reported
+ROUNDS = 5
+
+REQUEST = {
+    'id': 42, 'title': 'Replace faulty fittings', 'location': 'Block A', 'facility_type': 'Electrical',
+    'priority': 'High', 'created_by': 'facility_user', 'created_date': '2024-03-01 09:00:00',
+    'assigned_vendor': 'fixture_vendor', 'status': 'Approved', 'completed_date': '2024-03-15 10:00:00',
+    'description': 'Two fittings in the corridor flicker and trip the breaker.',
+    'completion_notes': 'Replaced both fittings and tested the circuit.', 'job_breakdown': 'Fittings, labour',
+    'requesting_dept_approval': 1, 'department_approval_date': '2024-03-16 08:00:00',
+    'facilities_manager_approval': 1, 'manager_approval_date': '2024-03-17 08:00:00',
+}
+INVOICE = {
+    'id': 7, 'invoice_number': 'INV-20240316-0042', 'request_id': 42, 'vendor_username': 'fixture_vendor',
+    'invoice_date': '2024-03-16', 'details_of_work': 'Fittings', 'quantity': 2, 'unit_cost': 5000,
+    'amount': 10000, 'labour_charge': 4000, 'vat_applicable': 1, 'vat_amount': 1050,
+    'total_amount': 15050, 'status': 'Approved',
+}
+SCHEDULE = {
+    'id': 3, 'schedule_name': 'Generator service', 'facility_category': 'Generator',
+    'sub_category': 'Servicing', 'frequency': 'Monthly', 'next_maintenance_date': '2024-04-01',
+    'status': 'Completed', 'assigned_vendor': 'generator_vendor', 'created_by': 'facility_user',
+    'estimated_cost': 50000, 'actual_completion_date': '2024-03-02', 'actual_cost': 48000,
+    'description': 'Oil, filters and load test.', 'notes': 'All within limits.',
+    'user_approved': 1, 'manager_approved': 0,
+}
+ASSIGNMENT = {
+    'vendor_username': 'generator_vendor', 'assigned_date': '2024-02-25', 'due_date': '2024-03-05',
+    'completed_date': '2024-03-02', 'status': 'Completed', 'completion_notes': 'Serviced.',
+}
+
+def builders(module):
+    return [
+        ('maintenance', lambda: module._build_maintenance_pdf(REQUEST, [INVOICE])),
+        ('ppm', lambda: module._build_ppm_pdf(SCHEDULE, [ASSIGNMENT])),
+        ('invoice', lambda: module._build_invoice_pdf(INVOICE, [REQUEST])),
+    ]
+
+def per_report_ms(build, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        build()
+    return (time.perf_counter() - start) / count * 1000
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else REPORTS
+    print(f"{'':<12} {'inline styles':>14} {'shared':>10}   over {count:,} reports each")
+    for (label, inline), (_, shared) in zip(builders(baseline), builders(reports)):
+        inline()  # warm up imports and font metrics
+        shared()
+        per_round = max(count // ROUNDS, 1)
+        inline_ms = shared_ms = float('inf')
+        for _ in range(ROUNDS):
+            inline_ms = min(inline_ms, per_report_ms(inline, per_round))
+            shared_ms = min(shared_ms, per_report_ms(shared, per_round))
+        print(f"{label:<12} {inline_ms:>11.2f} ms {shared_ms:>7.2f} ms   {inline_ms / shared_ms:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Fail if the fuel anomaly detector misses, or invents, a consumption-rate anomaly.
+
+Each case is a run of daily records for one generator; the last record's
+litres per hour must be flagged exactly when the case expects it.
+
+Run from the repository root:  python benchmarks/check_fuel_anomalies.py
+"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generator_analytics
+
+# (description, (hours, litres) per day, whether the last day is flagged)
+CASES = [
+    ('spike after identical days', [(10, 50)] * 50 + [(10, 200)], True),
+    ('drop after identical days', [(10, 50)] * 50 + [(10, 10)], True),
+    ('repeat of identical days', [(10, 50)] * 51, False),
+    ('small change after identical days', [(10, 50)] * 50 + [(10, 51)], False),
+    ('fuel after days using none', [(10, 0)] * 50 + [(10, 20)], True),
+    ('spike after varied days', [(10, 45 + day % 10) for day in range(50)] + [(10, 200)], True),
+    ('ordinary day after varied days', [(10, 45 + day % 10) for day in range(50)] + [(10, 52)], False),
+]
+
+def records(days):
+    # Stock carried over exactly, so only the consumption rate can be flagged
+    closing = (10000 - pd.Series([litres for _, litres in days]).cumsum()).tolist()
+    return pd.DataFrame({
+        'id': range(1, len(days) + 1),
+        'generator_type': 'Standby Generator',
+        'record_date': pd.date_range('2024-01-01', periods=len(days)).strftime('%Y-%m-%d'),
+        'net_hours': [hours for hours, _ in days],
+        'net_diesel_consumed': [litres for _, litres in days],
+        'opening_inventory_liters': [10000] + closing[:-1],
+        'closing_inventory_liters': closing,
+    })
+
+def main():
+    failures = 0
+    for description, days, expected in CASES:
+        anomalies = generator_analytics.detect_fuel_anomalies(records(days))
+        flagged = ((anomalies['record_id'] == len(days)) & (anomalies['anomaly_type'] == 'consumption_rate')).any()
+        
+        if flagged == expected:
+            print(f"ok    {description}: {'flagged' if flagged else 'not flagged'}")
+        else:
+            failures += 1
+            print(f"FAIL  {description}: expected {'flagged' if expected else 'not flagged'}, "
+                  f"got {len(anomalies)} anomalies")
+    
+    if failures:
+        sys.exit(f"{failures} anomaly cases failed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Fail if a hot-path query falls back to a full table scan.
+
+Runs EXPLAIN QUERY PLAN for the queries the pages issue on every render
+against a freshly migrated database.
+
+Run from the repository root:  python benchmarks/check_query_plans.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import migrations
+import ppm
+import space
+
+# (description, query, params, index the plan must use)
+HOT_QUERIES = [
+    ('vendor job counts by status',
+     'SELECT COUNT(*) as count FROM maintenance_requests WHERE assigned_vendor = ? AND status = ?',
+     ('hvac_vendor', 'Completed'), 'idx_requests_vendor_status'),
+    ('vendor job list',
+     'SELECT * FROM maintenance_requests WHERE assigned_vendor = ? ORDER BY created_date DESC',
+     ('hvac_vendor',), 'idx_requests_vendor_created'),
+    ('user request list',
+     'SELECT * FROM maintenance_requests WHERE created_by = ? ORDER BY created_date DESC',
+     ('facility_user',), 'idx_requests_creator_created'),
+    ('status counts',
+     "SELECT COUNT(*) as count FROM maintenance_requests WHERE status = 'Pending'",
+     (), 'idx_requests_status'),
+    ('user approval queue', '''
+        SELECT * FROM maintenance_requests 
+        WHERE created_by = ? 
+        AND status = 'Completed' 
+        AND requesting_dept_approval = 0
+        ORDER BY completed_date DESC
+     ''', ('facility_user',), 'idx_requests_user_approval'),
+    ('manager approval queue', '''
+        SELECT * FROM maintenance_requests 
+        WHERE status = 'Completed' 
+        AND requesting_dept_approval = 1
+        AND facilities_manager_approval = 0
+        ORDER BY department_approval_date DESC
+     ''', (), 'idx_requests_manager_approval'),
+    ('invoice by request',
+     'SELECT * FROM invoices WHERE request_id = ?', (1,), 'idx_invoices_request'),
+    ('vendor approved revenue',
+     'SELECT SUM(total_amount) as total FROM invoices WHERE vendor_username = ? AND status = ?',
+     ('hvac_vendor', 'Approved'), 'idx_invoices_vendor_status'),
+    ('vendor profile',
+     'SELECT * FROM vendors WHERE username = ?', ('hvac_vendor',), 'idx_vendors_username'),
+    ('PPM assignment by schedule',
+     'SELECT * FROM ppm_assignments WHERE schedule_id = ?', (1,), 'idx_ppm_assignments_schedule'),
+    ('PPM user approval queue', '''
+        SELECT * FROM ppm_schedules 
+        WHERE created_by = ? 
+        AND status = 'Completed' 
+        AND user_approved = 0
+        ORDER BY actual_completion_date DESC
+     ''', ('facility_user',), 'idx_ppm_user_approval'),
+    ('PPM manager approval queue', '''
+        SELECT * FROM ppm_schedules 
+        WHERE status = 'Completed' 
+        AND user_approved = 1
+        AND manager_approved = 0
+        ORDER BY actual_completion_date DESC
+     ''', (), 'idx_ppm_manager_approval'),
+    ('room booking conflicts', space.CONFLICT_SQL,
+     (1, '2024-01-01', 600, 540), 'idx_bookings_room_slot'),
+    ('bookings of one room', '''
+        SELECT * FROM room_bookings 
+        WHERE room_id = ? 
+        AND booking_date BETWEEN ? AND ?
+        ORDER BY booking_date DESC, start_time
+     ''', (1, '2024-01-01', '2024-01-31'), 'idx_bookings_room_slot'),
+    ("today's bookings", '''
+        SELECT * FROM room_bookings 
+        WHERE booking_date = ? 
+        AND status != 'Cancelled'
+        ORDER BY start_time
+     ''', ('2024-01-01',), 'idx_bookings_date'),
+    ('generator records by date range', '''
+        SELECT * FROM generator_records 
+        WHERE record_date BETWEEN ? AND ?
+        ORDER BY record_date
+     ''', ('2024-01-01', '2024-03-31'), 'idx_generator_date'),
+    ('generator monthly rollup range', '''
+        SELECT month, record_count, active_days, net_hours, net_diesel 
+        FROM generator_monthly 
+        WHERE generator_type = ? AND month BETWEEN ? AND ?
+     ''', ('*', '2021-01', '2024-12'), 'PRIMARY KEY'),
+    ('generator daily rollup range', '''
+        SELECT record_date, record_count, net_hours, net_diesel 
+        FROM generator_daily 
+        WHERE generator_type = ? AND record_date BETWEEN ? AND ? 
+        ORDER BY record_date
+     ''', ('*', '2024-01-01', '2024-03-31'), 'PRIMARY KEY'),
+    ('generator anomalies by date range', '''
+        SELECT record_id, generator_type, record_date, anomaly_type, observed, expected, score, detail 
+        FROM generator_anomalies 
+        WHERE record_date BETWEEN ? AND ? 
+        ORDER BY record_date DESC, record_id DESC
+     ''', ('2024-01-01', '2024-03-31'), 'idx_generator_anomalies_date'),
+    ('generator anomalies rescan', '''
+        DELETE FROM generator_anomalies WHERE generator_type = ? AND record_date >= ?
+     ''', ('Standby Generator', '2024-01-01'), 'idx_generator_anomalies_type_date'),
+    ('room occupancy range', '''
+        SELECT room_id, booking_date, hour, occupied_minutes 
+        FROM room_occupancy_hourly 
+        WHERE booking_date BETWEEN ? AND ? AND hour >= ? AND hour < ?
+     ''', ('2024-01-01', '2024-01-31', 8, 18), 'PRIMARY KEY'),
+    ('vendor monthly job trend', *db.time_bucket_query(
+        'maintenance_requests', 'created_date', 'month',
+        where='assigned_vendor = ?', params=('hvac_vendor',),
+        counts={'completed': "status = 'Completed'"}
+    ), 'idx_requests_vendor_created'),
+    ('user monthly request trend', *db.time_bucket_query(
+        'maintenance_requests', 'created_date', 'month',
+        where='created_by = ?', params=('facility_user',),
+        counts={'completed': "status = 'Completed'"}
+    ), 'idx_requests_creator_created'),
+    ('daily bookings trend', *db.time_bucket_query(
+        'room_bookings', 'booking_date', 'day',
+        where="status != 'Cancelled'", start='2024-01-01', end='2024-01-31'
+    ), 'idx_bookings_date'),
+    ('PPM schedules missing their next cycle',
+     f'SELECT s.id {ppm._PENDING_SQL}', ppm._PENDING_PARAMS, 'idx_ppm_finished'),
+    ('PPM status evaluation', ppm.STATUS_UPDATE_SQL, ppm.status_thresholds(), 'idx_ppm_status_date'),
+]
+
+def query_plan(conn, query, params):
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+def main():
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db.configure(os.path.join(tmp, 'plans.db'))
+        migrations.migrate()
+        
+        with db.pooled_connection() as conn:
+            for description, query, params, index in HOT_QUERIES:
+                plan = query_plan(conn, query, params)
+                uses_index = any(index in step for step in plan)
+                scans = [step for step in plan if step.startswith('SCAN') and 'INDEX' not in step]
+                
+                if uses_index and not scans:
+                    print(f"ok    {description}: {index}")
+                else:
+                    failures += 1
+                    print(f"FAIL  {description}: expected {index}, got {plan}")
+        
+        db.close_pool()
+    
+    if failures:
+        sys.exit(f"{failures} hot-path queries are not using their index")
+
+if __name__ == '__main__':
+    main()
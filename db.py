@@ -0,0 +1,788 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import pandas as pd
+
+# =============================================
+# CONNECTION MANAGER
+# =============================================
+DB_PATH = 'facilities_management.db'
+
+# Applied to every connection when it is opened
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 268435456),   # 256 MB memory-mapped I/O
+    ('cache_size', -16000),     # 16 MB page cache per connection
+    ('busy_timeout', 5000),     # wait up to 5s for a locked database
+]
+
+# Idle connections kept open between calls; extra ones are closed on release
+POOL_SIZE = 8
+
+# Prepared statements cached per connection by the sqlite3 module
+STATEMENT_CACHE_SIZE = 256
+
+_pool = []
+_pool_lock = threading.Lock()
+_pool_generation = 0
+
+# Read-only connections held by load_parallel threads, mapped to whether a
+# loader is using them right now
+_read_only_conns = {}
+
+# Per thread: the connection of the open transaction, if any, and the
+# read-only connection used while running a load_parallel loader
+_local = threading.local()
+
+def configure(db_path):
+    """Point the data layer at another database file and drop pooled connections"""
+    global DB_PATH
+    DB_PATH = db_path
+    close_pool()
+    _close_watch()
+    clear_cache()
+
+def close_pool():
+    global _pool_generation
+    with _pool_lock:
+        idle = list(_pool)
+        _pool.clear()
+        _pool_generation += 1
+        # Loader threads close their read-only connection themselves when
+        # it is in use; idle ones are closed here
+        idle.extend(conn for conn, busy in _read_only_conns.items() if not busy)
+        for conn in idle:
+            _read_only_conns.pop(conn, None)
+    for conn in idle:
+        conn.close()
+
+def get_connection():
+    """Open a new connection with the tuned pragmas applied"""
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in PRAGMAS:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def _acquire():
+    with _pool_lock:
+        if _pool:
+            return _pool.pop(), _pool_generation
+        generation = _pool_generation
+    return get_connection(), generation
+
+def _release(conn, generation):
+    with _pool_lock:
+        if generation == _pool_generation and len(_pool) < POOL_SIZE:
+            _pool.append(conn)
+            return
+    conn.close()
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection from the pool for the duration of the block"""
+    conn = getattr(_local, 'transaction', None)
+    if conn is not None:
+        # Inside transaction(): every statement must run on its connection
+        yield conn
+        return
+    
+    conn, generation = _acquire()
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _release(conn, generation)
+
+@contextmanager
+def reading_connection():
+    """Connection for a read: the thread's read-only one inside load_parallel, else a pooled one"""
+    conn = getattr(_local, 'read_only', None)
+    if conn is not None and not in_transaction():
+        yield conn
+        return
+    with pooled_connection() as conn:
+        yield conn
+
+def in_transaction():
+    return getattr(_local, 'transaction', None) is not None
+
+@contextmanager
+def transaction():
+    """Run every query in the block on one connection and commit once.
+    
+    The write lock is taken up front (BEGIN IMMEDIATE), so checks made inside
+    the block still hold when the writes that depend on them run. Any error
+    rolls the whole block back and is re-raised; nested blocks join the
+    outer transaction.
+    """
+    if in_transaction():
+        yield _local.transaction
+        return
+    
+    conn, generation = _acquire()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        _local.transaction = conn
+        _local.written = set()
+        yield conn
+        version = _before_commit(conn)
+        conn.commit()
+        _note_write(_local.written, conn, version)
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _local.transaction = None
+        _release(conn, generation)
+
+# =============================================
+# QUERY INSTRUMENTATION
+# =============================================
+# Off unless FM_QUERY_LOG=1 or switched on from the diagnostics panel
+QUERY_LOG_ENABLED = os.environ.get('FM_QUERY_LOG') == '1'
+
+# Queries at or above this many milliseconds go to the slow-query log
+SLOW_QUERY_MS = float(os.environ.get('FM_SLOW_QUERY_MS', 100))
+
+SLOW_QUERY_LOG = os.environ.get('FM_SLOW_QUERY_LOG', 'slow_queries.jsonl')
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+# Distinct query fingerprints kept in the in-memory summary
+QUERY_STATS_LIMIT = 500
+
+_query_stats = {}
+_query_stats_lock = threading.Lock()
+_slow_log = None
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r'\s+')
+
+def set_query_logging(enabled, slow_query_ms=None):
+    global QUERY_LOG_ENABLED, SLOW_QUERY_MS
+    QUERY_LOG_ENABLED = enabled
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = float(slow_query_ms)
+
+def fingerprint_query(query):
+    """Normalise SQL so calls differing only in literals or whitespace group together"""
+    sql = _WHITESPACE_RE.sub(' ', _LITERAL_RE.sub('?', query)).strip()
+    return hashlib.sha1(sql.encode()).hexdigest()[:12], sql
+
+def _params_shape(params):
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+def _calling_page():
+    # Nearest show_* function on the stack, i.e. the page that issued the query
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name.startswith('show_'):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return None
+
+def _get_slow_log():
+    global _slow_log
+    if _slow_log is None:
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                                      backupCount=SLOW_QUERY_LOG_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _slow_log = logging.getLogger('facilities_management.slow_queries')
+        _slow_log.setLevel(logging.INFO)
+        _slow_log.propagate = False
+        _slow_log.addHandler(handler)
+    return _slow_log
+
+def _record_query(query, params, row_count, elapsed_ms):
+    key, sql = fingerprint_query(query)
+    caller = _calling_page()
+    
+    with _query_stats_lock:
+        stats = _query_stats.get(key)
+        if stats is None:
+            if len(_query_stats) >= QUERY_STATS_LIMIT:
+                # Make room by dropping the fingerprint with the least total time
+                del _query_stats[min(_query_stats, key=lambda k: _query_stats[k]['total_ms'])]
+            stats = _query_stats[key] = {
+                'fingerprint': key, 'sql': sql, 'calls': 0, 'total_ms': 0.0,
+                'max_ms': 0.0, 'rows': 0, 'callers': set(),
+            }
+        stats['calls'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        stats['rows'] += row_count
+        if caller:
+            stats['callers'].add(caller)
+    
+    if elapsed_ms >= SLOW_QUERY_MS:
+        _get_slow_log().info(json.dumps({
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'fingerprint': key,
+            'sql': sql,
+            'params_shape': _params_shape(params),
+            'rows': row_count,
+            'elapsed_ms': round(elapsed_ms, 3),
+            'caller': caller,
+        }))
+
+def query_summary(limit=20):
+    """Top query fingerprints by total time spent"""
+    with _query_stats_lock:
+        stats = sorted(_query_stats.values(), key=lambda s: s['total_ms'], reverse=True)[:limit]
+        return [
+            dict(s, callers=', '.join(sorted(s['callers'])), avg_ms=s['total_ms'] / s['calls'])
+            for s in stats
+        ]
+
+def reset_query_stats():
+    with _query_stats_lock:
+        _query_stats.clear()
+
+def read_slow_query_log(limit=50):
+    """Most recent entries of the slow-query log, newest first"""
+    if not os.path.exists(SLOW_QUERY_LOG):
+        return []
+    with open(SLOW_QUERY_LOG, encoding='utf-8') as f:
+        lines = f.readlines()[-limit:]
+    return [json.loads(line) for line in reversed(lines) if line.strip()]
+
+# =============================================
+# READ CACHE
+# =============================================
+# Results of read queries are kept until a table they read from is written.
+# Writes made through this module bump per-table version counters; commits
+# from other processes are caught with PRAGMA data_version and flush everything.
+CACHE_ENABLED = os.environ.get('FM_QUERY_CACHE', '1') != '0'
+
+# Approximate memory budget for cached rows; least recently used entries go first
+CACHE_MAX_BYTES = int(os.environ.get('FM_QUERY_CACHE_MB', 32)) * 1024 * 1024
+
+# Results larger than this share of the budget are never cached
+CACHE_MAX_ENTRY_SHARE = 0.25
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'flushes': 0}
+
+_table_versions = {}
+_trigger_targets = None
+
+# Bumped on every full flush, when per-table versions can no longer be trusted
+_cache_epoch = 0
+
+# Connection used only to read PRAGMA data_version, and the value seen after
+# the last commit made by this process. data_version only says that something
+# committed since the last look, not how many commits, so our own commit and
+# another process's can't be told apart from it alone; see _before_commit.
+_watch_conn = None
+_watch_version = None
+
+_READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)', re.IGNORECASE)
+_WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+_TRIGGER_WRITES_RE = re.compile(
+    r'\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+_CACHEABLE_RE = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_VOLATILE_RE = re.compile(r"\b(?:random|randomblob|changes|last_insert_rowid|current_(?:date|time|timestamp))\b|'now'",
+                          re.IGNORECASE)
+
+def set_query_cache(enabled):
+    global CACHE_ENABLED
+    CACHE_ENABLED = enabled
+    if not enabled:
+        clear_cache()
+
+def clear_cache():
+    """Drop every cached result and forget the trigger map"""
+    with _cache_lock:
+        _flush()
+
+def _flush():
+    # Caller holds _cache_lock
+    global _cache_bytes, _trigger_targets, _cache_epoch
+    _cache.clear()
+    _cache_bytes = 0
+    _trigger_targets = None
+    _cache_epoch += 1
+    _cache_stats['flushes'] += 1
+
+def table_version(*tables):
+    """Token that changes whenever any of tables is written, here or by another process.
+    
+    Lets callers cache values derived from query results, such as fitted
+    models, the same way the read cache does.
+    """
+    _check_external_writes()
+    with _cache_lock:
+        return (_cache_epoch,) + tuple(_table_versions.get(table.lower(), 0) for table in tables)
+
+def cache_stats():
+    with _cache_lock:
+        lookups = _cache_stats['hits'] + _cache_stats['misses']
+        return dict(_cache_stats, entries=len(_cache), bytes=_cache_bytes,
+                    hit_rate=_cache_stats['hits'] / lookups if lookups else 0.0)
+
+def reset_cache_stats():
+    with _cache_lock:
+        for key in _cache_stats:
+            _cache_stats[key] = 0
+
+def _close_watch():
+    global _watch_conn, _watch_version
+    with _cache_lock:
+        if _watch_conn is not None:
+            _watch_conn.close()
+        _watch_conn = None
+        _watch_version = None
+
+def _data_version():
+    # Caller holds _cache_lock
+    global _watch_conn
+    if _watch_conn is None:
+        _watch_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    return _watch_conn.execute('PRAGMA data_version').fetchone()[0]
+
+def _check_external_writes():
+    """Flush the cache if another process committed since we last looked"""
+    global _watch_version
+    with _cache_lock:
+        version = _data_version()
+        if _watch_version is not None and version != _watch_version:
+            _flush()
+        _watch_version = version
+
+def _read_tables(query):
+    return frozenset(name.lower() for name in _READ_TABLES_RE.findall(query))
+
+def _load_trigger_targets(conn):
+    """Map each table to the tables its triggers write, followed transitively"""
+    direct = {}
+    for table, sql in conn.execute("SELECT tbl_name, sql FROM sqlite_master WHERE type = 'trigger'"):
+        body = sql[sql.upper().find('BEGIN'):]
+        direct.setdefault(table.lower(), set()).update(name.lower() for name in _TRIGGER_WRITES_RE.findall(body))
+    
+    targets = {}
+    for table in direct:
+        seen, stack = set(), [table]
+        while stack:
+            for target in direct.get(stack.pop(), ()):
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+        targets[table] = seen
+    return targets
+
+def _written_tables(conn, query):
+    """Tables a write statement can change, or None when it cannot be worked out"""
+    global _trigger_targets
+    match = _WRITE_TABLE_RE.match(query)
+    if not match:
+        return None
+    table = match.group(1).lower()
+    
+    if _trigger_targets is None:
+        _trigger_targets = _load_trigger_targets(conn)
+    return {table} | _trigger_targets.get(table, set())
+
+def _before_commit(conn):
+    """Catch up on other processes' commits while conn still holds the write lock.
+    
+    Nothing else can commit until conn does, so anything the watch connection
+    sees now is another writer's. Returns conn's own data_version, which its
+    own commit does not move, for _note_write to compare after the commit.
+    """
+    if _watch_conn is None:
+        return None
+    _check_external_writes()
+    return conn.execute('PRAGMA data_version').fetchone()[0]
+
+def _note_write(tables, conn=None, version=None):
+    """Invalidate entries reading any of tables after this process commits"""
+    global _watch_version
+    with _cache_lock:
+        if tables is None:
+            # Schema changes or statements we cannot attribute to a table
+            _flush()
+        else:
+            for table in tables:
+                _table_versions[table] = _table_versions.get(table, 0) + 1
+            _cache_stats['invalidations'] += 1
+        
+        # Our own commit moved data_version; take it as the new baseline. If
+        # the writing connection's version moved too, another connection
+        # committed after us and before that read, and it may have been
+        # absorbed into the baseline
+        if _watch_conn is not None:
+            _watch_version = _data_version()
+            if version is None or conn.execute('PRAGMA data_version').fetchone()[0] != version:
+                _flush()
+
+def _cache_key(query, params):
+    if isinstance(params, dict):
+        params = tuple(sorted(params.items()))
+    return query, tuple(params)
+
+def _cache_get(query, params):
+    """Cached (columns, rows) for the query, or a token to pass to _cache_put"""
+    if not CACHE_ENABLED or in_transaction() or not _CACHEABLE_RE.match(query) or _VOLATILE_RE.search(query):
+        return None, None
+    
+    _check_external_writes()
+    key = _cache_key(query, params)
+    tables = _read_tables(query)
+    with _cache_lock:
+        versions = tuple(_table_versions.get(table, 0) for table in sorted(tables))
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == versions:
+            _cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+            return entry[1:3], None
+        _cache_stats['misses'] += 1
+    # Versions are taken before the query runs so a write landing meanwhile
+    # leaves the stored entry already stale
+    return None, (key, versions)
+
+def _estimate_size(columns, rows):
+    sample = rows[:20]
+    per_row = sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in sample) / len(sample)
+    return int(per_row * len(rows)) + sys.getsizeof(columns) + 200
+
+def _cache_put(token, columns, rows):
+    global _cache_bytes
+    if token is None:
+        return
+    key, versions = token
+    size = _estimate_size(columns, rows) if rows else 200
+    if size > CACHE_MAX_BYTES * CACHE_MAX_ENTRY_SHARE:
+        return
+    
+    with _cache_lock:
+        previous = _cache.pop(key, None)
+        if previous is not None:
+            _cache_bytes -= previous[3]
+        _cache[key] = (versions, columns, rows, size)
+        _cache_bytes += size
+        while _cache_bytes > CACHE_MAX_BYTES and _cache:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= evicted[3]
+            _cache_stats['evictions'] += 1
+
+# =============================================
+# QUERY FUNCTIONS
+# =============================================
+def execute_query(query, params=()):
+    """Run a read; inside transaction() errors are raised instead of returning []"""
+    try:
+        cached, token = _cache_get(query, params)
+        if cached is not None:
+            columns, rows = cached
+            return [dict(zip(columns, row)) for row in rows]
+        
+        start = time.perf_counter()
+        with reading_connection() as conn:
+            cursor = conn.execute(query, params)
+            columns = [column[0] for column in cursor.description] if cursor.description else []
+            rows = cursor.fetchall()
+        
+        if QUERY_LOG_ENABLED:
+            _record_query(query, params, len(rows), (time.perf_counter() - start) * 1000)
+        _cache_put(token, columns, rows)
+        return [dict(zip(columns, row)) for row in rows]
+    except Exception as e:
+        print(f"Query error: {e}")
+        print(f"Query: {query}")
+        print(f"Params: {params}")
+        if in_transaction():
+            # An empty result would pass for "nothing found" and let the
+            # transaction commit on the strength of a failed check
+            raise
+        return []
+
+def execute_update(query, params=()):
+    """Run a write; inside transaction() errors are raised instead of returning False"""
+    return _execute_write(query, params, many=False) is not None
+
+def execute_insert(query, params=()):
+    """Run an INSERT and return the new row's id, or None on error outside transaction()"""
+    cursor = _execute_write(query, params, many=False)
+    return cursor.lastrowid if cursor is not None else None
+
+def executemany(query, seq_of_params):
+    """Run one write statement for every parameter set in a single commit"""
+    return _execute_write(query, seq_of_params, many=True) is not None
+
+def executemany_rowcount(query, seq_of_params):
+    """Like executemany, but return the number of rows written, or None on error outside transaction()"""
+    cursor = _execute_write(query, seq_of_params, many=True)
+    # rowcount leaves out rows written by triggers and rows an OR IGNORE skipped
+    return cursor.rowcount if cursor is not None else None
+
+def _execute_write(query, params, many):
+    try:
+        start = time.perf_counter()
+        with pooled_connection() as conn:
+            if many:
+                cursor = conn.executemany(query, params)
+            else:
+                cursor = conn.execute(query, params)
+            tables = _written_tables(conn, query)
+            if in_transaction():
+                # Invalidated when the transaction commits
+                if tables is None or _local.written is None:
+                    _local.written = None
+                else:
+                    _local.written |= tables
+            else:
+                version = _before_commit(conn)
+                conn.commit()
+                _note_write(tables, conn, version)
+        
+        if QUERY_LOG_ENABLED:
+            _record_query(query, () if many else params, cursor.rowcount, (time.perf_counter() - start) * 1000)
+        return cursor
+    except Exception as e:
+        print(f"Update error: {e}")
+        print(f"Query: {query}")
+        print(f"Params: {params}")
+        print(f"Traceback: {traceback.format_exc()}")
+        if in_transaction():
+            raise
+        return None
+
+def execute_query_df(query, params=(), columns=None, dtypes=None):
+    """Run a read query straight into a columnar DataFrame.
+    
+    columns projects the result to the named columns inside SQLite, and
+    dtypes maps column names to pandas dtypes ('datetime64[ns]' parses dates).
+    """
+    if columns:
+        projection = ', '.join(f'"{column}"' for column in columns)
+        query = f"SELECT {projection} FROM ({query})"
+    
+    try:
+        cached, token = _cache_get(query, params)
+        if cached is not None:
+            names, rows = cached
+        else:
+            start = time.perf_counter()
+            with reading_connection() as conn:
+                cursor = conn.execute(query, params)
+                names = [column[0] for column in cursor.description] if cursor.description else []
+                rows = cursor.fetchall()
+            
+            if QUERY_LOG_ENABLED:
+                _record_query(query, params, len(rows), (time.perf_counter() - start) * 1000)
+            _cache_put(token, names, rows)
+    except Exception as e:
+        print(f"Query error: {e}")
+        print(f"Query: {query}")
+        print(f"Params: {params}")
+        if in_transaction():
+            raise
+        return pd.DataFrame(columns=columns or [])
+    
+    # Transpose the row tuples into one sequence per column
+    if rows:
+        df = pd.DataFrame(dict(zip(names, zip(*rows))), columns=names)
+    else:
+        df = pd.DataFrame(columns=names)
+    
+    for column, dtype in (dtypes or {}).items():
+        if column not in df.columns:
+            continue
+        if str(dtype).startswith('datetime64'):
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+        else:
+            df[column] = df[column].astype(dtype)
+    return df
+
+# =============================================
+# PARALLEL LOADING
+# =============================================
+# Independent reads for a page run together on a small thread pool. Each pool
+# thread reads through its own read-only connection, and SQLite releases the
+# GIL while a statement runs, so the reads overlap under WAL. Building the
+# DataFrames still needs the GIL, so on a single CPU the thread hop only adds
+# overhead and the loaders run one after another in the caller instead.
+LOAD_MAX_WORKERS = int(os.environ.get('FM_LOAD_WORKERS', min(4, os.cpu_count() or 1)))
+
+_loader = None
+_loader_lock = threading.Lock()
+_load_timings = {}
+
+def get_read_only_connection():
+    """Open a connection that can only read; it never blocks or is blocked by writers under WAL"""
+    uri = f"file:{urllib.parse.quote(os.path.abspath(DB_PATH))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    for name, value in PRAGMAS:
+        # The journal mode is a property of the file and cannot be set read-only
+        if name not in ('journal_mode', 'synchronous'):
+            conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+def _get_loader():
+    global _loader
+    with _loader_lock:
+        if _loader is None:
+            _loader = ThreadPoolExecutor(max_workers=LOAD_MAX_WORKERS, thread_name_prefix='fm-load')
+        return _loader
+
+def _run_load(load):
+    # Pool threads keep their read-only connection until close_pool() or
+    # configure() retires it
+    with _pool_lock:
+        held = getattr(_local, 'read_only_held', None)
+        if held is None or held[1] != _pool_generation or held[0] not in _read_only_conns:
+            held = None
+        else:
+            _read_only_conns[held[0]] = True
+    if held is None:
+        generation = _pool_generation
+        held = (get_read_only_connection(), generation)
+        _local.read_only_held = held
+        with _pool_lock:
+            _read_only_conns[held[0]] = True
+    
+    _local.read_only = held[0]
+    start = time.perf_counter()
+    try:
+        return load(), (time.perf_counter() - start) * 1000
+    finally:
+        _local.read_only = None
+        with _pool_lock:
+            retired = held[1] != _pool_generation
+            if retired:
+                _read_only_conns.pop(held[0], None)
+            else:
+                _read_only_conns[held[0]] = False
+        if retired:
+            held[0].close()
+
+def load_parallel(loaders, label=None):
+    """Run independent read-only loaders concurrently.
+    
+    loaders maps a name to a callable taking no arguments; the results come
+    back under the same names. Loaders must not call Streamlit, and their
+    reads do not see writes still uncommitted in the caller's transaction.
+    With one worker they run in turn on the caller's thread. When label is
+    given, per-loader and wall-clock times are kept for load_timings().
+    """
+    start = time.perf_counter()
+    results = {}
+    timings = {}
+    if LOAD_MAX_WORKERS > 1 and len(loaders) > 1:
+        executor = _get_loader()
+        futures = {name: executor.submit(_run_load, load) for name, load in loaders.items()}
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+    else:
+        for name, load in loaders.items():
+            load_start = time.perf_counter()
+            results[name] = load()
+            timings[name] = (time.perf_counter() - load_start) * 1000
+    
+    if label:
+        with _loader_lock:
+            _load_timings[label] = {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'wall_ms': (time.perf_counter() - start) * 1000,
+                'serial_ms': sum(timings.values()),
+                'workers': LOAD_MAX_WORKERS if len(loaders) > 1 else 1,
+                'datasets': timings,
+            }
+    return results
+
+def load_timings():
+    """Most recent timings of each labelled load_parallel call"""
+    with _loader_lock:
+        return {label: dict(entry, datasets=dict(entry['datasets'])) for label, entry in _load_timings.items()}
+
+# =============================================
+# TIME BUCKETS
+# =============================================
+# Trend charts group rows by day, week or month inside SQLite so only one row
+# per period comes back. Weeks are labelled with the date of their Monday.
+BUCKET_EXPRESSIONS = {
+    'day': "strftime('%Y-%m-%d', {column})",
+    'week': "date({column}, 'weekday 0', '-6 days')",
+    'month': "strftime('%Y-%m', {column})",
+    'year': "strftime('%Y', {column})",
+}
+
+_IDENTIFIER_RE = re.compile(r'^[A-Za-z_]\w*$')
+
+def _identifier(name):
+    if not _IDENTIFIER_RE.match(name):
+        raise ValueError(f"Not a valid SQL identifier: {name!r}")
+    return name
+
+def time_bucket_query(table, date_column, bucket='month', where=None, params=(),
+                      start=None, end=None, counts=None, sums=None):
+    """SQL and parameters for per-period aggregates of table.
+    
+    Every bucket has a row count in 'count'. counts maps an output column to
+    a SQL condition counted per bucket, sums maps one to a SQL expression
+    summed per bucket. where, counts and sums are SQL written by the caller,
+    never user input; values go in params. start and end bound date_column
+    (inclusive, compared as 'YYYY-MM-DD' text).
+    """
+    if bucket not in BUCKET_EXPRESSIONS:
+        raise ValueError(f"Unknown time bucket: {bucket!r}")
+    column = _identifier(date_column)
+    
+    select = [f"{BUCKET_EXPRESSIONS[bucket].format(column=column)} AS bucket", 'COUNT(*) AS count']
+    for name, condition in (counts or {}).items():
+        select.append(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS {_identifier(name)}")
+    for name, expression in (sums or {}).items():
+        select.append(f"COALESCE(SUM({expression}), 0) AS {_identifier(name)}")
+    
+    conditions = [f"{column} IS NOT NULL"]
+    params = list(params)
+    if where:
+        conditions.append(f"({where})")
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start.strftime('%Y-%m-%d') if hasattr(start, 'strftime') else start)
+    if end is not None:
+        # Timestamps on the end date sort after the bare date
+        conditions.append(f"{column} < date(?, '+1 day')")
+        params.append(end.strftime('%Y-%m-%d') if hasattr(end, 'strftime') else end)
+    
+    query = (f"SELECT {', '.join(select)} FROM {_identifier(table)} "
+             f"WHERE {' AND '.join(conditions)} GROUP BY bucket ORDER BY bucket")
+    return query, tuple(params)
+
+def query_time_buckets(table, date_column, bucket='month', **options):
+    """Run time_bucket_query into a DataFrame with one row per non-empty bucket"""
+    query, params = time_bucket_query(table, date_column, bucket, **options)
+    numeric = {name: 'int64' for name in ['count', *(options.get('counts') or {})]}
+    numeric.update({name: 'float64' for name in options.get('sums') or {}})
+    return execute_query_df(query, params, dtypes=numeric)
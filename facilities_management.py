@@ -3,17 +3,18 @@ import sqlite3
 import pandas as pd
 import plotly.express as px
 from datetime import datetime, timedelta
-import io
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-import base64
 import os
-import zipfile
 import calendar
+import db
+from db import execute_query, execute_query_df, execute_update, transaction
+from migrations import migrate
+import generator_analytics
+import kpis
+import ppm
+import reports
+import space
+from reports import create_maintenance_pdf_report, create_ppm_pdf_report, create_invoice_pdf, lazy_pdf
+from utils import safe_get, safe_float, safe_str, safe_int, format_ngn, safe_bool
 
 # =============================================
 # CUSTOM CSS FOR ENHANCED UI/UX
@@ -101,6 +102,7 @@ def inject_custom_css():
     }
     
     /* Status colors for PPM */
+    .status-overdue { background-color: #fecaca; color: #991b1b; }
     .status-due { background-color: #fee2e2; color: #dc2626; }
     .status-not-due { background-color: #d1fae5; color: #059669; }
     .status-prepare { background-color: #fef3c7; color: #d97706; }
@@ -336,755 +338,21 @@ st.set_page_config(
 inject_custom_css()
 
 # =============================================
-# DATABASE SETUP - ENHANCED WITH NEW TABLES
+# DATABASE SETUP - VERSIONED MIGRATIONS
 # =============================================
+@st.cache_resource
 def init_database():
-    try:
-        conn = sqlite3.connect('facilities_management.db', check_same_thread=False)
-        cursor = conn.cursor()
-        
-        # Existing tables
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                role TEXT NOT NULL,
-                vendor_type TEXT,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS maintenance_requests (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT NOT NULL,
-                location TEXT,
-                facility_type TEXT NOT NULL,
-                priority TEXT NOT NULL,
-                status TEXT DEFAULT 'Pending',
-                created_by TEXT NOT NULL,
-                assigned_vendor TEXT,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                completed_date TIMESTAMP,
-                completion_notes TEXT,
-                job_breakdown TEXT,
-                invoice_amount REAL,
-                invoice_number TEXT,
-                requesting_dept_approval INTEGER DEFAULT 0,
-                facilities_manager_approval INTEGER DEFAULT 0,
-                department_approval_date TIMESTAMP,
-                manager_approval_date TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vendors (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                company_name TEXT NOT NULL,
-                contact_person TEXT NOT NULL,
-                email TEXT NOT NULL,
-                phone TEXT NOT NULL,
-                vendor_type TEXT NOT NULL,
-                services_offered TEXT NOT NULL,
-                annual_turnover REAL,
-                tax_identification_number TEXT,
-                rc_number TEXT,
-                key_management_staff TEXT,
-                account_details TEXT,
-                certification TEXT,
-                address TEXT NOT NULL,
-                username TEXT NOT NULL,
-                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invoices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_number TEXT UNIQUE NOT NULL,
-                request_id INTEGER,
-                vendor_username TEXT NOT NULL,
-                invoice_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                details_of_work TEXT NOT NULL,
-                quantity INTEGER NOT NULL,
-                unit_cost REAL NOT NULL,
-                amount REAL NOT NULL,
-                labour_charge REAL DEFAULT 0,
-                vat_applicable INTEGER DEFAULT 0,
-                vat_amount REAL DEFAULT 0,
-                total_amount REAL NOT NULL,
-                status TEXT DEFAULT 'Pending'
-            )
-        ''')
-        
-        # NEW TABLES FOR ADDED REQUIREMENTS
-        
-        # Planned Preventive Maintenance (PPM) Schedules
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ppm_schedules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                schedule_name TEXT NOT NULL,
-                facility_category TEXT NOT NULL,
-                sub_category TEXT NOT NULL,
-                frequency TEXT NOT NULL,
-                next_maintenance_date DATE NOT NULL,
-                status TEXT DEFAULT 'Not Due',
-                assigned_vendor TEXT,
-                created_by TEXT NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                description TEXT,
-                notes TEXT,
-                estimated_duration_hours INTEGER,
-                estimated_cost REAL,
-                actual_completion_date DATE,
-                actual_cost REAL,
-                user_approved INTEGER DEFAULT 0,
-                manager_approved INTEGER DEFAULT 0
-            )
-        ''')
-        
-        # Generator Daily Records
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS generator_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                record_date DATE NOT NULL,
-                generator_type TEXT NOT NULL,
-                opening_hours REAL NOT NULL,
-                closing_hours REAL NOT NULL,
-                net_hours REAL,
-                opening_inventory_liters REAL NOT NULL,
-                purchase_liters REAL DEFAULT 0,
-                closing_inventory_liters REAL NOT NULL,
-                net_diesel_consumed REAL,
-                recorded_by TEXT NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT
-            )
-        ''')
-        
-        # HSE Management
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS hse_schedules (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                schedule_type TEXT NOT NULL,
-                description TEXT NOT NULL,
-                frequency TEXT NOT NULL,
-                next_due_date DATE NOT NULL,
-                status TEXT DEFAULT 'Not Due',
-                responsible_person TEXT,
-                created_by TEXT NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS hse_incidents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                incident_date DATE NOT NULL,
-                incident_type TEXT NOT NULL,
-                description TEXT NOT NULL,
-                location TEXT NOT NULL,
-                severity TEXT NOT NULL,
-                reported_by TEXT NOT NULL,
-                status TEXT DEFAULT 'Open',
-                action_taken TEXT,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS hse_inspections (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                inspection_date DATE NOT NULL,
-                inspection_type TEXT NOT NULL,
-                inspector_name TEXT NOT NULL,
-                area_inspected TEXT NOT NULL,
-                findings TEXT,
-                recommendations TEXT,
-                status TEXT DEFAULT 'Completed',
-                created_by TEXT NOT NULL,
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Space Management - Room Booking
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS room_bookings (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_name TEXT NOT NULL,
-                room_type TEXT NOT NULL,
-                booking_date DATE NOT NULL,
-                start_time TEXT NOT NULL,
-                end_time TEXT NOT NULL,
-                booked_by TEXT NOT NULL,
-                purpose TEXT NOT NULL,
-                attendees_count INTEGER,
-                status TEXT DEFAULT 'Confirmed',
-                created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT
-            )
-        ''')
-        
-        # PPM Assignments to Vendors
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ppm_assignments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                schedule_id INTEGER NOT NULL,
-                vendor_username TEXT NOT NULL,
-                assigned_date DATE NOT NULL,
-                due_date DATE NOT NULL,
-                status TEXT DEFAULT 'Assigned',
-                assigned_by TEXT NOT NULL,
-                completed_date DATE,
-                completion_notes TEXT,
-                invoice_number TEXT,
-                FOREIGN KEY (schedule_id) REFERENCES ppm_schedules(id)
-            )
-        ''')
-        
-        # Insert sample users if table is empty
-        cursor.execute('SELECT COUNT(*) FROM users')
-        user_count = cursor.fetchone()[0]
-        
-        if user_count == 0:
-            sample_users = [
-                ('facility_user', '0123456', 'facility_user', None),
-                ('facility_manager', '0123456', 'facility_manager', None),
-                ('hvac_vendor', '0123456', 'vendor', 'HVAC'),
-                ('generator_vendor', '0123456', 'vendor', 'Generator'),
-                ('fixture_vendor', '0123456', 'vendor', 'Fixture and Fittings'),
-                ('building_vendor', '0123456', 'vendor', 'Building Maintenance'),
-                ('hse_vendor', '0123456', 'vendor', 'HSE'),
-                ('space_vendor', '0123456', 'vendor', 'Space Management'),
-                ('plumbing_vendor', '0123456', 'vendor', 'Plumbing'),
-                ('electrical_vendor', '0123456', 'vendor', 'Electrical'),
-                ('cleaning_vendor', '0123456', 'vendor', 'Cleaning')
-            ]
-            
-            for username, password, role, vendor_type in sample_users:
-                try:
-                    cursor.execute(
-                        'INSERT INTO users (username, password_hash, role, vendor_type) VALUES (?, ?, ?, ?)',
-                        (username, password, role, vendor_type)
-                    )
-                except:
-                    pass
-        
-        # Insert sample vendors if table is empty
-        cursor.execute('SELECT COUNT(*) FROM vendors')
-        vendor_count = cursor.fetchone()[0]
-        
-        if vendor_count == 0:
-            sample_vendors = [
-                ('hvac_vendor', 'HVAC Solutions Inc.', 'John HVAC', 'hvac@example.com', '123-456-7890', 'HVAC', 
-                 'HVAC installation, maintenance and repair services', 500000.00, 'TIN123456', 'RC789012',
-                 'John Smith (CEO), Jane Doe (Operations Manager)', 'Bank: ABC Bank, Acc: 123456789', 
-                 'HVAC Certified', '123 HVAC Street, City, State'),
-                ('generator_vendor', 'Generator Pros Ltd.', 'Mike Generator', 'generator@example.com', '123-456-7891', 'Generator',
-                 'Generator installation and maintenance', 300000.00, 'TIN123457', 'RC789013',
-                 'Mike Johnson (Director)', 'Bank: XYZ Bank, Acc: 987654321', 
-                 'Generator Specialist', '456 Power Ave, City, State'),
-                ('fixture_vendor', 'Fixture Masters Co.', 'Sarah Fixtures', 'fixtures@example.com', '123-456-7892', 'Fixture and Fittings',
-                 'Fixture installation and repairs', 250000.00, 'TIN123458', 'RC789014',
-                 'Sarah Wilson (Owner)', 'Bank: DEF Bank, Acc: 456123789', 
-                 'Fixture Expert', '789 Fixture Road, City, State'),
-                ('building_vendor', 'Building Care Services', 'David Builder', 'building@example.com', '123-456-7893', 'Building Maintenance',
-                 'General building maintenance and repairs', 400000.00, 'TIN123459', 'RC789015',
-                 'David Brown (Manager)', 'Bank: GHI Bank, Acc: 789456123', 
-                 'Building Maintenance Certified', '321 Builders Lane, City, State')
-            ]
-            
-            for vendor_data in sample_vendors:
-                try:
-                    cursor.execute('''
-                        INSERT INTO vendors 
-                        (username, company_name, contact_person, email, phone, vendor_type, services_offered, 
-                         annual_turnover, tax_identification_number, rc_number, key_management_staff, 
-                         account_details, certification, address) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', vendor_data)
-                except:
-                    pass
-        
-        conn.commit()
-        conn.close()
-        print("Database initialized successfully with new tables")
-        
-    except Exception as e:
-        print(f"Database initialization error: {e}")
-
-# Initialize database
-init_database()
-
-# =============================================
-# DATABASE FUNCTIONS
-# =============================================
-def get_connection():
-    return sqlite3.connect('facilities_management.db', check_same_thread=False)
-
-def execute_query(query, params=()):
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        
-        # Get column names
-        columns = [column[0] for column in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        results = []
-        for row in rows:
-            result = {}
-            for i, column in enumerate(columns):
-                result[column] = row[i]
-            results.append(result)
-        
-        conn.close()
-        return results
-    except Exception as e:
-        print(f"Query error: {e}")
-        print(f"Query: {query}")
-        print(f"Params: {params}")
-        return []
-
-def execute_update(query, params=()):
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"Update error: {e}")
-        print(f"Query: {query}")
-        print(f"Params: {params}")
-        # Print full traceback for debugging
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        return False
-
-# =============================================
-# SAFE DATA ACCESS FUNCTIONS
-# =============================================
-def safe_get(data, key, default=None):
-    if not data or key not in data:
-        return default
-    return data.get(key, default)
-
-def safe_float(value, default=0.0):
-    try:
-        if value is None:
-            return default
-        return float(value)
-    except (ValueError, TypeError):
-        return default
-
-def safe_str(value, default="N/A"):
-    if value is None:
-        return default
-    return str(value)
-
-def safe_int(value, default=0):
-    try:
-        if value is None:
-            return default
-        return int(value)
-    except (ValueError, TypeError):
-        return default
-
-def format_ngn(amount):
-    return f"₦{safe_float(amount):,.2f}"
+    # Schema lives in migrations.py; cached so warm reruns skip it entirely.
+    # A failure raises, so it is not cached and the next rerun retries it
+    migrate()
 
-def safe_bool(value, default=False):
-    if value is None:
-        return default
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, int):
-        return value == 1
-    if isinstance(value, str):
-        return value.lower() in ['true', '1', 'yes', 'y']
-    return default
-
-# =============================================
-# PDF REPORT GENERATION FUNCTIONS
-# =============================================
-def create_maintenance_pdf_report(request_id):
-    """Create PDF report for maintenance job completion"""
-    buffer = io.BytesIO()
-    
-    # Get request details
-    request = execute_query('SELECT * FROM maintenance_requests WHERE id = ?', (request_id,))
-    if not request:
-        return None
-    request = request[0]
-    
-    # Get invoice details if exists
-    invoice = execute_query('SELECT * FROM invoices WHERE request_id = ?', (request_id,))
-    
-    # Create PDF
-    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, 
-                           topMargin=72, bottomMargin=18)
-    
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.HexColor('#1e3a8a')
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceAfter=12,
-        textColor=colors.HexColor('#3b82f6')
-    )
-    
-    normal_style = ParagraphStyle(
-        'Normal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=6
-    )
-    
-    # Story container for PDF elements
-    story = []
-    
-    # Title
-    story.append(Paragraph("MAINTENANCE JOB COMPLETION REPORT", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Job Details
-    story.append(Paragraph("Job Details", heading_style))
-    
-    job_data = [
-        ["Job ID:", str(safe_get(request, 'id', ''))],
-        ["Title:", safe_str(safe_get(request, 'title', ''))],
-        ["Location:", safe_str(safe_get(request, 'location', 'N/A'))],
-        ["Facility Type:", safe_str(safe_get(request, 'facility_type', ''))],
-        ["Priority:", safe_str(safe_get(request, 'priority', ''))],
-        ["Created By:", safe_str(safe_get(request, 'created_by', ''))],
-        ["Created Date:", safe_str(safe_get(request, 'created_date', ''))],
-        ["Assigned Vendor:", safe_str(safe_get(request, 'assigned_vendor', 'N/A'))],
-        ["Status:", safe_str(safe_get(request, 'status', ''))],
-        ["Completed Date:", safe_str(safe_get(request, 'completed_date', 'N/A'))]
-    ]
-    
-    job_table = Table(job_data, colWidths=[2*inch, 4*inch])
-    job_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
-    
-    story.append(job_table)
-    story.append(Spacer(1, 20))
-    
-    # Description
-    story.append(Paragraph("Job Description", heading_style))
-    story.append(Paragraph(safe_str(safe_get(request, 'description', '')), normal_style))
-    story.append(Spacer(1, 20))
-    
-    # Completion Notes
-    if safe_get(request, 'completion_notes'):
-        story.append(Paragraph("Completion Notes", heading_style))
-        story.append(Paragraph(safe_str(safe_get(request, 'completion_notes', '')), normal_style))
-        story.append(Spacer(1, 20))
-    
-    # Job Breakdown
-    if safe_get(request, 'job_breakdown'):
-        story.append(Paragraph("Job Breakdown", heading_style))
-        story.append(Paragraph(safe_str(safe_get(request, 'job_breakdown', '')), normal_style))
-        story.append(Spacer(1, 20))
-    
-    # Invoice Details
-    if invoice:
-        invoice = invoice[0]
-        story.append(Paragraph("Invoice Details", heading_style))
-        
-        invoice_data = [
-            ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
-            ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
-            ["Details of Work:", safe_str(safe_get(invoice, 'details_of_work', ''))],
-            ["Quantity:", str(safe_int(safe_get(invoice, 'quantity', 0)))],
-            ["Unit Cost:", format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0)))],
-            ["Material Cost:", format_ngn(safe_float(safe_get(invoice, 'amount', 0)))],
-            ["Labour Charges:", format_ngn(safe_float(safe_get(invoice, 'labour_charge', 0)))],
-            ["VAT Amount:", format_ngn(safe_float(safe_get(invoice, 'vat_amount', 0)))],
-            ["Total Amount:", format_ngn(safe_float(safe_get(invoice, 'total_amount', 0)))],
-            ["Invoice Status:", safe_str(safe_get(invoice, 'status', ''))]
-        ]
-        
-        invoice_table = Table(invoice_data, colWidths=[2*inch, 4*inch])
-        invoice_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-        
-        story.append(invoice_table)
-        story.append(Spacer(1, 20))
-    
-    # Approval Status
-    story.append(Paragraph("Approval Status", heading_style))
-    
-    approval_data = [
-        ["Department Approval:", "Approved" if safe_bool(safe_get(request, 'requesting_dept_approval')) else "Pending"],
-        ["Department Approval Date:", safe_str(safe_get(request, 'department_approval_date', 'N/A'))],
-        ["Manager Approval:", "Approved" if safe_bool(safe_get(request, 'facilities_manager_approval')) else "Pending"],
-        ["Manager Approval Date:", safe_str(safe_get(request, 'manager_approval_date', 'N/A'))]
-    ]
-    
-    approval_table = Table(approval_data, colWidths=[2*inch, 4*inch])
-    approval_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TOPPADDING', (0, 0), (-1, -1), 6),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
-    
-    story.append(approval_table)
-    
-    # Footer
-    story.append(Spacer(1, 40))
-    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", normal_style))
-    story.append(Paragraph("A-Z Facilities Management Pro APP™", normal_style))
-    
-    # Build PDF
-    doc.build(story)
-    
-    buffer.seek(0)
-    return buffer
-
-def create_ppm_pdf_report(schedule_id):
-    """Create PDF report for PPM completion"""
-    buffer = io.BytesIO()
-    
-    # Get schedule details
-    schedule = execute_query('SELECT * FROM ppm_schedules WHERE id = ?', (schedule_id,))
-    if not schedule:
-        return None
-    schedule = schedule[0]
-    
-    # Get assignment details
-    assignment = execute_query('SELECT * FROM ppm_assignments WHERE schedule_id = ?', (schedule_id,))
-    
-    # Create PDF
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=24,
-        spaceAfter=30,
-        textColor=colors.HexColor('#1e3a8a')
-    )
-    
-    story = []
-    
-    # Title
-    story.append(Paragraph("PPM COMPLETION REPORT", title_style))
-    story.append(Spacer(1, 20))
-    
-    # Schedule Details
-    story.append(Paragraph("PPM Schedule Details", styles['Heading2']))
-    
-    schedule_data = [
-        ["Schedule ID:", str(safe_get(schedule, 'id', ''))],
-        ["Schedule Name:", safe_str(safe_get(schedule, 'schedule_name', ''))],
-        ["Facility Category:", safe_str(safe_get(schedule, 'facility_category', ''))],
-        ["Sub-Category:", safe_str(safe_get(schedule, 'sub_category', ''))],
-        ["Frequency:", safe_str(safe_get(schedule, 'frequency', ''))],
-        ["Next Maintenance Date:", safe_str(safe_get(schedule, 'next_maintenance_date', ''))],
-        ["Status:", safe_str(safe_get(schedule, 'status', ''))],
-        ["Assigned Vendor:", safe_str(safe_get(schedule, 'assigned_vendor', 'N/A'))],
-        ["Created By:", safe_str(safe_get(schedule, 'created_by', ''))],
-        ["Estimated Cost:", format_ngn(safe_float(safe_get(schedule, 'estimated_cost', 0)))],
-        ["Actual Completion Date:", safe_str(safe_get(schedule, 'actual_completion_date', 'N/A'))],
-        ["Actual Cost:", format_ngn(safe_float(safe_get(schedule, 'actual_cost', 0))) if safe_get(schedule, 'actual_cost') else "N/A"]
-    ]
-    
-    schedule_table = Table(schedule_data, colWidths=[2*inch, 4*inch])
-    schedule_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-    ]))
-    
-    story.append(schedule_table)
-    story.append(Spacer(1, 20))
-    
-    # Description
-    story.append(Paragraph("Description", styles['Heading2']))
-    story.append(Paragraph(safe_str(safe_get(schedule, 'description', '')), styles['Normal']))
-    
-    # Notes
-    if safe_get(schedule, 'notes'):
-        story.append(Spacer(1, 10))
-        story.append(Paragraph("Notes", styles['Heading2']))
-        story.append(Paragraph(safe_str(safe_get(schedule, 'notes', '')), styles['Normal']))
-    
-    # Assignment Details
-    if assignment:
-        assignment = assignment[0]
-        story.append(Spacer(1, 20))
-        story.append(Paragraph("Assignment Details", styles['Heading2']))
-        
-        assign_data = [
-            ["Assigned To:", safe_str(safe_get(assignment, 'vendor_username', ''))],
-            ["Assigned Date:", safe_str(safe_get(assignment, 'assigned_date', ''))],
-            ["Due Date:", safe_str(safe_get(assignment, 'due_date', ''))],
-            ["Completed Date:", safe_str(safe_get(assignment, 'completed_date', 'N/A'))],
-            ["Status:", safe_str(safe_get(assignment, 'status', ''))]
-        ]
-        
-        assign_table = Table(assign_data, colWidths=[2*inch, 4*inch])
-        story.append(assign_table)
-        
-        if safe_get(assignment, 'completion_notes'):
-            story.append(Spacer(1, 10))
-            story.append(Paragraph("Completion Notes", styles['Heading2']))
-            story.append(Paragraph(safe_str(safe_get(assignment, 'completion_notes', '')), styles['Normal']))
-    
-    # Approval Status
-    story.append(Spacer(1, 20))
-    story.append(Paragraph("Approval Status", styles['Heading2']))
-    
-    approval_data = [
-        ["User Approved:", "Yes" if safe_bool(safe_get(schedule, 'user_approved')) else "No"],
-        ["Manager Approved:", "Yes" if safe_bool(safe_get(schedule, 'manager_approved')) else "No"]
-    ]
-    
-    approval_table = Table(approval_data, colWidths=[2*inch, 4*inch])
-    story.append(approval_table)
-    
-    # Footer
-    story.append(Spacer(1, 40))
-    story.append(Paragraph(f"Report generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", styles['Normal']))
-    story.append(Paragraph("A-Z Facilities Management Pro APP™", styles['Normal']))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-def create_invoice_pdf(invoice_id):
-    """Create PDF invoice"""
-    buffer = io.BytesIO()
-    
-    # Get invoice details
-    invoice = execute_query('SELECT * FROM invoices WHERE id = ?', (invoice_id,))
-    if not invoice:
-        return None
-    invoice = invoice[0]
-    
-    # Get request details
-    request = execute_query('SELECT * FROM maintenance_requests WHERE id = ?', (invoice['request_id'],))
-    
-    # Create PDF
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Header
-    story.append(Paragraph("INVOICE", styles['Title']))
-    story.append(Spacer(1, 20))
-    
-    # Invoice Details
-    story.append(Paragraph("Invoice Details", styles['Heading2']))
-    
-    invoice_details = [
-        ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
-        ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
-        ["Vendor:", safe_str(safe_get(invoice, 'vendor_username', ''))],
-        ["Status:", safe_str(safe_get(invoice, 'status', ''))]
-    ]
-    
-    if request:
-        request = request[0]
-        invoice_details.append(["Job Title:", safe_str(safe_get(request, 'title', ''))])
-        invoice_details.append(["Location:", safe_str(safe_get(request, 'location', 'N/A'))])
-    
-    inv_table = Table(invoice_details, colWidths=[2*inch, 4*inch])
-    story.append(inv_table)
-    story.append(Spacer(1, 20))
-    
-    # Work Details
-    story.append(Paragraph("Work Details", styles['Heading2']))
-    story.append(Paragraph(safe_str(safe_get(invoice, 'details_of_work', '')), styles['Normal']))
-    story.append(Spacer(1, 20))
-    
-    # Cost Breakdown
-    story.append(Paragraph("Cost Breakdown", styles['Heading2']))
-    
-    amount = safe_float(safe_get(invoice, 'amount', 0))
-    labour_charge = safe_float(safe_get(invoice, 'labour_charge', 0))
-    vat_amount = safe_float(safe_get(invoice, 'vat_amount', 0))
-    total_amount = safe_float(safe_get(invoice, 'total_amount', 0))
-    
-    cost_data = [
-        ["Description", "Quantity", "Unit Cost", "Amount"],
-        ["Materials", str(safe_int(safe_get(invoice, 'quantity', 0))), format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0))), format_ngn(amount)],
-        ["Labour Charges", "1", format_ngn(labour_charge), format_ngn(labour_charge)],
-        ["Subtotal", "", "", format_ngn(amount + labour_charge)],
-        ["VAT (7.5%)" if safe_bool(safe_get(invoice, 'vat_applicable')) else "VAT", "", "", format_ngn(vat_amount)],
-        ["TOTAL", "", "", format_ngn(total_amount)]
-    ]
-    
-    cost_table = Table(cost_data, colWidths=[3*inch, 1*inch, 1.5*inch, 1.5*inch])
-    cost_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f1f5f9')),
-    ]))
-    
-    story.append(cost_table)
-    
-    # Footer
-    story.append(Spacer(1, 40))
-    story.append(Paragraph("Thank you for your business!", styles['Normal']))
-    story.append(Paragraph("A-Z Facilities Management Pro APP™", styles['Normal']))
-    
-    doc.build(story)
-    buffer.seek(0)
-    return buffer
-
-def get_pdf_download_link(pdf_buffer, filename):
-    """Generate download link for PDF"""
-    b64 = base64.b64encode(pdf_buffer.getvalue()).decode()
-    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}" class="pdf-download-btn">📥 Download {filename}</a>'
+# Initialize database; the app does not run on a partly migrated schema
+try:
+    init_database()
+except Exception as e:
+    print(f"Database initialization error: {e}")
+    st.error(f"❌ Database initialization failed: {e}")
+    st.stop()
 
 # =============================================
 # HELPER FUNCTIONS
@@ -1142,6 +410,71 @@ def get_ppm_for_manager_approval():
         ORDER BY actual_completion_date DESC
     ''')
 
+def catch_up_ppm_occurrences():
+    """Create the next cycle of every recurring PPM finished without one,
+    then move open schedules on to Prepare, Due or Overdue by date"""
+    created = 0
+    try:
+        created = ppm.generate_next_occurrences()
+    except sqlite3.Error as e:
+        # Retried on the next visit; the unique parent link prevents duplicates
+        print(f"PPM recurrence error: {e}")
+    if created:
+        st.toast(f"📅 Scheduled the next cycle for {created} recurring PPM schedule(s)")
+    
+    try:
+        # New cycles may already fall inside a lead window
+        ppm.evaluate_statuses(force=bool(created))
+    except sqlite3.Error as e:
+        print(f"PPM status evaluation error: {e}")
+    return created
+
+def show_bulk_ppm_assignment(key):
+    """Propose and apply vendor assignments for every unassigned Prepare/Due/Overdue PPM"""
+    plan_key = f"{key}_assignment_plan"
+    with st.expander("⚡ Auto-assign PPM to Vendors"):
+        st.caption(f"Earliest due first, within {ppm.VENDOR_WEEKLY_HOURS:g} hours per vendor per week")
+        if st.button("🧮 Propose Assignments", key=f"{key}_propose"):
+            st.session_state[plan_key] = ppm.propose_vendor_assignments()
+        
+        plan = st.session_state.get(plan_key)
+        if plan is None:
+            return
+        
+        assignments = plan['assignments']
+        if not assignments.empty:
+            st.markdown(f"**{len(assignments)} schedule(s) can be assigned**")
+            st.dataframe(assignments[['schedule_name', 'facility_category', 'vendor_username', 'due_date', 'hours']]
+                         .rename(columns={'schedule_name': 'Schedule', 'facility_category': 'Category',
+                                          'vendor_username': 'Vendor', 'due_date': 'Due Date', 'hours': 'Hours'}),
+                         use_container_width=True, hide_index=True)
+            
+            load = plan['load']
+            fig = px.bar(load, x='week', y=['committed_hours', 'planned_hours'], facet_col='vendor_username',
+                         title="Vendor Hours per Week",
+                         labels={'week': 'Week Starting', 'value': 'Hours', 'variable': ''})
+            fig.add_hline(y=ppm.VENDOR_WEEKLY_HOURS, line_dash="dash", line_color="red")
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.info("📭 Nothing can be assigned right now")
+        
+        if not plan['unassigned'].empty:
+            st.markdown(f"**{len(plan['unassigned'])} schedule(s) left unassigned**")
+            st.dataframe(plan['unassigned'][['schedule_name', 'facility_category', 'next_maintenance_date', 'reason']]
+                         .rename(columns={'schedule_name': 'Schedule', 'facility_category': 'Category',
+                                          'next_maintenance_date': 'Due', 'reason': 'Reason'}),
+                         use_container_width=True, hide_index=True)
+        
+        if not assignments.empty and st.button("✅ Apply Assignments", key=f"{key}_apply"):
+            try:
+                applied = ppm.apply_vendor_assignments(assignments, st.session_state.user['username'])
+            except sqlite3.Error:
+                st.error("❌ Failed to apply assignments")
+            else:
+                del st.session_state[plan_key]
+                st.success(f"✅ Assigned {applied} PPM schedule(s)")
+                st.rerun()
+
 def create_metric_card(title, value, icon="📊"):
     st.markdown(f"""
     <div class="metric-card">
@@ -1424,29 +757,95 @@ def show_new_inspection():
 def show_space_management_facility_user():
     st.markdown("<h1 class='app-title'>🏢 Space Management</h1>", unsafe_allow_html=True)
     
-    tab1, tab2, tab3 = st.tabs(["📅 Room Booking", "👀 Room Bookings Overview", "📊 Analytics"])
+    tab1, tab2, tab3, tab4 = st.tabs(["🔎 Find a Room", "📅 Room Booking", "👀 Room Bookings Overview", "📊 Analytics"])
     
     with tab1:
-        show_room_booking()
+        show_room_availability()
     
     with tab2:
-        show_room_bookings_overview()
+        show_room_booking()
     
     with tab3:
+        show_room_bookings_overview()
+    
+    with tab4:
         show_space_analytics()
 
+def show_room_availability():
+    st.markdown("### 🔎 Find a Free Room")
+    
+    rooms = space.get_rooms()
+    room_types = sorted(set(r['room_type'] for r in rooms))
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        search_date = st.date_input("Date", value=datetime.now(), key="availability_date")
+        room_type = st.selectbox("Room Type", ["All"] + room_types, key="availability_type")
+    with col2:
+        start_time = st.time_input("From", value=datetime.now().replace(minute=0).time(), key="availability_start")
+        min_capacity = st.number_input("Minimum Capacity", min_value=0, value=0, key="availability_capacity")
+    with col3:
+        end_time = st.time_input("To", value=(datetime.now().replace(minute=0) + timedelta(hours=1)).time(),
+                                 key="availability_end")
+    
+    if end_time <= start_time:
+        st.error("❌ End time must be after start time")
+        return
+    
+    free_rooms = space.find_free_rooms(search_date, start_time, end_time, min_capacity,
+                                       None if room_type == "All" else room_type)
+    st.markdown(f"#### ✅ {len(free_rooms)} of {len(rooms)} room(s) free "
+                f"{start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')} on {search_date.strftime('%d %b %Y')}")
+    
+    if not free_rooms:
+        st.info("📭 No room matches; try another time or a smaller capacity")
+        return
+    
+    st.dataframe(pd.DataFrame(free_rooms)[['room_name', 'room_type', 'capacity', 'floor', 'amenities']]
+                 .rename(columns={'room_name': 'Room', 'room_type': 'Room Type', 'capacity': 'Capacity',
+                                  'floor': 'Floor', 'amenities': 'Amenities'}),
+                 use_container_width=True, hide_index=True)
+    
+    with st.form("quick_booking_form"):
+        room_names = {r['id']: r['room_name'] for r in free_rooms}
+        room_id = st.selectbox("Room", list(room_names), format_func=room_names.get)
+        purpose = st.text_input("Purpose *")
+        attendees_count = st.number_input("Number of Attendees", min_value=1, value=max(min_capacity, 1))
+        
+        if st.form_submit_button("✅ Book Selected Room", use_container_width=True):
+            if not purpose:
+                st.error("❌ Please enter the purpose of the booking")
+            else:
+                try:
+                    booking_id, conflicts = space.book_room(
+                        room_id, search_date, start_time, end_time,
+                        st.session_state.user['username'], purpose, attendees_count
+                    )
+                except sqlite3.Error:
+                    st.error("❌ Failed to book room")
+                else:
+                    if conflicts:
+                        st.error("❌ Room was just booked for part of this time slot")
+                    else:
+                        st.success("✅ Room booked successfully!")
+                        st.rerun()
+
 def show_room_booking():
     st.markdown("### 📅 Book a Room")
     
+    rooms = {r['id']: r for r in space.get_rooms()}
+    if not rooms:
+        st.info("📭 No bookable rooms yet; a manager can add them in the Room Catalogue")
+        return
+    
     with st.form("room_booking_form"):
         col1, col2 = st.columns(2)
         
         with col1:
-            room_name = st.text_input("Room Name *", placeholder="e.g., Conference Room A")
-            room_type = st.selectbox(
-                "Room Type *",
-                ["Conference Room", "Meeting Room", "Training Room", "Auditorium", 
-                 "Board Room", "Interview Room", "Other"]
+            room_id = st.selectbox(
+                "Room *", list(rooms),
+                format_func=lambda room_id: f"{rooms[room_id]['room_name']} ({rooms[room_id]['room_type']}, "
+                                            f"seats {rooms[room_id]['capacity'] or '?'})"
             )
             booking_date = st.date_input("Booking Date *", value=datetime.now())
         
@@ -1463,39 +862,31 @@ def show_room_booking():
         
         if submitted:
             # Validation
-            if not all([room_name, room_type, booked_by, purpose]):
+            capacity = rooms[room_id]['capacity']
+            if not all([booked_by, purpose]):
                 st.error("❌ Please fill in all required fields (*)")
             elif end_time <= start_time:
                 st.error("❌ End time must be after start time")
+            elif capacity and attendees_count > capacity:
+                st.error(f"❌ {rooms[room_id]['room_name']} seats {capacity}; choose a larger room")
             else:
-                # Check for booking conflicts
-                conflicting_bookings = execute_query('''
-                    SELECT * FROM room_bookings 
-                    WHERE room_name = ? 
-                    AND booking_date = ?
-                    AND ((start_time < ? AND end_time > ?) OR (start_time < ? AND end_time > ?))
-                    AND status != 'Cancelled'
-                ''', (room_name, booking_date.strftime('%Y-%m-%d'), 
-                      start_time.strftime('%H:%M'), end_time.strftime('%H:%M'),
-                      end_time.strftime('%H:%M'), start_time.strftime('%H:%M')))
-                
-                if conflicting_bookings:
-                    st.error("❌ Room already booked for this time slot")
-                else:
-                    success = execute_update(
-                        '''INSERT INTO room_bookings 
-                        (room_name, room_type, booking_date, start_time, end_time,
-                         booked_by, purpose, attendees_count, notes) 
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                        (room_name, room_type, booking_date.strftime('%Y-%m-%d'),
-                         start_time.strftime('%H:%M'), end_time.strftime('%H:%M'),
-                         booked_by, purpose, attendees_count, notes)
+                # Conflict check and insert run in one transaction
+                try:
+                    booking_id, conflicts = space.book_room(
+                        room_id, booking_date, start_time, end_time,
+                        booked_by, purpose, attendees_count, notes
                     )
-                    if success:
+                except sqlite3.Error:
+                    st.error("❌ Failed to book room")
+                else:
+                    if conflicts:
+                        st.error("❌ Room already booked for this time slot")
+                        for conflict in conflicts:
+                            st.write(f"⏰ {conflict['start_time']} - {conflict['end_time']} · "
+                                     f"👤 {conflict['booked_by']} · {conflict['purpose']}")
+                    else:
                         st.success("✅ Room booked successfully!")
                         st.rerun()
-                    else:
-                        st.error("❌ Failed to book room")
     
     # Display today's bookings
     st.markdown("### 📋 Today's Bookings")
@@ -1541,7 +932,9 @@ def show_room_bookings_overview():
             ["All", "Today", "This Week", "This Month", "Upcoming", "Past"]
         )
     with col2:
-        room_filter = st.text_input("Filter by Room Name", "")
+        room_names = {r['id']: r['room_name'] for r in space.get_rooms(active_only=False)}
+        room_filter = st.selectbox("Filter by Room", [None] + list(room_names),
+                                   format_func=lambda room_id: "All" if room_id is None else room_names[room_id])
     with col3:
         status_filter = st.selectbox(
             "Filter by Status",
@@ -1562,9 +955,9 @@ def show_room_bookings_overview():
     '''
     params = [start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')]
     
-    if room_filter:
-        query += " AND room_name LIKE ?"
-        params.append(f"%{room_filter}%")
+    if room_filter is not None:
+        query += " AND room_id = ?"
+        params.append(room_filter)
     
     if status_filter != "All":
         query += " AND status = ?"
@@ -1655,23 +1048,25 @@ def show_space_analytics():
         create_metric_card("Total Bookings", total_bookings, "📅")
     
     with col2:
-        unique_rooms = df['room_name'].nunique()
+        unique_rooms = df['room_id'].nunique()
         create_metric_card("Rooms Used", unique_rooms, "🏢")
     
     with col3:
         avg_attendees = df['attendees_count'].mean()
         create_metric_card("Avg Attendees", f"{avg_attendees:.0f}", "👥")
     
+    # Merged occupied minutes against opening hours, from the hourly occupancy table
+    utilization = space.get_room_utilization(start_date, end_date)
+    
     with col4:
-        utilization_rate = (len(df) / 30) * 10  # Simplified utilization metric
-        create_metric_card("Utilization", f"{utilization_rate:.1f}%", "📈")
+        create_metric_card("Utilization", f"{utilization['overall']:.1f}%", "📈")
     
     st.divider()
     
     # Room usage chart
     st.markdown("#### 🏢 Room Usage Frequency")
-    room_counts = df['room_name'].value_counts().reset_index()
-    room_counts.columns = ['Room', 'Bookings']
+    room_counts = (df.groupby('room_id').agg(Room=('room_name', 'first'), Bookings=('id', 'size'))
+                   .sort_values('Bookings', ascending=False))
     
     fig1 = px.bar(room_counts, x='Room', y='Bookings', 
                   title="Number of Bookings per Room (Last 30 Days)",
@@ -1680,8 +1075,10 @@ def show_space_analytics():
     
     # Daily bookings trend
     st.markdown("#### 📈 Daily Bookings Trend")
-    df['booking_date'] = pd.to_datetime(df['booking_date'])
-    daily_counts = df.groupby('booking_date').size().reset_index(name='Bookings')
+    daily_counts = db.query_time_buckets(
+        'room_bookings', 'booking_date', 'day',
+        where="status != 'Cancelled'", start=start_date, end=end_date
+    ).rename(columns={'bucket': 'booking_date', 'count': 'Bookings'})
     
     fig2 = px.line(daily_counts, x='booking_date', y='Bookings',
                    title="Daily Bookings Trend",
@@ -1709,6 +1106,41 @@ def show_space_analytics():
                   title="Bookings by Hour of Day",
                   labels={'Hour': 'Hour of Day (24h)'})
     st.plotly_chart(fig4, use_container_width=True)
+    
+    # Occupancy against opening hours
+    st.markdown("#### 🕒 Room Occupancy")
+    st.caption(f"Share of opening hours ({space.OPEN_HOUR:02d}:00-{space.CLOSE_HOUR:02d}:00) each room was in use")
+    
+    by_room = utilization['by_room'].sort_values('utilization', ascending=False)
+    fig5 = px.bar(by_room, x='room_name', y='utilization',
+                  title="Utilization per Room (Last 30 Days)",
+                  labels={'room_name': 'Room', 'utilization': 'Utilization (%)'})
+    st.plotly_chart(fig5, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        fig6 = px.imshow(utilization['by_weekday'], aspect='auto', color_continuous_scale='blues',
+                         title="Occupancy by Weekday (%)",
+                         labels={'x': 'Weekday', 'y': 'Room', 'color': 'Occupancy (%)'})
+        st.plotly_chart(fig6, use_container_width=True)
+    with col2:
+        fig7 = px.imshow(utilization['by_hour'], aspect='auto', color_continuous_scale='blues',
+                         title="Occupancy by Hour of Day (%)",
+                         labels={'x': 'Hour of Day (24h)', 'y': 'Room', 'color': 'Occupancy (%)'})
+        st.plotly_chart(fig7, use_container_width=True)
+    
+    # Headcount against capacity
+    st.markdown("#### 💺 Seat Fill")
+    st.caption("Attendees as a share of each room's capacity while booked, over bookings with a headcount")
+    
+    seat_fill = by_room.dropna(subset=['seat_fill']).sort_values('seat_fill', ascending=False)
+    if seat_fill.empty:
+        st.info("📭 No bookings with a headcount in rooms of known capacity")
+    else:
+        fig8 = px.bar(seat_fill, x='room_name', y='seat_fill', hover_data=['capacity'],
+                      title="Seat Fill per Room (Last 30 Days)",
+                      labels={'room_name': 'Room', 'seat_fill': 'Seat Fill (%)', 'capacity': 'Capacity'})
+        st.plotly_chart(fig8, use_container_width=True)
 
 # =============================================
 # PPM MANAGEMENT - FACILITY USER
@@ -1778,9 +1210,10 @@ def show_new_ppm_schedule():
 
 def show_ppm_schedules():
     st.markdown("### 📋 PPM Schedules Overview")
+    show_bulk_ppm_assignment("ppm_schedules")
     
     # Status filter buttons
-    col1, col2, col3, col4, col5 = st.columns(5)
+    col1, col2, col3, col4, col5, col6 = st.columns(6)
     with col1:
         if st.button("All", use_container_width=True):
             st.session_state.ppm_filter = "All"
@@ -1794,6 +1227,9 @@ def show_ppm_schedules():
         if st.button("Due", use_container_width=True):
             st.session_state.ppm_filter = "Due"
     with col5:
+        if st.button("Overdue", use_container_width=True):
+            st.session_state.ppm_filter = "Overdue"
+    with col6:
         if st.button("Completed", use_container_width=True):
             st.session_state.ppm_filter = "Completed"
     
@@ -1839,28 +1275,32 @@ def show_ppm_schedules():
                     if st.button("✅ Assign", use_container_width=True):
                         vendor_username = vendor_options[selected_vendor_desc]
                         
-                        # Update PPM schedule
-                        execute_update(
-                            '''UPDATE ppm_schedules 
-                            SET assigned_vendor = ?, status = 'WIP' 
-                            WHERE id = ?''',
-                            (vendor_username, schedule_id)
-                        )
-                        
-                        # Create assignment record
-                        execute_update(
-                            '''INSERT INTO ppm_assignments 
-                            (schedule_id, vendor_username, assigned_date, due_date, assigned_by) 
-                            VALUES (?, ?, ?, ?, ?)''',
-                            (schedule_id, vendor_username, 
-                             datetime.now().strftime('%Y-%m-%d'),
-                             due_date.strftime('%Y-%m-%d'),
-                             st.session_state.user['username'])
-                        )
-                        
-                        st.success("✅ PPM assigned to vendor successfully!")
-                        del st.session_state.assigning_schedule_id
-                        st.rerun()
+                        try:
+                            with transaction():
+                                # Update PPM schedule
+                                execute_update(
+                                    '''UPDATE ppm_schedules 
+                                    SET assigned_vendor = ?, status = 'WIP' 
+                                    WHERE id = ?''',
+                                    (vendor_username, schedule_id)
+                                )
+                                
+                                # Create assignment record
+                                execute_update(
+                                    '''INSERT INTO ppm_assignments 
+                                    (schedule_id, vendor_username, assigned_date, due_date, assigned_by) 
+                                    VALUES (?, ?, ?, ?, ?)''',
+                                    (schedule_id, vendor_username, 
+                                     datetime.now().strftime('%Y-%m-%d'),
+                                     due_date.strftime('%Y-%m-%d'),
+                                     st.session_state.user['username'])
+                                )
+                        except sqlite3.Error:
+                            st.error("❌ Failed to assign PPM")
+                        else:
+                            st.success("✅ PPM assigned to vendor successfully!")
+                            del st.session_state.assigning_schedule_id
+                            st.rerun()
                 
                 with col2:
                     if st.button("❌ Cancel", use_container_width=True):
@@ -1881,6 +1321,7 @@ def show_ppm_schedules():
                     "Not Due": "status-not-due",
                     "Prepare": "status-prepare",
                     "Due": "status-due",
+                    "Overdue": "status-overdue",
                     "Completed": "status-completed",
                     "WIP": "status-wip",
                     "Approved": "status-approved"
@@ -1922,7 +1363,7 @@ def show_ppm_schedules():
                             st.rerun()
                     
                     with col2:
-                        if safe_get(schedule, 'status') in ['Prepare', 'Due'] and st.button("⚡ Assign to Vendor", key=f"assign_{schedule['id']}"):
+                        if safe_get(schedule, 'status') in ['Prepare', 'Due', 'Overdue'] and st.button("⚡ Assign to Vendor", key=f"assign_{schedule['id']}"):
                             st.session_state.assigning_schedule_id = schedule['id']
                             st.rerun()
                     
@@ -1938,15 +1379,13 @@ def show_ppm_schedules():
                         
                         # PDF Download for completed PPM
                         if safe_get(schedule, 'status') == 'Completed':
-                            pdf_buffer = create_ppm_pdf_report(schedule['id'])
-                            if pdf_buffer:
-                                st.download_button(
-                                    label="📥 Download PPM Report",
-                                    data=pdf_buffer,
-                                    file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                                    mime="application/pdf",
-                                    key=f"ppm_pdf_{schedule['id']}"
-                                )
+                            st.download_button(
+                                label="📥 Download PPM Report",
+                                data=lazy_pdf(create_ppm_pdf_report, schedule['id']),
+                                file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                                mime="application/pdf",
+                                key=f"ppm_pdf_{schedule['id']}"
+                            )
         else:
             st.info("📭 No PPM schedules found")
 
@@ -1954,14 +1393,16 @@ def show_ppm_analytics():
     st.markdown("### 📊 PPM Analytics Dashboard")
     
     # Get all PPM schedules
-    schedules = execute_query("SELECT * FROM ppm_schedules")
+    df = execute_query_df(
+        "SELECT * FROM ppm_schedules",
+        columns=['status', 'facility_category', 'estimated_cost', 'next_maintenance_date'],
+        dtypes={'estimated_cost': 'float64', 'next_maintenance_date': 'datetime64[ns]'}
+    )
     
-    if not schedules:
+    if df.empty:
         st.info("📭 No PPM data available for analytics")
         return
     
-    df = pd.DataFrame(schedules)
-    
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
     
@@ -1970,7 +1411,7 @@ def show_ppm_analytics():
         create_metric_card("Total PPMs", total_ppm, "📅")
     
     with col2:
-        due_ppm = len(df[df['status'] == 'Due'])
+        due_ppm = len(df[df['status'].isin(['Due', 'Overdue'])])
         create_metric_card("Due Now", due_ppm, "⚠️")
     
     with col3:
@@ -1997,7 +1438,6 @@ def show_ppm_analytics():
     
     # Monthly due schedule
     st.markdown("#### 📅 Monthly Due Schedule")
-    df['next_maintenance_date'] = pd.to_datetime(df['next_maintenance_date'])
     current_month = datetime.now().month
     current_year = datetime.now().year
     
@@ -2023,6 +1463,46 @@ def show_ppm_analytics():
                   title="Estimated Cost Distribution",
                   labels={'estimated_cost': 'Estimated Cost (₦)', 'facility_category': 'Facility Category'})
     st.plotly_chart(fig3, use_container_width=True)
+    
+    # Workload forecast from every open schedule's cadence
+    st.markdown(f"#### 🗓️ {ppm.PROJECTION_MONTHS}-Month Workload Forecast")
+    projection = ppm.get_workload_projection()
+    weekly = projection['weekly']
+    
+    if weekly.empty:
+        st.info("📭 No open PPM schedules to project")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        create_metric_card("Projected Visits", int(weekly['occurrences'].sum()), "🔁")
+    with col2:
+        create_metric_card("Projected Hours", f"{weekly['hours'].sum():,.0f}", "⏱️")
+    with col3:
+        create_metric_card("Projected Cost", format_ngn(weekly['cost'].sum()), "💰")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        group_by = st.radio("Group by", ["Facility Category", "Vendor"], horizontal=True, key="ppm_forecast_group")
+    with col2:
+        measure = st.radio("Measure", ["Hours", "Cost", "Visits"], horizontal=True, key="ppm_forecast_measure")
+    
+    group_column = 'facility_category' if group_by == "Facility Category" else 'assigned_vendor'
+    value_column = {'Hours': 'hours', 'Cost': 'cost', 'Visits': 'occurrences'}[measure]
+    
+    heatmap = weekly.pivot_table(index=group_column, columns='week', values=value_column,
+                                 aggfunc='sum', fill_value=0)
+    heatmap.columns = heatmap.columns.strftime('%d %b %Y')
+    fig4 = px.imshow(heatmap, aspect='auto', color_continuous_scale='oranges',
+                     title=f"Projected {measure} per Week by {group_by}",
+                     labels={'x': 'Week Starting', 'y': group_by, 'color': measure})
+    st.plotly_chart(fig4, use_container_width=True)
+    
+    totals = weekly.groupby(['week', group_column], as_index=False)[value_column].sum()
+    fig5 = px.bar(totals, x='week', y=value_column, color=group_column,
+                  title=f"Weekly Projected {measure}",
+                  labels={'week': 'Week Starting', value_column: measure, group_column: group_by})
+    st.plotly_chart(fig5, use_container_width=True)
 
 def show_ppm_approvals_facility_user():
     """Facility user approval for PPM completion"""
@@ -2087,20 +1567,26 @@ def show_ppm_approvals_facility_user():
                         placeholder="What needs to be revised?"
                     )
                     if revision_reason:
-                        execute_update(
-                            '''UPDATE ppm_schedules SET status = 'WIP' WHERE id = ?''',
-                            (schedule['id'],)
-                        )
-                        execute_update(
-                            '''UPDATE ppm_assignments SET status = 'In Progress', 
-                            completion_notes = ? WHERE schedule_id = ?''',
-                            (f"Revision requested: {revision_reason}", schedule['id'])
-                        )
-                        st.success("✅ Revision requested from vendor")
-                        st.rerun()
+                        try:
+                            with transaction():
+                                execute_update(
+                                    '''UPDATE ppm_schedules SET status = 'WIP' WHERE id = ?''',
+                                    (schedule['id'],)
+                                )
+                                execute_update(
+                                    '''UPDATE ppm_assignments SET status = 'In Progress', 
+                                    completion_notes = ? WHERE schedule_id = ?''',
+                                    (f"Revision requested: {revision_reason}", schedule['id'])
+                                )
+                        except sqlite3.Error:
+                            st.error("❌ Failed to request revision")
+                        else:
+                            st.success("✅ Revision requested from vendor")
+                            st.rerun()
 
 def show_ppm_management_facility_user():
     st.markdown("<h1 class='app-title'>📅 Planned Preventive Maintenance</h1>", unsafe_allow_html=True)
+    catch_up_ppm_occurrences()
     
     tab1, tab2, tab3, tab4 = st.tabs(["📋 PPM Schedules", "➕ New Schedule", "📊 PPM Analytics", "✅ PPM Approvals"])
     
@@ -2224,8 +1710,7 @@ def show_generator_records():
         end_date = st.date_input("End Date", value=datetime.now())
     
     # Generator type filter
-    generator_types = execute_query("SELECT DISTINCT generator_type FROM generator_records")
-    generator_type_list = ["All"] + [g['generator_type'] for g in generator_types if g['generator_type']]
+    generator_type_list = ["All"] + generator_analytics.get_generator_types()
     
     selected_type = st.selectbox("Filter by Generator Type", generator_type_list)
     
@@ -2247,8 +1732,6 @@ def show_generator_records():
     if records:
         # Convert to DataFrame for display
         df_data = []
-        total_hours = 0
-        total_diesel = 0
         
         for record in records:
             net_hours = safe_float(record.get('net_hours'), 0)
@@ -2265,19 +1748,22 @@ def show_generator_records():
                 "Net Diesel": f"{net_diesel:.1f}L",
                 "Recorded By": record.get('recorded_by', '')
             })
-            
-            total_hours += net_hours
-            total_diesel += net_diesel
         
         df = pd.DataFrame(df_data)
         st.dataframe(df, use_container_width=True, hide_index=True)
         
-        # Summary statistics
+        # Summary statistics from the daily/monthly rollups
+        totals = generator_analytics.get_generator_totals(
+            start_date, end_date, None if selected_type == "All" else selected_type
+        )
+        total_hours = totals['net_hours']
+        total_diesel = totals['net_diesel']
+        
         st.markdown("#### 📊 Summary Statistics")
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Records", len(records))
+            st.metric("Total Records", totals['record_count'])
         with col2:
             st.metric("Total Hours Run", f"{total_hours:.1f}")
         with col3:
@@ -2304,36 +1790,30 @@ def show_generator_records():
 def show_generator_analytics():
     st.markdown("### 📊 Generator Analytics")
     
-    # Get data for the last 90 days
+    # Get data for the last 90 days from the daily/monthly rollups
     end_date = datetime.now()
     start_date = end_date - timedelta(days=90)
     
-    records = execute_query('''
-        SELECT * FROM generator_records 
-        WHERE record_date BETWEEN ? AND ?
-        ORDER BY record_date
-    ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+    monthly_data = generator_analytics.get_generator_monthly(start_date, end_date)
     
-    if not records:
+    if monthly_data.empty:
         st.info("📭 No generator data available for analytics")
         return
     
-    df = pd.DataFrame(records)
-    df['record_date'] = pd.to_datetime(df['record_date'])
-    
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_hours = df['net_hours'].sum()
+        total_hours = monthly_data['net_hours'].sum()
         create_metric_card("Total Hours", f"{total_hours:.0f}", "⏱️")
     
     with col2:
-        total_diesel = df['net_diesel_consumed'].sum()
+        total_diesel = monthly_data['net_diesel'].sum()
         create_metric_card("Total Diesel", f"{total_diesel:.0f}L", "⛽")
     
     with col3:
-        avg_daily_hours = total_hours / len(df['record_date'].unique()) if len(df['record_date'].unique()) > 0 else 0
+        active_days = monthly_data['active_days'].sum()
+        avg_daily_hours = total_hours / active_days if active_days > 0 else 0
         create_metric_card("Avg Daily Hours", f"{avg_daily_hours:.1f}", "📈")
     
     with col4:
@@ -2347,10 +1827,9 @@ def show_generator_analytics():
     
     # Daily hours trend
     st.markdown("#### 📈 Daily Running Hours Trend")
-    daily_data = df.groupby('record_date').agg({
-        'net_hours': 'sum',
-        'net_diesel_consumed': 'sum'
-    }).reset_index()
+    daily_data = generator_analytics.get_generator_daily(start_date, end_date).rename(
+        columns={'net_diesel': 'net_diesel_consumed'}
+    )
     
     fig1 = px.line(daily_data, x='record_date', y='net_hours',
                    title="Daily Generator Running Hours",
@@ -2362,12 +1841,15 @@ def show_generator_analytics():
     
     if total_hours > 0:
         # Calculate consumption rate
-        daily_data['consumption_rate'] = daily_data['net_diesel_consumed'] / daily_data['net_hours']
+        daily_data['consumption_rate'] = daily_data['net_diesel_consumed'] / daily_data['net_hours'].where(daily_data['net_hours'] > 0)
         
         fig2 = px.scatter(daily_data, x='net_hours', y='net_diesel_consumed',
                          title="Hours vs Diesel Consumption",
-                         labels={'net_hours': 'Running Hours', 'net_diesel_consumed': 'Diesel (L)'},
-                         trendline="ols")
+                         labels={'net_hours': 'Running Hours', 'net_diesel_consumed': 'Diesel (L)'})
+        daily_fit = generator_analytics.fit_line(daily_data['net_hours'], daily_data['net_diesel_consumed'])
+        trend_x, trend_y = generator_analytics.trendline_points(daily_fit, daily_data['net_hours'])
+        if trend_x is not None:
+            fig2.add_scatter(x=trend_x, y=trend_y, mode='lines', name='OLS trend', showlegend=False)
         st.plotly_chart(fig2, use_container_width=True)
         
         # Show correlation
@@ -2376,11 +1858,7 @@ def show_generator_analytics():
     
     # Monthly summary
     st.markdown("#### 📅 Monthly Summary")
-    df['month'] = df['record_date'].dt.strftime('%Y-%m')
-    monthly_data = df.groupby('month').agg({
-        'net_hours': 'sum',
-        'net_diesel_consumed': 'sum'
-    }).reset_index()
+    monthly_data = monthly_data.rename(columns={'net_diesel': 'net_diesel_consumed'})
     
     fig3 = px.bar(monthly_data, x='month', y=['net_hours', 'net_diesel_consumed'],
                   title="Monthly Hours and Diesel Usage",
@@ -2635,15 +2113,13 @@ def show_vendor_assigned_jobs(vendor_username):
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        pdf_buffer = create_maintenance_pdf_report(job['id'])
-                        if pdf_buffer:
-                            st.download_button(
-                                label="📥 Download Job Report",
-                                data=pdf_buffer,
-                                file_name=f"job_report_{job['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                                mime="application/pdf",
-                                key=f"job_pdf_{job['id']}"
-                            )
+                        st.download_button(
+                            label="📥 Download Job Report",
+                            data=lazy_pdf(create_maintenance_pdf_report, job['id']),
+                            file_name=f"job_report_{job['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                            mime="application/pdf",
+                            key=f"job_pdf_{job['id']}"
+                        )
                     
                     with col2:
                         # Check if invoice already exists
@@ -2762,63 +2238,69 @@ def show_invoice_form(vendor_username, selected_job_id, job):
     # Check if invoice was just submitted
     if 'last_submitted_invoice' in st.session_state:
         invoice_id = st.session_state.last_submitted_invoice
-        pdf_buffer = create_invoice_pdf(invoice_id)
-        if pdf_buffer:
-            st.download_button(
-                label="📥 Download Invoice PDF",
-                data=pdf_buffer,
-                file_name=f"invoice_{invoice_number}.pdf",
-                mime="application/pdf",
-                key=f"download_invoice_{invoice_id}"
-            )
+        st.download_button(
+            label="📥 Download Invoice PDF",
+            data=lazy_pdf(create_invoice_pdf, invoice_id),
+            file_name=f"invoice_{invoice_number}.pdf",
+            mime="application/pdf",
+            key=f"download_invoice_{invoice_id}"
+        )
     
     # Handle form submission logic OUTSIDE the form
     if submitted:
         if not details_of_work:
             st.error("❌ Please provide details of work")
         else:
-            # Check if invoice number already exists
-            existing_invoice = execute_query(
-                'SELECT * FROM invoices WHERE invoice_number = ?',
-                (invoice_number,)
-            )
+            # Number check, insert, request update and id lookup commit together
+            success = False
+            try:
+                with transaction():
+                    # Check if invoice number already exists
+                    existing_invoice = execute_query(
+                        'SELECT * FROM invoices WHERE invoice_number = ?',
+                        (invoice_number,)
+                    )
+                    
+                    if not existing_invoice:
+                        execute_update(
+                            '''INSERT INTO invoices 
+                            (invoice_number, request_id, vendor_username, invoice_date,
+                             details_of_work, quantity, unit_cost, amount, labour_charge,
+                             vat_applicable, vat_amount, total_amount) 
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                            (invoice_number, selected_job_id, vendor_username,
+                             invoice_date.strftime('%Y-%m-%d'), details_of_work,
+                             quantity, unit_cost, amount, labour_charge,
+                             1 if vat_applicable else 0, vat_amount, total_amount)
+                        )
+                        
+                        # Update request with invoice info
+                        execute_update(
+                            '''UPDATE maintenance_requests 
+                            SET invoice_amount = ?, invoice_number = ? 
+                            WHERE id = ?''',
+                            (total_amount, invoice_number, selected_job_id)
+                        )
+                        
+                        # Get the invoice ID for PDF download
+                        new_invoice = execute_query(
+                            'SELECT id FROM invoices WHERE invoice_number = ?',
+                            (invoice_number,)
+                        )
+                        success = True
+            except sqlite3.Error:
+                existing_invoice = None
             
             if existing_invoice:
                 st.error("❌ Invoice number already exists. Please try again.")
             else:
-                success = execute_update(
-                    '''INSERT INTO invoices 
-                    (invoice_number, request_id, vendor_username, invoice_date,
-                     details_of_work, quantity, unit_cost, amount, labour_charge,
-                     vat_applicable, vat_amount, total_amount) 
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                    (invoice_number, selected_job_id, vendor_username,
-                     invoice_date.strftime('%Y-%m-%d'), details_of_work,
-                     quantity, unit_cost, amount, labour_charge,
-                     1 if vat_applicable else 0, vat_amount, total_amount)
-                )
-                
                 if success:
                     st.success("✅ Invoice submitted successfully!")
                     
-                    # Update request with invoice info
-                    execute_update(
-                        '''UPDATE maintenance_requests 
-                        SET invoice_amount = ?, invoice_number = ? 
-                        WHERE id = ?''',
-                        (total_amount, invoice_number, selected_job_id)
-                    )
-                    
                     # Clear the selected job if it was set
                     if 'selected_job_for_invoice' in st.session_state:
                         st.session_state.selected_job_for_invoice = None
                     
-                    # Get the invoice ID for PDF download
-                    new_invoice = execute_query(
-                        'SELECT id FROM invoices WHERE invoice_number = ?',
-                        (invoice_number,)
-                    )
-                    
                     if new_invoice:
                         invoice_id = new_invoice[0]['id']
                         # Store in session state to show download button
@@ -2903,119 +2385,89 @@ def show_vendor_ppm_assignments(vendor_username):
                         if new_status == 'Completed' and not completion_notes:
                             st.error("❌ Please provide completion notes")
                         else:
-                            update_success = execute_update(
-                                '''UPDATE ppm_assignments 
-                                SET status = ?, completion_notes = ?, completed_date = ?
-                                WHERE id = ?''',
-                                (new_status, completion_notes,
-                                 datetime.now().strftime('%Y-%m-%d') if new_status == 'Completed' else None,
-                                 assignment['id'])
-                            )
-                            
-                            if update_success:
-                                # Also update the main PPM schedule
-                                execute_update(
-                                    '''UPDATE ppm_schedules 
-                                    SET status = ?, actual_completion_date = ?, 
-                                        actual_cost = ?, notes = ?
-                                    WHERE id = ?''',
-                                    (new_status, 
-                                     datetime.now().strftime('%Y-%m-%d') if new_status == 'Completed' else None,
-                                     actual_cost,
-                                     completion_notes,
-                                     assignment['schedule_id'])
-                                )
-                                
+                            try:
+                                with transaction():
+                                    execute_update(
+                                        '''UPDATE ppm_assignments 
+                                        SET status = ?, completion_notes = ?, completed_date = ?
+                                        WHERE id = ?''',
+                                        (new_status, completion_notes,
+                                         datetime.now().strftime('%Y-%m-%d') if new_status == 'Completed' else None,
+                                         assignment['id'])
+                                    )
+                                    
+                                    # Also update the main PPM schedule
+                                    execute_update(
+                                        '''UPDATE ppm_schedules 
+                                        SET status = ?, actual_completion_date = ?, 
+                                            actual_cost = ?, notes = ?
+                                        WHERE id = ?''',
+                                        (new_status, 
+                                         datetime.now().strftime('%Y-%m-%d') if new_status == 'Completed' else None,
+                                         actual_cost,
+                                         completion_notes,
+                                         assignment['schedule_id'])
+                                    )
+                                    
+                                    # Recurring schedules get their next cycle in the same commit
+                                    if new_status == 'Completed':
+                                        ppm.generate_next_occurrences([assignment['schedule_id']])
+                            except sqlite3.Error:
+                                st.error("❌ Failed to update assignment")
+                            else:
                                 st.success("✅ Assignment updated successfully!")
                                 st.rerun()
-                            else:
-                                st.error("❌ Failed to update assignment")
                 
                 # Show PDF download for completed PPM
                 if assignment['status'] == 'Completed':
-                    pdf_buffer = create_ppm_pdf_report(assignment['schedule_id'])
-                    if pdf_buffer:
-                        st.download_button(
-                            label="📥 Download PPM Report",
-                            data=pdf_buffer,
-                            file_name=f"ppm_report_{assignment['schedule_id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                            mime="application/pdf",
-                            key=f"ppm_pdf_{assignment['id']}"
-                        )
+                    st.download_button(
+                        label="📥 Download PPM Report",
+                        data=lazy_pdf(create_ppm_pdf_report, assignment['schedule_id']),
+                        file_name=f"ppm_report_{assignment['schedule_id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        key=f"ppm_pdf_{assignment['id']}"
+                    )
     else:
         st.info("📭 No PPM assignments found")
 
 def show_vendor_performance(vendor_username):
     st.markdown("### 📊 Performance Analytics")
     
-    # Get performance data
-    jobs_data = execute_query('''
-        SELECT * FROM maintenance_requests 
-        WHERE assigned_vendor = ?
-        ORDER BY created_date DESC
-    ''', (vendor_username,))
-    
-    invoices_data = execute_query('''
-        SELECT * FROM invoices 
-        WHERE vendor_username = ?
-        ORDER BY invoice_date DESC
-    ''', (vendor_username,))
+    # Headline figures from the vendor's scorecard, trends aggregated per month in SQLite
+    scorecard = kpis.get_vendor_scorecards().get(vendor_username)
     
-    if not jobs_data:
+    if not scorecard or not scorecard['jobs_assigned']:
         st.info("📭 No performance data available")
         return
     
-    df_jobs = pd.DataFrame(jobs_data)
-    df_invoices = pd.DataFrame(invoices_data) if invoices_data else pd.DataFrame()
-    
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_jobs = len(df_jobs)
-        create_metric_card("Total Jobs", total_jobs, "📋")
+        create_metric_card("Total Jobs", scorecard['jobs_assigned'], "📋")
     
     with col2:
-        completed_jobs = len(df_jobs[df_jobs['status'] == 'Completed'])
-        completion_rate = (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
-        create_metric_card("Completion Rate", f"{completion_rate:.1f}%", "✅")
+        create_metric_card("Completion Rate", f"{scorecard['completion_rate']:.1f}%", "✅")
     
     with col3:
-        if not df_invoices.empty:
-            total_revenue = df_invoices['total_amount'].sum()
-            create_metric_card("Total Revenue", format_ngn(total_revenue), "💰")
-        else:
-            create_metric_card("Total Revenue", "₦0", "💰")
+        create_metric_card("Total Revenue", format_ngn(scorecard['invoiced_total']), "💰")
     
     with col4:
-        # Calculate average completion time
-        completed_df = df_jobs[df_jobs['status'] == 'Completed']
-        if not completed_df.empty and 'created_date' in completed_df.columns and 'completed_date' in completed_df.columns:
-            try:
-                completed_df['created_date'] = pd.to_datetime(completed_df['created_date'])
-                completed_df['completed_date'] = pd.to_datetime(completed_df['completed_date'])
-                completed_df['completion_time'] = (completed_df['completed_date'] - completed_df['created_date']).dt.days
-                avg_time = completed_df['completion_time'].mean()
-                create_metric_card("Avg Time", f"{avg_time:.1f} days", "⏱️")
-            except:
-                create_metric_card("Avg Time", "N/A", "⏱️")
-        else:
-            create_metric_card("Avg Time", "N/A", "⏱️")
+        avg_time = scorecard['avg_turnaround_days']
+        create_metric_card("Avg Time", f"{avg_time:.1f} days" if avg_time is not None else "N/A", "⏱️")
     
     st.divider()
     
     # Monthly job completion trend
     st.markdown("#### 📈 Monthly Performance")
     
-    if not df_jobs.empty and 'created_date' in df_jobs.columns:
-        df_jobs['created_date'] = pd.to_datetime(df_jobs['created_date'])
-        df_jobs['month'] = df_jobs['created_date'].dt.strftime('%Y-%m')
-        
-        monthly_stats = df_jobs.groupby('month').agg({
-            'id': 'count',
-            'status': lambda x: (x == 'Completed').sum()
-        }).reset_index()
-        
+    monthly_stats = db.query_time_buckets(
+        'maintenance_requests', 'created_date', 'month',
+        where='assigned_vendor = ?', params=(vendor_username,),
+        counts={'completed': "status = 'Completed'"}
+    )
+    
+    if not monthly_stats.empty:
         monthly_stats.columns = ['Month', 'Total Jobs', 'Completed Jobs']
         monthly_stats['Completion Rate'] = (monthly_stats['Completed Jobs'] / monthly_stats['Total Jobs'] * 100).round(1)
         
@@ -3026,18 +2478,19 @@ def show_vendor_performance(vendor_username):
         st.plotly_chart(fig, use_container_width=True)
     
     # Revenue trend if invoices exist
-    if not df_invoices.empty and 'invoice_date' in df_invoices.columns:
+    monthly_revenue = db.query_time_buckets(
+        'invoices', 'invoice_date', 'month',
+        where='vendor_username = ?', params=(vendor_username,),
+        sums={'total_amount': 'total_amount'}
+    )
+    
+    if not monthly_revenue.empty:
         st.markdown("#### 💰 Revenue Trend")
         
-        df_invoices['invoice_date'] = pd.to_datetime(df_invoices['invoice_date'])
-        df_invoices['month'] = df_invoices['invoice_date'].dt.strftime('%Y-%m')
-        
-        monthly_revenue = df_invoices.groupby('month')['total_amount'].sum().reset_index()
-        
-        fig2 = px.line(monthly_revenue, x='month', y='total_amount',
+        fig2 = px.line(monthly_revenue, x='bucket', y='total_amount',
                        title="Monthly Revenue",
                        markers=True,
-                       labels={'total_amount': 'Revenue (₦)', 'month': 'Month'})
+                       labels={'total_amount': 'Revenue (₦)', 'bucket': 'Month'})
         st.plotly_chart(fig2, use_container_width=True)
 
 def show_vendor_profile_update(vendor, vendor_username):
@@ -3118,18 +2571,12 @@ def show_facility_manager_dashboard():
     # Comprehensive metrics
     col1, col2, col3, col4 = st.columns(4)
     
-    # Get statistics
-    total_requests = execute_query('SELECT COUNT(*) as count FROM maintenance_requests')
-    total_count = total_requests[0]['count'] if total_requests else 0
-    
-    pending_requests = execute_query("SELECT COUNT(*) as count FROM maintenance_requests WHERE status = 'Pending'")
-    pending_count = pending_requests[0]['count'] if pending_requests else 0
-    
-    completed_requests = execute_query("SELECT COUNT(*) as count FROM maintenance_requests WHERE status = 'Completed'")
-    completed_count = completed_requests[0]['count'] if completed_requests else 0
-    
-    approved_requests = execute_query("SELECT COUNT(*) as count FROM maintenance_requests WHERE status = 'Approved'")
-    approved_count = approved_requests[0]['count'] if approved_requests else 0
+    # Get statistics from the trigger-maintained counters
+    status_counts = kpis.get_kpis('requests.status.')
+    total_count = kpis.get_kpi('requests.total')
+    pending_count = status_counts.get('Pending', 0)
+    completed_count = status_counts.get('Completed', 0)
+    approved_count = status_counts.get('Approved', 0)
     
     with col1:
         create_metric_card("Total Requests", total_count, "📋")
@@ -3172,20 +2619,24 @@ def show_facility_manager_dashboard():
 def show_manager_dashboard():
     st.markdown("### 📊 Comprehensive Analytics Dashboard")
     
-    # Get all data
-    requests = execute_query('SELECT * FROM maintenance_requests')
-    ppm_schedules = execute_query('SELECT * FROM ppm_schedules')
-    generator_records = execute_query('SELECT * FROM generator_records')
-    
-    if not requests:
+    # Request and PPM breakdowns come from the KPI counters and the generator
+    # fit from the cached consumption model, all loaded concurrently
+    data = db.load_parallel({
+        'total': lambda: kpis.get_kpi('requests.total'),
+        'status': lambda: pd.DataFrame(list(kpis.get_kpis('requests.status.').items()),
+                                       columns=['Status', 'Count']),
+        'priority': lambda: pd.DataFrame(list(kpis.get_kpis('requests.priority.').items()),
+                                         columns=['Priority', 'Count']),
+        'monthly': lambda: pd.DataFrame(list(kpis.get_kpis('requests.month.').items()),
+                                        columns=['month', 'Count']),
+        'ppm_vendors': kpis.get_ppm_vendor_completion,
+        'generator': generator_analytics.get_consumption_model,
+    }, label='Manager dashboard')
+    
+    if not data['total']:
         st.info("📭 No data available for dashboard")
         return
     
-    # Convert to DataFrames
-    df_requests = pd.DataFrame(requests)
-    df_ppm = pd.DataFrame(ppm_schedules) if ppm_schedules else pd.DataFrame()
-    df_generator = pd.DataFrame(generator_records) if generator_records else pd.DataFrame()
-    
     # Request analysis
     st.markdown("#### 📈 Request Analysis")
     
@@ -3193,8 +2644,7 @@ def show_manager_dashboard():
     
     with col1:
         # Status distribution
-        status_counts = df_requests['status'].value_counts().reset_index()
-        status_counts.columns = ['Status', 'Count']
+        status_counts = data['status']
         
         fig1 = px.pie(status_counts, values='Count', names='Status',
                       title="Request Status Distribution",
@@ -3203,8 +2653,7 @@ def show_manager_dashboard():
     
     with col2:
         # Priority distribution
-        priority_counts = df_requests['priority'].value_counts().reset_index()
-        priority_counts.columns = ['Priority', 'Count']
+        priority_counts = data['priority'].sort_values('Count', ascending=False)
         
         fig2 = px.bar(priority_counts, x='Priority', y='Count',
                       title="Requests by Priority",
@@ -3215,27 +2664,19 @@ def show_manager_dashboard():
     # Monthly trend
     st.markdown("#### 📅 Monthly Request Trend")
     
-    if 'created_date' in df_requests.columns:
-        df_requests['created_date'] = pd.to_datetime(df_requests['created_date'])
-        df_requests['month'] = df_requests['created_date'].dt.strftime('%Y-%m')
-        
-        monthly_requests = df_requests.groupby('month').size().reset_index(name='Count')
-        
+    monthly_requests = data['monthly']
+    if not monthly_requests.empty:
         fig3 = px.line(monthly_requests, x='month', y='Count',
                        title="Monthly Request Volume",
                        markers=True)
         st.plotly_chart(fig3, use_container_width=True)
     
     # Vendor performance if PPM data exists
-    if not df_ppm.empty:
+    ppm_vendors = data['ppm_vendors']
+    if ppm_vendors:
         st.markdown("#### 👷 Vendor Performance (PPM)")
         
-        vendor_performance = df_ppm.groupby('assigned_vendor').agg({
-            'id': 'count',
-            'status': lambda x: (x == 'Completed').sum()
-        }).reset_index()
-        
-        vendor_performance.columns = ['Vendor', 'Total Assignments', 'Completed']
+        vendor_performance = pd.DataFrame(ppm_vendors, columns=['Vendor', 'Total Assignments', 'Completed'])
         vendor_performance['Completion Rate'] = (vendor_performance['Completed'] / vendor_performance['Total Assignments'] * 100).round(1)
         
         fig4 = px.bar(vendor_performance, x='Vendor', y='Completion Rate',
@@ -3245,16 +2686,25 @@ def show_manager_dashboard():
         st.plotly_chart(fig4, use_container_width=True)
     
     # Generator efficiency if data exists
-    if not df_generator.empty and 'net_hours' in df_generator.columns and 'net_diesel_consumed' in df_generator.columns:
+    model = data['generator']
+    df_generator = model['points']
+    if not df_generator.empty:
         st.markdown("#### ⚡ Generator Efficiency Analysis")
         
-        # Calculate efficiency
-        df_generator['efficiency'] = df_generator['net_hours'] / df_generator['net_diesel_consumed'] if df_generator['net_diesel_consumed'].sum() > 0 else 0
-        
-        fig5 = px.scatter(df_generator, x='net_hours', y='net_diesel_consumed',
+        fig5 = px.scatter(df_generator, x='net_hours', y='net_diesel',
                          title="Generator Hours vs Diesel Consumption",
-                         trendline="ols")
+                         labels={'net_hours': 'Running Hours', 'net_diesel': 'Diesel (L)'})
+        trend_x, trend_y = generator_analytics.trendline_points(model['overall'], df_generator['net_hours'])
+        if trend_x is not None:
+            fig5.add_scatter(x=trend_x, y=trend_y, mode='lines', name='OLS trend', showlegend=False)
         st.plotly_chart(fig5, use_container_width=True)
+        
+        # Per-type fit and efficiency
+        fits = model['by_type'][['generator_type', 'records', 'slope', 'intercept', 'r2',
+                                 'residual_std', 'efficiency']].copy()
+        fits.columns = ['Generator Type', 'Records', 'L per Hour (slope)', 'Intercept (L)', 'R²',
+                        'Residual Std (L)', 'Hours per L']
+        st.dataframe(fits.round(3), use_container_width=True, hide_index=True)
 
 def show_manager_approvals():
     st.markdown("### ✅ Approval Queue")
@@ -3316,15 +2766,13 @@ def show_maintenance_request_approvals():
                         st.metric("Total", format_ngn(inv['total_amount']))
                 
                 # PDF Download
-                pdf_buffer = create_maintenance_pdf_report(request['id'])
-                if pdf_buffer:
-                    st.download_button(
-                        label="📥 Download Job Report",
-                        data=pdf_buffer,
-                        file_name=f"job_report_{request['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                        mime="application/pdf",
-                        key=f"manager_pdf_{request['id']}"
-                    )
+                st.download_button(
+                    label="📥 Download Job Report",
+                    data=lazy_pdf(create_maintenance_pdf_report, request['id']),
+                    file_name=f"job_report_{request['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                    mime="application/pdf",
+                    key=f"manager_pdf_{request['id']}"
+                )
                 
                 # Approval buttons
                 st.markdown("---")
@@ -3333,24 +2781,28 @@ def show_maintenance_request_approvals():
                 with col1:
                     if st.button("✅ Approve", key=f"manager_approve_{request['id']}", 
                                use_container_width=True):
-                        success = execute_update(
-                            '''UPDATE maintenance_requests 
-                            SET facilities_manager_approval = 1, 
-                                status = 'Approved',
-                                manager_approval_date = ?
-                            WHERE id = ?''',
-                            (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), request['id'])
-                        )
-                        
-                        if success and invoice:
-                            # Update invoice status
-                            execute_update(
-                                "UPDATE invoices SET status = 'Approved' WHERE request_id = ?",
-                                (request['id'],)
-                            )
-                        
-                        st.success("✅ Request approved successfully!")
-                        st.rerun()
+                        try:
+                            with transaction():
+                                execute_update(
+                                    '''UPDATE maintenance_requests 
+                                    SET facilities_manager_approval = 1, 
+                                        status = 'Approved',
+                                        manager_approval_date = ?
+                                    WHERE id = ?''',
+                                    (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), request['id'])
+                                )
+                                
+                                if invoice:
+                                    # Update invoice status
+                                    execute_update(
+                                        "UPDATE invoices SET status = 'Approved' WHERE request_id = ?",
+                                        (request['id'],)
+                                    )
+                        except sqlite3.Error:
+                            st.error("❌ Failed to approve request")
+                        else:
+                            st.success("✅ Request approved successfully!")
+                            st.rerun()
                 
                 with col2:
                     if st.button("❌ Reject", key=f"manager_reject_{request['id']}", 
@@ -3416,15 +2868,13 @@ def show_ppm_manager_approvals():
                 st.write(f"**Completion Notes:** {assignment['completion_notes']}")
             
             # PDF Download
-            pdf_buffer = create_ppm_pdf_report(schedule['id'])
-            if pdf_buffer:
-                st.download_button(
-                    label="📥 Download PPM Report",
-                    data=pdf_buffer,
-                    file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                    mime="application/pdf",
-                    key=f"manager_ppm_pdf_{schedule['id']}"
-                )
+            st.download_button(
+                label="📥 Download PPM Report",
+                data=lazy_pdf(create_ppm_pdf_report, schedule['id']),
+                file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                mime="application/pdf",
+                key=f"manager_ppm_pdf_{schedule['id']}"
+            )
             
             # Approval buttons
             col1, col2 = st.columns(2)
@@ -3464,11 +2914,11 @@ def show_vendor_management():
         # Vendor metrics
         col1, col2, col3, col4 = st.columns(4)
         
+        # Every per-vendor metric below comes from one scorecard lookup
+        scorecards = kpis.get_vendor_scorecards()
+        
         total_vendors = len(vendors)
-        active_vendors = execute_query(
-            "SELECT COUNT(DISTINCT assigned_vendor) as count FROM maintenance_requests WHERE assigned_vendor IS NOT NULL"
-        )
-        active_count = active_vendors[0]['count'] if active_vendors else 0
+        active_count = len([s for s in scorecards.values() if s['jobs_assigned'] > 0])
         
         with col1:
             create_metric_card("Total Vendors", total_vendors, "🏢")
@@ -3505,33 +2955,24 @@ def show_vendor_management():
                 # Performance stats
                 st.markdown("##### 📊 Performance Statistics")
                 
-                # Get vendor performance data
-                assigned_jobs = execute_query(
-                    'SELECT COUNT(*) as count FROM maintenance_requests WHERE assigned_vendor = ?',
-                    (vendor['username'],)
-                )
-                assigned_count = assigned_jobs[0]['count'] if assigned_jobs else 0
+                scorecard = scorecards.get(vendor['username'], {})
                 
-                completed_jobs = execute_query(
-                    'SELECT COUNT(*) as count FROM maintenance_requests WHERE assigned_vendor = ? AND status = ?',
-                    (vendor['username'], 'Completed')
-                )
-                completed_count = completed_jobs[0]['count'] if completed_jobs else 0
-                
-                total_invoices = execute_query(
-                    'SELECT SUM(total_amount) as total FROM invoices WHERE vendor_username = ? AND status = ?',
-                    (vendor['username'], 'Approved')
-                )
-                total_amount = total_invoices[0]['total'] if total_invoices and total_invoices[0]['total'] else 0
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Assigned Jobs", safe_int(scorecard.get('jobs_assigned')))
+                with col2:
+                    st.metric("Completion Rate", f"{safe_float(scorecard.get('completion_rate')):.1f}%")
+                with col3:
+                    st.metric("Total Revenue", format_ngn(scorecard.get('invoiced_approved')))
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
-                    st.metric("Assigned Jobs", assigned_count)
+                    turnaround = scorecard.get('avg_turnaround_days')
+                    st.metric("Avg Turnaround", f"{turnaround:.1f} days" if turnaround is not None else "N/A")
                 with col2:
-                    completion_rate = (completed_count / assigned_count * 100) if assigned_count > 0 else 0
-                    st.metric("Completion Rate", f"{completion_rate:.1f}%")
+                    st.metric("Pending Invoices", format_ngn(scorecard.get('invoiced_pending')))
                 with col3:
-                    st.metric("Total Revenue", format_ngn(total_amount))
+                    st.metric("PPM On Time", f"{safe_int(scorecard.get('ppm_on_time'))}/{safe_int(scorecard.get('ppm_completed'))}")
                 
                 # Action buttons
                 col1, col2 = st.columns(2)
@@ -3589,45 +3030,50 @@ def show_vendor_management():
                        new_username, new_password, new_services, new_address]):
                 st.error("❌ Please fill in all required fields (*)")
             else:
-                # Check if username exists
-                existing_user = execute_query(
-                    'SELECT * FROM users WHERE username = ?',
-                    (new_username,)
-                )
+                # User account and vendor record are created together or not at all
+                registered = False
+                try:
+                    with transaction():
+                        # Check if username exists
+                        existing_user = execute_query(
+                            'SELECT * FROM users WHERE username = ?',
+                            (new_username,)
+                        )
+                        
+                        if not existing_user:
+                            # Create user account
+                            execute_update(
+                                'INSERT INTO users (username, password_hash, role, vendor_type) VALUES (?, ?, ?, ?)',
+                                (new_username, new_password, 'vendor', new_vendor_type)
+                            )
+                            
+                            # Create vendor record
+                            execute_update(
+                                '''INSERT INTO vendors 
+                                (username, company_name, contact_person, email, phone, 
+                                 vendor_type, services_offered, annual_turnover, 
+                                 tax_identification_number, rc_number, address, certification) 
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                                (new_username, new_company, new_contact, new_email, new_phone,
+                                 new_vendor_type, new_services, new_turnover, new_tin,
+                                 new_rc, new_address, new_certification)
+                            )
+                            registered = True
+                except sqlite3.Error:
+                    existing_user = None
                 
                 if existing_user:
                     st.error("❌ Username already exists")
+                elif registered:
+                    st.success("✅ Vendor registered successfully!")
+                    st.info(f"**Login Credentials:** Username: {new_username} | Password: {new_password}")
+                    st.rerun()
                 else:
-                    # Create user account
-                    user_success = execute_update(
-                        'INSERT INTO users (username, password_hash, role, vendor_type) VALUES (?, ?, ?, ?)',
-                        (new_username, new_password, 'vendor', new_vendor_type)
-                    )
-                    
-                    if user_success:
-                        # Create vendor record
-                        vendor_success = execute_update(
-                            '''INSERT INTO vendors 
-                            (username, company_name, contact_person, email, phone, 
-                             vendor_type, services_offered, annual_turnover, 
-                             tax_identification_number, rc_number, address, certification) 
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                            (new_username, new_company, new_contact, new_email, new_phone,
-                             new_vendor_type, new_services, new_turnover, new_tin,
-                             new_rc, new_address, new_certification)
-                        )
-                        
-                        if vendor_success:
-                            st.success("✅ Vendor registered successfully!")
-                            st.info(f"**Login Credentials:** Username: {new_username} | Password: {new_password}")
-                            st.rerun()
-                        else:
-                            st.error("❌ Failed to create vendor record")
-                    else:
-                        st.error("❌ Failed to create user account")
+                    st.error("❌ Failed to register vendor")
 
 def show_manager_ppm_overview():
     st.markdown("### 📅 PPM Overview & Management")
+    catch_up_ppm_occurrences()
     
     # Get all PPM schedules
     schedules = execute_query('SELECT * FROM ppm_schedules ORDER BY next_maintenance_date')
@@ -3637,7 +3083,7 @@ def show_manager_ppm_overview():
         col1, col2, col3, col4 = st.columns(4)
         
         total_ppm = len(schedules)
-        due_ppm = len([s for s in schedules if s['status'] == 'Due'])
+        due_ppm = len([s for s in schedules if s['status'] in ('Due', 'Overdue')])
         prepare_ppm = len([s for s in schedules if s['status'] == 'Prepare'])
         completed_ppm = len([s for s in schedules if s['status'] == 'Completed'])
         
@@ -3650,6 +3096,8 @@ def show_manager_ppm_overview():
         with col4:
             create_metric_card("Completed", completed_ppm, "✅")
         
+        show_bulk_ppm_assignment("manager_ppm")
+        
         # Filter options
         st.markdown("#### 🔍 Filter PPM Schedules")
         col1, col2, col3 = st.columns(3)
@@ -3663,7 +3111,7 @@ def show_manager_ppm_overview():
         with col2:
             status_filter = st.selectbox(
                 "Status",
-                ["All", "Not Due", "Prepare", "Due", "WIP", "Completed", "Approved"]
+                ["All", "Not Due", "Prepare", "Due", "Overdue", "WIP", "Completed", "Approved"]
             )
         
         with col3:
@@ -3692,6 +3140,7 @@ def show_manager_ppm_overview():
                 "Not Due": "status-not-due",
                 "Prepare": "status-prepare", 
                 "Due": "status-due",
+                "Overdue": "status-overdue",
                 "WIP": "status-wip",
                 "Completed": "status-completed",
                 "Approved": "status-approved"
@@ -3718,7 +3167,7 @@ def show_manager_ppm_overview():
                 st.write(f"**Description:** {schedule['description']}")
                 
                 # Management actions
-                if schedule['status'] in ['Prepare', 'Due'] and not schedule['assigned_vendor']:
+                if schedule['status'] in ['Prepare', 'Due', 'Overdue'] and not schedule['assigned_vendor']:
                     st.markdown("---")
                     st.markdown("##### 👷 Assign to Vendor")
                     
@@ -3742,39 +3191,41 @@ def show_manager_ppm_overview():
                         if selected_vendor != "Select vendor...":
                             vendor_username = selected_vendor.split('(')[-1].strip(')')
                             
-                            # Update PPM schedule
-                            execute_update(
-                                '''UPDATE ppm_schedules 
-                                SET assigned_vendor = ?, status = 'WIP' 
-                                WHERE id = ?''',
-                                (vendor_username, schedule['id'])
-                            )
-                            
-                            # Create assignment record
-                            execute_update(
-                                '''INSERT INTO ppm_assignments 
-                                (schedule_id, vendor_username, assigned_date, due_date, assigned_by) 
-                                VALUES (?, ?, ?, ?, ?)''',
-                                (schedule['id'], vendor_username, 
-                                 datetime.now().strftime('%Y-%m-%d'),
-                                 due_date.strftime('%Y-%m-%d'),
-                                 st.session_state.user['username'])
-                            )
-                            
-                            st.success("✅ PPM assigned to vendor successfully!")
-                            st.rerun()
+                            try:
+                                with transaction():
+                                    # Update PPM schedule
+                                    execute_update(
+                                        '''UPDATE ppm_schedules 
+                                        SET assigned_vendor = ?, status = 'WIP' 
+                                        WHERE id = ?''',
+                                        (vendor_username, schedule['id'])
+                                    )
+                                    
+                                    # Create assignment record
+                                    execute_update(
+                                        '''INSERT INTO ppm_assignments 
+                                        (schedule_id, vendor_username, assigned_date, due_date, assigned_by) 
+                                        VALUES (?, ?, ?, ?, ?)''',
+                                        (schedule['id'], vendor_username, 
+                                         datetime.now().strftime('%Y-%m-%d'),
+                                         due_date.strftime('%Y-%m-%d'),
+                                         st.session_state.user['username'])
+                                    )
+                            except sqlite3.Error:
+                                st.error("❌ Failed to assign PPM")
+                            else:
+                                st.success("✅ PPM assigned to vendor successfully!")
+                                st.rerun()
                 
                 # PDF Download for completed PPM
                 if schedule['status'] == 'Completed':
-                    pdf_buffer = create_ppm_pdf_report(schedule['id'])
-                    if pdf_buffer:
-                        st.download_button(
-                            label="📥 Download PPM Report",
-                            data=pdf_buffer,
-                            file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                            mime="application/pdf",
-                            key=f"manager_ppm_pdf_dl_{schedule['id']}"
-                        )
+                    st.download_button(
+                        label="📥 Download PPM Report",
+                        data=lazy_pdf(create_ppm_pdf_report, schedule['id']),
+                        file_name=f"ppm_report_{schedule['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        key=f"manager_ppm_pdf_dl_{schedule['id']}"
+                    )
     else:
         st.info("📭 No PPM schedules found")
 
@@ -3789,22 +3240,19 @@ def show_manager_generator_records():
     with col2:
         end_date = st.date_input("End Date", value=datetime.now())
     
-    # Get generator records
-    records = execute_query('''
-        SELECT * FROM generator_records 
-        WHERE record_date BETWEEN ? AND ?
-        ORDER BY record_date DESC
-    ''', (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
+    date_params = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
     
-    if records:
-        # Summary statistics
-        total_hours = sum(safe_float(r.get('net_hours'), 0) for r in records)
-        total_diesel = sum(safe_float(r.get('net_diesel_consumed'), 0) for r in records)
+    # Summary statistics from the daily/monthly rollups
+    totals = generator_analytics.get_generator_totals(start_date, end_date)
+    
+    if totals['record_count']:
+        total_hours = totals['net_hours']
+        total_diesel = totals['net_diesel']
         avg_consumption = total_diesel / total_hours if total_hours > 0 else 0
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            create_metric_card("Total Records", len(records), "📋")
+            create_metric_card("Total Records", totals['record_count'], "📋")
         with col2:
             create_metric_card("Total Hours", f"{total_hours:.1f}", "⏱️")
         with col3:
@@ -3815,8 +3263,15 @@ def show_manager_generator_records():
         # Display records
         st.markdown("#### 📋 Recent Records")
         
+        records = execute_query('''
+            SELECT * FROM generator_records 
+            WHERE record_date BETWEEN ? AND ?
+            ORDER BY record_date DESC
+            LIMIT 10
+        ''', date_params)
+        
         df_data = []
-        for record in records[:10]:  # Show last 10 records
+        for record in records:
             net_hours = safe_float(record.get('net_hours'), 0)
             net_diesel = safe_float(record.get('net_diesel_consumed'), 0)
             
@@ -3833,33 +3288,63 @@ def show_manager_generator_records():
             df = pd.DataFrame(df_data)
             st.dataframe(df, use_container_width=True, hide_index=True)
         
-        # Export option
-        all_data = []
-        for record in records:
-            all_data.append({
-                "Date": record.get('record_date', ''),
-                "Generator Type": record.get('generator_type', ''),
-                "Opening Hours": safe_float(record.get('opening_hours'), 0),
-                "Closing Hours": safe_float(record.get('closing_hours'), 0),
-                "Net Hours": safe_float(record.get('net_hours'), 0),
-                "Opening Inventory (L)": safe_float(record.get('opening_inventory_liters'), 0),
-                "Purchase (L)": safe_float(record.get('purchase_liters'), 0),
-                "Closing Inventory (L)": safe_float(record.get('closing_inventory_liters'), 0),
-                "Net Diesel (L)": safe_float(record.get('net_diesel_consumed'), 0),
-                "Recorded By": record.get('recorded_by', ''),
-                "Notes": record.get('notes', '')
-            })
-        
-        df_all = pd.DataFrame(all_data)
-        csv = df_all.to_csv(index=False).encode('utf-8')
+        # Export option; the full record set is only loaded when the button is clicked
+        def export_csv():
+            records = execute_query('''
+                SELECT * FROM generator_records 
+                WHERE record_date BETWEEN ? AND ?
+                ORDER BY record_date DESC
+            ''', date_params)
+            
+            all_data = []
+            for record in records:
+                all_data.append({
+                    "Date": record.get('record_date', ''),
+                    "Generator Type": record.get('generator_type', ''),
+                    "Opening Hours": safe_float(record.get('opening_hours'), 0),
+                    "Closing Hours": safe_float(record.get('closing_hours'), 0),
+                    "Net Hours": safe_float(record.get('net_hours'), 0),
+                    "Opening Inventory (L)": safe_float(record.get('opening_inventory_liters'), 0),
+                    "Purchase (L)": safe_float(record.get('purchase_liters'), 0),
+                    "Closing Inventory (L)": safe_float(record.get('closing_inventory_liters'), 0),
+                    "Net Diesel (L)": safe_float(record.get('net_diesel_consumed'), 0),
+                    "Recorded By": record.get('recorded_by', ''),
+                    "Notes": record.get('notes', '')
+                })
+            
+            return pd.DataFrame(all_data).to_csv(index=False).encode('utf-8')
         
         st.download_button(
             label="📥 Export All Records (CSV)",
-            data=csv,
+            data=export_csv,
             file_name=f"generator_records_{start_date.strftime('%Y%m%d')}_to_{end_date.strftime('%Y%m%d')}.csv",
             mime="text/csv",
             use_container_width=True
         )
+        
+        # Fuel anomalies, rescanned only for generator types with new records
+        st.markdown("#### 🚨 Fuel Anomalies")
+        anomalies = generator_analytics.get_generator_anomalies(start_date, end_date)
+        
+        if not anomalies.empty:
+            counts = anomalies['anomaly_type'].value_counts()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                create_metric_card("Rate Outliers", int(counts.get('consumption_rate', 0)), "📈")
+            with col2:
+                create_metric_card("Diesel Without Hours", int(counts.get('diesel_without_hours', 0)), "⛽")
+            with col3:
+                create_metric_card("Inventory Gaps", int(counts.get('inventory_gap', 0)), "🔍")
+            
+            st.dataframe(pd.DataFrame({
+                "Date": anomalies['record_date'],
+                "Generator Type": anomalies['generator_type'],
+                "Anomaly": anomalies['anomaly_type'].map(generator_analytics.ANOMALY_LABELS),
+                "Details": anomalies['detail'],
+                "Score": anomalies['score'].round(2),
+            }), use_container_width=True, hide_index=True)
+        else:
+            st.success("✅ No fuel anomalies detected for the selected period")
     else:
         st.info("📭 No generator records found for the selected period")
 
@@ -3877,10 +3362,9 @@ def show_manager_hse_overview():
     with col1:
         create_metric_card("HSE Schedules", len(schedules), "📅")
     with col2:
-        create_metric_card("Incidents", len(incidents), "⚠️")
+        create_metric_card("Incidents", kpis.get_kpi('incidents.total'), "⚠️")
     with col3:
-        open_incidents = len([i for i in incidents if i['status'] == 'Open'])
-        create_metric_card("Open Incidents", open_incidents, "🔴")
+        create_metric_card("Open Incidents", kpis.get_kpi('incidents.status.Open'), "🔴")
     with col4:
         create_metric_card("Inspections", len(inspections), "🔍")
     
@@ -3957,7 +3441,7 @@ def show_manager_space_management():
         total_bookings = len(bookings)
         today = datetime.now().strftime('%Y-%m-%d')
         today_bookings = len([b for b in bookings if b['booking_date'] == today])
-        unique_rooms = len(set(b['room_name'] for b in bookings))
+        unique_rooms = len(set(b['room_id'] for b in bookings))
         avg_attendees = sum(b['attendees_count'] or 0 for b in bookings) / total_bookings if total_bookings > 0 else 0
         
         with col1:
@@ -3972,29 +3456,17 @@ def show_manager_space_management():
         # Room utilization
         st.markdown("#### 📊 Room Utilization")
         
-        # Group by room
-        room_stats = {}
-        for booking in bookings:
-            room = booking['room_name']
-            if room not in room_stats:
-                room_stats[room] = {
-                    'bookings': 0,
-                    'attendees': 0,
-                    'types': set()
-                }
-            room_stats[room]['bookings'] += 1
-            room_stats[room]['attendees'] += (booking['attendees_count'] or 0)
-            room_stats[room]['types'].add(booking['room_type'])
-        
-        # Display room statistics
-        room_data = []
-        for room, stats in room_stats.items():
-            room_data.append({
-                'Room': room,
-                'Bookings': stats['bookings'],
-                'Avg Attendees': stats['attendees'] / stats['bookings'] if stats['bookings'] > 0 else 0,
-                'Room Types': ', '.join(stats['types'])
-            })
+        # Group by room id, with the room's capacity from the registry
+        room_data = execute_query('''
+            SELECT r.room_name AS "Room", r.room_type AS "Room Type", r.floor AS "Floor",
+                   r.capacity AS "Capacity", COUNT(*) AS "Bookings",
+                   ROUND(AVG(b.attendees_count), 1) AS "Avg Attendees",
+                   ROUND(AVG(b.attendees_count * 100.0 / r.capacity), 1) AS "Avg Seat Fill (%)"
+            FROM room_bookings b
+            JOIN rooms r ON r.id = b.room_id
+            GROUP BY b.room_id
+            ORDER BY COUNT(*) DESC
+        ''')
         
         if room_data:
             df_rooms = pd.DataFrame(room_data)
@@ -4019,6 +3491,86 @@ def show_manager_space_management():
             st.info("📭 No upcoming bookings in the next 7 days")
     else:
         st.info("📭 No booking data available")
+    
+    show_room_catalogue()
+
+def show_room_catalogue():
+    """The room registry: type, capacity, floor and amenities of every room bookings refer to"""
+    st.markdown("#### 🏷️ Room Catalogue")
+    rooms = space.get_rooms(active_only=False)
+    
+    if rooms:
+        st.dataframe(pd.DataFrame(rooms)[['room_name', 'room_type', 'capacity', 'floor', 'amenities', 'active']]
+                     .rename(columns={'room_name': 'Room', 'room_type': 'Room Type', 'capacity': 'Capacity',
+                                      'floor': 'Floor', 'amenities': 'Amenities', 'active': 'Bookable'}),
+                     use_container_width=True, hide_index=True)
+    
+    room_types = ["Conference Room", "Meeting Room", "Training Room", "Auditorium",
+                  "Board Room", "Interview Room", "Other"]
+    existing = {r['id']: r for r in rooms}
+    selected = st.selectbox("Room", [None] + list(existing), key="catalogue_room",
+                            format_func=lambda room_id: "➕ New room" if room_id is None else existing[room_id]['room_name'])
+    room = existing.get(selected, {})
+    
+    with st.form("room_catalogue_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            room_name = st.text_input("Room Name *", value=room.get('room_name', ''),
+                                      placeholder="e.g., Conference Room A")
+            room_type = st.selectbox("Room Type", room_types,
+                                     index=room_types.index(room['room_type']) if room.get('room_type') in room_types else 0)
+            floor = st.text_input("Floor", value=room.get('floor') or '', placeholder="e.g., 2nd Floor")
+        with col2:
+            capacity = st.number_input("Capacity", min_value=1, value=room.get('capacity') or 1)
+            amenities = st.text_input("Amenities", value=room.get('amenities') or '',
+                                      placeholder="e.g., Projector, Video Conferencing")
+            active = st.checkbox("Bookable", value=bool(room.get('active', 1)))
+        
+        if st.form_submit_button("💾 Save Room", use_container_width=True):
+            if not room_name.strip():
+                st.error("❌ Please enter a room name")
+            else:
+                try:
+                    space.save_room(selected, room_name, room_type, capacity,
+                                    floor.strip() or None, amenities.strip() or None, active)
+                except sqlite3.IntegrityError:
+                    st.error("❌ Another room already has this name")
+                except sqlite3.Error:
+                    st.error("❌ Failed to save room")
+                else:
+                    st.success("✅ Room saved")
+                    st.rerun()
+    
+    if len(existing) > 1:
+        with st.expander("🔀 Merge Duplicate Rooms"):
+            st.caption("Moves every booking of the duplicate to the room kept, then removes the duplicate")
+            with st.form("room_merge_form"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    source_id = st.selectbox("Duplicate", list(existing),
+                                             format_func=lambda room_id: existing[room_id]['room_name'])
+                with col2:
+                    target_id = st.selectbox("Keep", list(existing),
+                                             format_func=lambda room_id: existing[room_id]['room_name'])
+                
+                if st.form_submit_button("🔀 Merge Rooms", use_container_width=True):
+                    if source_id == target_id:
+                        st.error("❌ Choose two different rooms")
+                    else:
+                        try:
+                            moved, clashes = space.merge_rooms(source_id, target_id)
+                        except sqlite3.Error:
+                            st.error("❌ Failed to merge rooms")
+                        else:
+                            if clashes:
+                                st.error(f"❌ {len(clashes)} booking(s) overlap; cancel or move them before merging")
+                                for clash in clashes:
+                                    st.write(f"📅 {clash['booking_date']} · "
+                                             f"{clash['start_time']}-{clash['end_time']} 👤 {clash['booked_by']} clashes with "
+                                             f"{clash['clash_start_time']}-{clash['clash_end_time']} 👤 {clash['clash_booked_by']}")
+                            else:
+                                st.success(f"✅ Moved {moved} booking(s) to {existing[target_id]['room_name']}")
+                                st.rerun()
 
 # =============================================
 # FACILITY USER DASHBOARD - ENHANCED
@@ -4094,15 +3646,13 @@ def show_user_dashboard(username, user_requests):
         # Status timeline
         st.markdown("#### 📈 Request Status Timeline")
         
-        if 'created_date' in df.columns:
-            df['created_date'] = pd.to_datetime(df['created_date'])
-            df['month'] = df['created_date'].dt.strftime('%Y-%m')
-            
-            monthly_stats = df.groupby('month').agg({
-                'id': 'count',
-                'status': lambda x: (x == 'Completed').sum()
-            }).reset_index()
-            
+        monthly_stats = db.query_time_buckets(
+            'maintenance_requests', 'created_date', 'month',
+            where='created_by = ?', params=(username,),
+            counts={'completed': "status = 'Completed'"}
+        )
+        
+        if not monthly_stats.empty:
             monthly_stats.columns = ['Month', 'Total', 'Completed']
             
             fig2 = px.bar(monthly_stats, x='Month', y=['Total', 'Completed'],
@@ -4315,15 +3865,13 @@ def show_user_requests_view(username):
                 
                 # PDF Download for completed/approved jobs
                 if request['status'] in ['Completed', 'Approved']:
-                    pdf_buffer = create_maintenance_pdf_report(request['id'])
-                    if pdf_buffer:
-                        st.download_button(
-                            label="📥 Download Job Report",
-                            data=pdf_buffer,
-                            file_name=f"job_report_{request['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
-                            mime="application/pdf",
-                            key=f"user_pdf_{request['id']}"
-                        )
+                    st.download_button(
+                        label="📥 Download Job Report",
+                        data=lazy_pdf(create_maintenance_pdf_report, request['id']),
+                        file_name=f"job_report_{request['id']}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                        mime="application/pdf",
+                        key=f"user_pdf_{request['id']}"
+                    )
                 
                 # Actions based on status
                 if request['status'] == 'Completed' and not request['requesting_dept_approval']:
@@ -4363,6 +3911,194 @@ def show_user_requests_view(username):
     else:
         st.info("📭 No requests found with the selected filters")
 
+# =============================================
+# REPORT EXPORT - FACILITY MANAGER
+# =============================================
+def get_export_ids(kind, start_date, end_date):
+    """Ids of completed reports of one kind falling between two dates"""
+    # Upper bound is exclusive so timestamps on the end date are included
+    params = (start_date.strftime('%Y-%m-%d'), (end_date + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if kind == 'job':
+        rows = execute_query(
+            '''SELECT id FROM maintenance_requests 
+            WHERE status IN ('Completed', 'Approved') 
+            AND completed_date >= ? AND completed_date < ? 
+            ORDER BY id''',
+            params
+        )
+    elif kind == 'ppm':
+        rows = execute_query(
+            '''SELECT id FROM ppm_schedules 
+            WHERE status = 'Completed' 
+            AND actual_completion_date >= ? AND actual_completion_date < ? 
+            ORDER BY id''',
+            params
+        )
+    else:
+        rows = execute_query(
+            'SELECT id FROM invoices WHERE invoice_date >= ? AND invoice_date < ? ORDER BY id',
+            params
+        )
+    return [row['id'] for row in rows]
+
+def show_report_export():
+    st.markdown("<h1 class='app-title'>📦 Report Export</h1>", unsafe_allow_html=True)
+    st.markdown("Download every job report, PPM report and invoice for a period as one ZIP file.")
+    
+    report_types = {
+        "Job Completion Reports": 'job',
+        "PPM Reports": 'ppm',
+        "Invoices": 'invoice'
+    }
+    
+    today = datetime.now().date()
+    col1, col2 = st.columns(2)
+    with col1:
+        start_date = st.date_input("Start Date", value=today.replace(day=1), key="export_start")
+    with col2:
+        end_date = st.date_input("End Date", value=today, key="export_end")
+    
+    selected_types = st.multiselect("Reports to include", list(report_types.keys()),
+                                    default=["Job Completion Reports", "Invoices"])
+    
+    items = []
+    counts = []
+    for label in selected_types:
+        ids = get_export_ids(report_types[label], start_date, end_date)
+        items.extend((report_types[label], record_id) for record_id in ids)
+        counts.append(f"{label}: {len(ids)}")
+    
+    if counts:
+        st.caption(" · ".join(counts))
+    
+    if st.button("📦 Build ZIP", use_container_width=True, disabled=not items):
+        progress_bar = st.progress(0.0)
+        status_text = st.empty()
+        
+        def update_progress(done, total, rate):
+            progress_bar.progress(done / total)
+            status_text.write(f"Rendered {done:,} of {total:,} reports ({rate:.1f} reports/sec)")
+        
+        zip_path = os.path.join(
+            reports.EXPORT_DIR,
+            f"reports_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.zip"
+        )
+        try:
+            result = reports.export_reports_zip(items, zip_path, progress=update_progress)
+        except Exception as e:
+            st.error(f"❌ Export failed: {e}")
+        else:
+            st.session_state.last_report_export = result
+            st.success(f"✅ Exported {result['reports']:,} reports in {result['seconds']:.1f}s "
+                       f"({result['reports_per_sec']:.1f} reports/sec on {result['workers']} workers)")
+            if result['missing']:
+                st.warning(f"⚠️ {result['missing']} records were removed before they could be exported")
+    
+    if 'last_report_export' in st.session_state:
+        export_path = st.session_state.last_report_export['path']
+        if os.path.exists(export_path):
+            st.download_button(
+                label="📥 Download ZIP",
+                data=reports.lazy_export(export_path),
+                file_name=os.path.basename(export_path),
+                mime="application/zip",
+                key="download_report_export"
+            )
+
+# =============================================
+# DIAGNOSTICS - FACILITY MANAGER
+# =============================================
+def show_diagnostics():
+    st.markdown("<h1 class='app-title'>🩺 Diagnostics</h1>", unsafe_allow_html=True)
+    
+    # Query instrumentation settings
+    st.markdown("### ⏱️ Query Timing")
+    col1, col2 = st.columns(2)
+    with col1:
+        logging_enabled = st.toggle("Record query timings", value=db.QUERY_LOG_ENABLED)
+    with col2:
+        slow_query_ms = st.number_input("Slow query threshold (ms)", min_value=0.0,
+                                        value=float(db.SLOW_QUERY_MS), step=10.0)
+    db.set_query_logging(logging_enabled, slow_query_ms)
+    
+    if not logging_enabled:
+        st.info("ℹ️ Query timing is off. Switch it on and use the app to collect timings.")
+    
+    # Top queries by total time
+    st.markdown("#### 🔝 Top Queries by Total Time")
+    summary = db.query_summary(20)
+    if summary:
+        df_summary = pd.DataFrame(summary)[
+            ['fingerprint', 'calls', 'total_ms', 'avg_ms', 'max_ms', 'rows', 'callers', 'sql']
+        ]
+        df_summary.columns = ['Fingerprint', 'Calls', 'Total (ms)', 'Avg (ms)', 'Max (ms)', 'Rows', 'Pages', 'SQL']
+        st.dataframe(df_summary.round(2), use_container_width=True, hide_index=True)
+        
+        if st.button("🧹 Reset Timings", use_container_width=True):
+            db.reset_query_stats()
+            st.rerun()
+    else:
+        st.info("📭 No queries recorded yet")
+    
+    # Slow query log
+    st.markdown(f"#### 🐢 Slow Query Log (≥ {db.SLOW_QUERY_MS:.0f} ms)")
+    slow_queries = db.read_slow_query_log(50)
+    if slow_queries:
+        df_slow = pd.DataFrame(slow_queries)[
+            ['timestamp', 'elapsed_ms', 'rows', 'caller', 'params_shape', 'sql']
+        ]
+        df_slow['params_shape'] = df_slow['params_shape'].astype(str)
+        df_slow.columns = ['Time', 'Elapsed (ms)', 'Rows', 'Page', 'Params', 'SQL']
+        st.dataframe(df_slow, use_container_width=True, hide_index=True)
+    else:
+        st.info("📭 No slow queries logged")
+    
+    # Concurrent page loads
+    st.markdown("### 🧵 Parallel Loads")
+    timings = db.load_timings()
+    if timings:
+        for label, timing in timings.items():
+            speedup = timing['serial_ms'] / timing['wall_ms'] if timing['wall_ms'] else 1.0
+            st.markdown(f"**{label}** · {timing['timestamp']} · {timing['workers']} worker(s) · "
+                        f"wall clock {timing['wall_ms']:.1f} ms, "
+                        f"sum of loads {timing['serial_ms']:.1f} ms ({speedup:.1f}x)")
+            df_timings = pd.DataFrame(list(timing['datasets'].items()), columns=['Dataset', 'Load (ms)'])
+            st.dataframe(df_timings.round(2), use_container_width=True, hide_index=True)
+    else:
+        if db.LOAD_MAX_WORKERS > 1:
+            st.info(f"📭 No parallel loads yet; they run on {db.LOAD_MAX_WORKERS} read-only connections")
+        else:
+            st.info("📭 No parallel loads yet; with one CPU they run one after another")
+    
+    # Read cache
+    st.markdown("### 🗃️ Read Cache")
+    cache_enabled = st.toggle("Cache read queries", value=db.CACHE_ENABLED)
+    db.set_query_cache(cache_enabled)
+    
+    stats = db.cache_stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Hit Rate", f"{stats['hit_rate']:.1%}")
+    with col2:
+        st.metric("Hits / Misses", f"{stats['hits']:,} / {stats['misses']:,}")
+    with col3:
+        st.metric("Entries", f"{stats['entries']:,}")
+    with col4:
+        st.metric("Memory", f"{stats['bytes'] / 1024 / 1024:.1f} of {db.CACHE_MAX_BYTES / 1024 / 1024:.0f} MB")
+    
+    st.caption(f"Evictions: {stats['evictions']:,} · Table invalidations: {stats['invalidations']:,} · "
+               f"Full flushes: {stats['flushes']:,}")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🗑️ Clear Cache", use_container_width=True):
+            db.clear_cache()
+            st.rerun()
+    with col2:
+        if st.button("🧹 Reset Cache Counters", use_container_width=True):
+            db.reset_cache_stats()
+            st.rerun()
+
 # =============================================
 # AUTHENTICATION & MAIN APP FLOW
 # =============================================
@@ -4472,6 +4208,8 @@ def main():
                 "🔌 Generator Records",
                 "🛡️ HSE Overview",
                 "🏢 Space Management",
+                "📦 Report Export",
+                "🩺 Diagnostics",
                 "🔓 Logout"
             ]
         elif user_role == 'vendor':
@@ -4542,6 +4280,12 @@ def main():
     elif selected_option == "🏢 Space Management" and user_role == 'facility_manager':
         show_manager_space_management()
     
+    elif selected_option == "📦 Report Export" and user_role == 'facility_manager':
+        show_report_export()
+    
+    elif selected_option == "🩺 Diagnostics" and user_role == 'facility_manager':
+        show_diagnostics()
+    
     elif selected_option == "📋 Assigned Jobs" and user_role == 'vendor':
         show_vendor_assigned_jobs(st.session_state.user['username'])
     
@@ -0,0 +1,390 @@
+import sqlite3
+import threading
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import db
+from db import execute_query, execute_query_df, execute_update, executemany, transaction
+
+# =============================================
+# GENERATOR ROLLUPS
+# =============================================
+# generator_daily/generator_monthly are maintained by triggers (migration 6).
+# Whole months inside a range are read from the monthly rollup and only the
+# partial months at either end from the daily one, so the cost of a range is
+# bounded by its length in months plus at most 62 days.
+ALL_TYPES = '*'
+
+MONTHLY_COLUMNS = ['month', 'record_count', 'active_days', 'net_hours', 'net_diesel']
+DAILY_COLUMNS = ['record_date', 'record_count', 'net_hours', 'net_diesel']
+
+def _month_start(day):
+    return day.replace(day=1)
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def _full_month_span(start_date, end_date):
+    """First day of the first whole month in the range and first day after the last one"""
+    first = start_date if start_date.day == 1 else _next_month(start_date)
+    after_last = _month_start(end_date + timedelta(days=1))
+    return first, after_last
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+def get_generator_monthly(start_date, end_date, generator_type=None):
+    """Per-month totals for records dated start_date..end_date inclusive"""
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    generator_type = generator_type or ALL_TYPES
+    first, after_last = _full_month_span(start_date, end_date)
+    
+    if first < after_last:
+        # Whole months, plus the partial months before and after them
+        edges = [(start_date, first - timedelta(days=1)), (after_last, end_date)]
+        months = (first.strftime('%Y-%m'), (after_last - timedelta(days=1)).strftime('%Y-%m'))
+    else:
+        edges = [(start_date, end_date)]
+        months = None
+    
+    parts = []
+    params = []
+    if months:
+        parts.append('''
+            SELECT month, record_count, active_days, net_hours, net_diesel 
+            FROM generator_monthly 
+            WHERE generator_type = ? AND month BETWEEN ? AND ?
+        ''')
+        params += [generator_type, *months]
+    for edge_start, edge_end in edges:
+        if edge_start > edge_end:
+            continue
+        parts.append('''
+            SELECT substr(record_date, 1, 7) AS month, SUM(record_count) AS record_count, 
+                   COUNT(*) AS active_days, SUM(net_hours) AS net_hours, SUM(net_diesel) AS net_diesel 
+            FROM generator_daily 
+            WHERE generator_type = ? AND record_date BETWEEN ? AND ? 
+            GROUP BY substr(record_date, 1, 7)
+        ''')
+        params += [generator_type, edge_start.strftime('%Y-%m-%d'), edge_end.strftime('%Y-%m-%d')]
+    
+    df = execute_query_df(
+        f"SELECT * FROM ({' UNION ALL '.join(parts)}) ORDER BY month",
+        tuple(params),
+        dtypes={'record_count': 'int64', 'active_days': 'int64', 'net_hours': 'float64', 'net_diesel': 'float64'}
+    )
+    return df if not df.empty else pd.DataFrame(columns=MONTHLY_COLUMNS)
+
+def get_generator_totals(start_date, end_date, generator_type=None):
+    """Record count, days with records, net hours and diesel for the range"""
+    monthly = get_generator_monthly(start_date, end_date, generator_type)
+    return {
+        'record_count': int(monthly['record_count'].sum()),
+        'active_days': int(monthly['active_days'].sum()),
+        'net_hours': float(monthly['net_hours'].sum()),
+        'net_diesel': float(monthly['net_diesel'].sum()),
+    }
+
+def get_generator_daily(start_date, end_date, generator_type=None):
+    """One row per day with records in the range"""
+    return execute_query_df(
+        '''SELECT record_date, record_count, net_hours, net_diesel 
+        FROM generator_daily 
+        WHERE generator_type = ? AND record_date BETWEEN ? AND ? 
+        ORDER BY record_date''',
+        (generator_type or ALL_TYPES, _as_date(start_date).strftime('%Y-%m-%d'),
+         _as_date(end_date).strftime('%Y-%m-%d')),
+        columns=DAILY_COLUMNS,
+        dtypes={'record_date': 'datetime64[ns]', 'net_hours': 'float64', 'net_diesel': 'float64'}
+    )
+
+def get_generator_types():
+    df = execute_query_df(
+        "SELECT DISTINCT generator_type FROM generator_monthly WHERE generator_type != ? ORDER BY generator_type",
+        (ALL_TYPES,)
+    )
+    return df['generator_type'].tolist() if not df.empty else []
+
+# =============================================
+# CONSUMPTION MODEL
+# =============================================
+# Least-squares fit of diesel used against hours run, overall and per generator
+# type, from closed-form sums. Refitted only when generator_records changes.
+_model_cache = {}
+_model_lock = threading.Lock()
+
+def fit_line(x, y):
+    """Slope, intercept and R² of the least-squares line through (x, y)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    if len(x) < 2:
+        return None
+    
+    dx = x - x.mean()
+    dy = y - y.mean()
+    sxx = (dx * dx).sum()
+    if sxx == 0:
+        return None
+    slope = (dx * dy).sum() / sxx
+    intercept = y.mean() - slope * x.mean()
+    syy = (dy * dy).sum()
+    sse = ((dy - slope * dx) ** 2).sum()
+    return {
+        'slope': float(slope),
+        'intercept': float(intercept),
+        'r2': float(1 - sse / syy) if syy > 0 else 1.0,
+        'n': len(x),
+    }
+
+def _fit_groups(codes, x, y, group_count):
+    """Vectorised per-group fit; every array is indexed by group code"""
+    n = np.bincount(codes, minlength=group_count).astype(float)
+    sum_x = np.bincount(codes, x, group_count)
+    sum_y = np.bincount(codes, y, group_count)
+    sxx = np.bincount(codes, x * x, group_count) - sum_x * sum_x / np.maximum(n, 1)
+    sxy = np.bincount(codes, x * y, group_count) - sum_x * sum_y / np.maximum(n, 1)
+    syy = np.bincount(codes, y * y, group_count) - sum_y * sum_y / np.maximum(n, 1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = np.where((n >= 2) & (sxx > 0), sxy / sxx, np.nan)
+        intercept = (sum_y - slope * sum_x) / n
+        r2 = np.where(syy > 0, sxy * sxy / (sxx * syy), 1.0)
+        # Hours run per litre over the whole group, NaN when no diesel was recorded
+        efficiency = np.where(sum_y > 0, sum_x / sum_y, np.nan)
+    return n, slope, intercept, np.where(np.isnan(slope), np.nan, r2), efficiency, sum_x, sum_y
+
+def _fit_consumption_model():
+    df = execute_query_df(
+        'SELECT generator_type, net_hours, net_diesel_consumed FROM generator_records',
+        dtypes={'net_hours': 'float64', 'net_diesel_consumed': 'float64'}
+    )
+    df = df[np.isfinite(df['net_hours']) & np.isfinite(df['net_diesel_consumed'])].reset_index(drop=True)
+    
+    x = df['net_hours'].to_numpy()
+    y = df['net_diesel_consumed'].to_numpy()
+    codes, types = pd.factorize(df['generator_type'])
+    
+    n, slope, intercept, r2, efficiency, hours, diesel = _fit_groups(codes, x, y, len(types))
+    by_type = pd.DataFrame({
+        'generator_type': types, 'records': n.astype(int), 'slope': slope, 'intercept': intercept,
+        'r2': r2, 'efficiency': efficiency, 'net_hours': hours, 'net_diesel': diesel,
+    })
+    
+    overall = fit_line(x, y)
+    
+    # Residuals against each record's own generator-type line
+    points = df.rename(columns={'net_diesel_consumed': 'net_diesel'})
+    points['residual'] = y - (intercept[codes] + slope[codes] * x) if len(types) else np.array([])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        points['efficiency'] = np.where(y > 0, x / y, np.nan)
+    
+    if len(types):
+        residual_std = points.groupby('generator_type')['residual'].std()
+        by_type['residual_std'] = by_type['generator_type'].map(residual_std)
+    else:
+        by_type['residual_std'] = pd.Series(dtype='float64')
+    
+    return {'overall': overall, 'by_type': by_type, 'points': points}
+
+def get_consumption_model():
+    """Diesel-vs-hours fit overall and per generator type, plus per-record residuals.
+    
+    Returns {'overall': fit_line() result or None, 'by_type': DataFrame,
+    'points': DataFrame}. The result is shared; callers must not modify it.
+    """
+    version = db.table_version('generator_records')
+    with _model_lock:
+        if _model_cache.get('version') != version:
+            _model_cache['model'] = _fit_consumption_model()
+            _model_cache['version'] = version
+        return _model_cache['model']
+
+def trendline_points(fit, x):
+    """Two points spanning x for drawing a fitted line"""
+    if not fit or len(x) == 0:
+        return None, None
+    x_range = np.array([np.nanmin(x), np.nanmax(x)])
+    return x_range, fit['intercept'] + fit['slope'] * x_range
+
+# =============================================
+# FUEL ANOMALIES
+# =============================================
+# Each record's litres per hour is scored against the median and MAD of the
+# previous ANOMALY_WINDOW records of the same generator type, and its opening
+# stock is checked against the previous record's closing stock. Only generator
+# types the triggers from migration 7 marked dirty are rescanned, and only from
+# the earliest changed date onwards.
+ANOMALY_WINDOW = 30
+ANOMALY_MIN_HISTORY = 7
+ANOMALY_Z_THRESHOLD = 3.5
+# Least spread a window is scored with, as a share of its median and in
+# litres per hour, so a run of identical readings still flags a jump
+ANOMALY_MIN_SCALE_SHARE = 0.05
+ANOMALY_MIN_SCALE = 0.1
+INVENTORY_TOLERANCE_LITERS = 1.0
+
+ANOMALY_LABELS = {
+    'consumption_rate': 'Unusual consumption rate',
+    'diesel_without_hours': 'Diesel used with no hours run',
+    'inventory_gap': 'Opening stock does not match previous closing stock',
+}
+
+ANOMALY_COLUMNS = ['record_id', 'generator_type', 'record_date', 'anomaly_type',
+                   'observed', 'expected', 'score', 'detail']
+
+_RECORD_COLUMNS = '''id, generator_type, record_date, net_hours, net_diesel_consumed, 
+               opening_inventory_liters, closing_inventory_liters'''
+
+def rolling_median_mad(values, group_position, window=ANOMALY_WINDOW, min_history=ANOMALY_MIN_HISTORY,
+                       min_scale_share=ANOMALY_MIN_SCALE_SHARE, min_scale=ANOMALY_MIN_SCALE):
+    """Median, MAD and robust z-score of each value against the `window` values before it.
+    
+    values must be sorted by group and group_position is each value's index
+    within its group, so windows never reach into the previous group. NaN
+    values are ignored; fewer than min_history usable values gives NaN. The
+    z-score's scale is at least min_scale_share of the median and min_scale.
+    """
+    values = np.asarray(values, dtype=float)
+    group_position = np.asarray(group_position)
+    if len(values) == 0:
+        empty = np.array([], dtype=float)
+        return empty, empty, empty
+    
+    # Row k of the view holds values[k - window:k]
+    padded = np.concatenate([np.full(window, np.nan), values])
+    history = np.lib.stride_tricks.sliding_window_view(padded, window)[:len(values)].copy()
+    history[np.arange(window)[None, :] < (window - group_position)[:, None]] = np.nan
+    enough = np.isfinite(history).sum(axis=1) >= min_history
+    
+    with warnings.catch_warnings():
+        # Rows with no usable history are all-NaN; they are masked below
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(history, axis=1)
+        deviation = np.abs(history - median[:, None])
+        mad = np.nanmedian(deviation, axis=1)
+        mean_deviation = np.nanmean(deviation, axis=1)
+    
+    # Iglewicz-Hoaglin modified z-score, falling back to the mean absolute
+    # deviation when more than half the window is identical. A window with no
+    # spread at all is scored against the floor instead of dividing by zero.
+    scale = np.where(mad > 0, mad / 0.6745, 1.253314 * mean_deviation)
+    scale = np.fmax(scale, np.fmax(min_scale_share * np.abs(median), min_scale))
+    z = (values - median) / scale
+    median[~enough] = np.nan
+    mad[~enough] = np.nan
+    z[~enough] = np.nan
+    return median, mad, z
+
+def detect_fuel_anomalies(records):
+    """Anomaly rows for generator records sorted by type, record date and id"""
+    if records.empty:
+        return pd.DataFrame(columns=ANOMALY_COLUMNS)
+    
+    hours = records['net_hours'].fillna(0).to_numpy(dtype=float)
+    diesel = records['net_diesel_consumed'].fillna(0).to_numpy(dtype=float)
+    by_type = records.groupby('generator_type', sort=False)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(hours > 0, diesel / hours, np.nan)
+    median, _, z = rolling_median_mad(rate, by_type.cumcount().to_numpy())
+    
+    opening = records['opening_inventory_liters'].to_numpy(dtype=float)
+    previous_closing = by_type['closing_inventory_liters'].shift(1).to_numpy(dtype=float)
+    gap = opening - previous_closing
+    
+    found = []
+    flagged = np.abs(z) > ANOMALY_Z_THRESHOLD
+    found.append(pd.DataFrame({
+        'index': np.flatnonzero(flagged), 'anomaly_type': 'consumption_rate',
+        'observed': rate[flagged], 'expected': median[flagged], 'score': z[flagged],
+    }))
+    flagged = (hours <= 0) & (diesel > INVENTORY_TOLERANCE_LITERS)
+    found.append(pd.DataFrame({
+        'index': np.flatnonzero(flagged), 'anomaly_type': 'diesel_without_hours',
+        'observed': diesel[flagged], 'expected': 0.0, 'score': diesel[flagged],
+    }))
+    flagged = np.abs(gap) > INVENTORY_TOLERANCE_LITERS
+    found.append(pd.DataFrame({
+        'index': np.flatnonzero(flagged), 'anomaly_type': 'inventory_gap',
+        'observed': opening[flagged], 'expected': previous_closing[flagged], 'score': gap[flagged],
+    }))
+    
+    anomalies = pd.concat(found, ignore_index=True)
+    rows = records.iloc[anomalies['index'].to_numpy()]
+    anomalies['record_id'] = rows['id'].to_numpy()
+    anomalies['generator_type'] = rows['generator_type'].to_numpy()
+    anomalies['record_date'] = rows['record_date'].to_numpy()
+    
+    details = {
+        'consumption_rate': lambda a: f"{a.observed:.2f} L/hr against a typical {a.expected:.2f} L/hr",
+        'diesel_without_hours': lambda a: f"{a.observed:.1f} L used with no hours recorded",
+        'inventory_gap': lambda a: f"Opened at {a.observed:.1f} L, previous record closed at {a.expected:.1f} L",
+    }
+    anomalies['detail'] = [details[a.anomaly_type](a) for a in anomalies.itertuples()]
+    return anomalies.sort_values(['generator_type', 'record_date', 'record_id'])[ANOMALY_COLUMNS]
+
+def _load_anomaly_scan(generator_type, from_date):
+    """Records of one type from from_date on, preceded by the history the scan needs"""
+    return execute_query_df(f'''
+        SELECT * FROM (
+            SELECT {_RECORD_COLUMNS} FROM generator_records 
+            WHERE generator_type = ? AND record_date < ? 
+            ORDER BY record_date DESC, id DESC LIMIT ?
+        ) 
+        UNION ALL 
+        SELECT {_RECORD_COLUMNS} FROM generator_records 
+        WHERE generator_type = ? AND record_date >= ? 
+        ORDER BY record_date, id
+    ''', (generator_type, from_date, ANOMALY_WINDOW, generator_type, from_date),
+        dtypes={'net_hours': 'float64', 'net_diesel_consumed': 'float64',
+                'opening_inventory_liters': 'float64', 'closing_inventory_liters': 'float64'})
+
+def refresh_generator_anomalies():
+    """Rescan generator types whose records changed since the last refresh"""
+    if not execute_query('SELECT 1 FROM generator_anomaly_dirty LIMIT 1'):
+        return 0
+    
+    with transaction():
+        dirty = execute_query('SELECT generator_type, from_date FROM generator_anomaly_dirty')
+        scans = [_load_anomaly_scan(row['generator_type'], row['from_date']) for row in dirty]
+        anomalies = detect_fuel_anomalies(pd.concat(scans, ignore_index=True))
+        
+        for row in dirty:
+            execute_update(
+                'DELETE FROM generator_anomalies WHERE generator_type = ? AND record_date >= ?',
+                (row['generator_type'], row['from_date'])
+            )
+        # The history rows were only context; their anomalies are already stored
+        from_dates = anomalies['generator_type'].map({row['generator_type']: row['from_date'] for row in dirty})
+        anomalies = anomalies[anomalies['record_date'] >= from_dates]
+        executemany(
+            f"INSERT INTO generator_anomalies ({', '.join(ANOMALY_COLUMNS)}) VALUES ({', '.join('?' * len(ANOMALY_COLUMNS))})",
+            [tuple(row) for row in anomalies.astype(object).itertuples(index=False)]
+        )
+        execute_update('DELETE FROM generator_anomaly_dirty')
+    return len(dirty)
+
+def get_generator_anomalies(start_date, end_date, generator_type=None):
+    """Stored anomalies for records dated start_date..end_date, newest first"""
+    try:
+        refresh_generator_anomalies()
+    except sqlite3.Error as e:
+        # Serve the anomalies already stored; the dirty types are retried next read
+        print(f"Anomaly refresh error: {e}")
+    
+    query = f'''SELECT {', '.join(ANOMALY_COLUMNS)} FROM generator_anomalies 
+        WHERE record_date BETWEEN ? AND ?'''
+    params = [_as_date(start_date).strftime('%Y-%m-%d'), _as_date(end_date).strftime('%Y-%m-%d')]
+    if generator_type and generator_type != ALL_TYPES:
+        query += ' AND generator_type = ?'
+        params.append(generator_type)
+    return execute_query_df(
+        query + ' ORDER BY record_date DESC, record_id DESC',
+        tuple(params),
+        dtypes={'observed': 'float64', 'expected': 'float64', 'score': 'float64'}
+    )
@@ -0,0 +1,100 @@
+import sqlite3
+
+from db import execute_query, execute_update, transaction
+
+# =============================================
+# KPI COUNTERS
+# =============================================
+# kpi_counters is kept current by triggers (migration 4), so every lookup here
+# is an index seek however many rows the source tables hold.
+def get_kpi(key, default=0):
+    rows = execute_query('SELECT value FROM kpi_counters WHERE key = ?', (key,))
+    return rows[0]['value'] if rows else default
+
+def get_kpis(prefix):
+    """Counters whose key starts with prefix, as {rest of key: value}"""
+    # Range scan on the primary key: prefix <= key < prefix with its last character bumped
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    rows = execute_query(
+        'SELECT key, value FROM kpi_counters WHERE key >= ? AND key < ? AND value != 0 ORDER BY key',
+        (prefix, upper)
+    )
+    return {row['key'][len(prefix):]: row['value'] for row in rows}
+
+def get_ppm_vendor_completion():
+    """(vendor, total assignments, completed) for every vendor holding a PPM schedule"""
+    counters = get_kpis('ppm.vendor.')
+    vendors = {}
+    for key, value in counters.items():
+        vendor, _, measure = key.rpartition('.')
+        vendors.setdefault(vendor, {'total': 0, 'completed': 0})[measure] = value
+    return [(vendor, c['total'], c['completed']) for vendor, c in vendors.items() if c['total']]
+
+# =============================================
+# VENDOR SCORECARDS
+# =============================================
+# One grouped pass over jobs, invoices and PPM assignments, limited to vendors
+# the triggers from migration 5 marked dirty
+SCORECARD_REFRESH_SQL = '''
+    INSERT OR REPLACE INTO vendor_scorecards 
+    (vendor_username, jobs_assigned, jobs_completed, avg_turnaround_days, 
+     invoiced_pending, invoiced_approved, invoiced_total, 
+     ppm_assigned, ppm_completed, ppm_on_time, updated_date) 
+    SELECT d.vendor_username, 
+           COALESCE(j.assigned, 0), COALESCE(j.completed, 0), j.turnaround, 
+           COALESCE(i.pending, 0), COALESCE(i.approved, 0), COALESCE(i.total, 0), 
+           COALESCE(p.assigned, 0), COALESCE(p.completed, 0), COALESCE(p.on_time, 0), 
+           CURRENT_TIMESTAMP 
+    FROM vendor_scorecard_dirty d 
+    LEFT JOIN (
+        SELECT assigned_vendor AS vendor, COUNT(*) AS assigned, 
+               SUM(status = 'Completed') AS completed, 
+               AVG(julianday(completed_date) - julianday(created_date)) AS turnaround 
+        FROM maintenance_requests 
+        WHERE assigned_vendor IN (SELECT vendor_username FROM vendor_scorecard_dirty) 
+        GROUP BY assigned_vendor
+    ) j ON j.vendor = d.vendor_username 
+    LEFT JOIN (
+        SELECT vendor_username AS vendor, 
+               SUM(CASE WHEN status = 'Pending' THEN total_amount ELSE 0 END) AS pending, 
+               SUM(CASE WHEN status = 'Approved' THEN total_amount ELSE 0 END) AS approved, 
+               SUM(total_amount) AS total 
+        FROM invoices 
+        WHERE vendor_username IN (SELECT vendor_username FROM vendor_scorecard_dirty) 
+        GROUP BY vendor_username
+    ) i ON i.vendor = d.vendor_username 
+    LEFT JOIN (
+        SELECT vendor_username AS vendor, COUNT(*) AS assigned, 
+               SUM(status = 'Completed') AS completed, 
+               SUM(status = 'Completed' AND completed_date <= due_date) AS on_time 
+        FROM ppm_assignments 
+        WHERE vendor_username IN (SELECT vendor_username FROM vendor_scorecard_dirty) 
+        GROUP BY vendor_username
+    ) p ON p.vendor = d.vendor_username
+'''
+
+def refresh_vendor_scorecards():
+    """Recompute scorecards for vendors whose jobs, invoices or PPM assignments changed"""
+    dirty = execute_query('SELECT COUNT(*) as count FROM vendor_scorecard_dirty')
+    if not dirty or not dirty[0]['count']:
+        return 0
+    
+    with transaction():
+        execute_update(SCORECARD_REFRESH_SQL)
+        execute_update('DELETE FROM vendor_scorecard_dirty')
+    return dirty[0]['count']
+
+def get_vendor_scorecards():
+    """Scorecard row for every vendor with activity, keyed by username"""
+    try:
+        refresh_vendor_scorecards()
+    except sqlite3.Error as e:
+        # Serve the previous scorecards; the dirty vendors are retried next read
+        print(f"Scorecard refresh error: {e}")
+    
+    scorecards = {}
+    for row in execute_query('SELECT * FROM vendor_scorecards'):
+        row['completion_rate'] = row['jobs_completed'] / row['jobs_assigned'] * 100 if row['jobs_assigned'] else 0.0
+        row['ppm_on_time_rate'] = row['ppm_on_time'] / row['ppm_completed'] * 100 if row['ppm_completed'] else 0.0
+        scorecards[row['vendor_username']] = row
+    return scorecards
@@ -0,0 +1,1056 @@
+import threading
+
+import db
+from utils import normalize_room_name
+
+# =============================================
+# SCHEMA MIGRATIONS
+# =============================================
+# Each migration is (version, description, steps). A step is either an SQL
+# statement or a callable taking the connection. Migrations are applied in
+# order, once, and the applied versions are recorded in schema_version.
+
+CORE_TABLES = [
+    '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            role TEXT NOT NULL,
+            vendor_type TEXT,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS maintenance_requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            location TEXT,
+            facility_type TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT DEFAULT 'Pending',
+            created_by TEXT NOT NULL,
+            assigned_vendor TEXT,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_date TIMESTAMP,
+            completion_notes TEXT,
+            job_breakdown TEXT,
+            invoice_amount REAL,
+            invoice_number TEXT,
+            requesting_dept_approval INTEGER DEFAULT 0,
+            facilities_manager_approval INTEGER DEFAULT 0,
+            department_approval_date TIMESTAMP,
+            manager_approval_date TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS vendors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            company_name TEXT NOT NULL,
+            contact_person TEXT NOT NULL,
+            email TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            vendor_type TEXT NOT NULL,
+            services_offered TEXT NOT NULL,
+            annual_turnover REAL,
+            tax_identification_number TEXT,
+            rc_number TEXT,
+            key_management_staff TEXT,
+            account_details TEXT,
+            certification TEXT,
+            address TEXT NOT NULL,
+            username TEXT NOT NULL,
+            registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_number TEXT UNIQUE NOT NULL,
+            request_id INTEGER,
+            vendor_username TEXT NOT NULL,
+            invoice_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            details_of_work TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            unit_cost REAL NOT NULL,
+            amount REAL NOT NULL,
+            labour_charge REAL DEFAULT 0,
+            vat_applicable INTEGER DEFAULT 0,
+            vat_amount REAL DEFAULT 0,
+            total_amount REAL NOT NULL,
+            status TEXT DEFAULT 'Pending'
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS ppm_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_name TEXT NOT NULL,
+            facility_category TEXT NOT NULL,
+            sub_category TEXT NOT NULL,
+            frequency TEXT NOT NULL,
+            next_maintenance_date DATE NOT NULL,
+            status TEXT DEFAULT 'Not Due',
+            assigned_vendor TEXT,
+            created_by TEXT NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            description TEXT,
+            notes TEXT,
+            estimated_duration_hours INTEGER,
+            estimated_cost REAL,
+            actual_completion_date DATE,
+            actual_cost REAL,
+            user_approved INTEGER DEFAULT 0,
+            manager_approved INTEGER DEFAULT 0
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS generator_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_date DATE NOT NULL,
+            generator_type TEXT NOT NULL,
+            opening_hours REAL NOT NULL,
+            closing_hours REAL NOT NULL,
+            net_hours REAL,
+            opening_inventory_liters REAL NOT NULL,
+            purchase_liters REAL DEFAULT 0,
+            closing_inventory_liters REAL NOT NULL,
+            net_diesel_consumed REAL,
+            recorded_by TEXT NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notes TEXT
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS hse_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            frequency TEXT NOT NULL,
+            next_due_date DATE NOT NULL,
+            status TEXT DEFAULT 'Not Due',
+            responsible_person TEXT,
+            created_by TEXT NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS hse_incidents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            incident_date DATE NOT NULL,
+            incident_type TEXT NOT NULL,
+            description TEXT NOT NULL,
+            location TEXT NOT NULL,
+            severity TEXT NOT NULL,
+            reported_by TEXT NOT NULL,
+            status TEXT DEFAULT 'Open',
+            action_taken TEXT,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS hse_inspections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            inspection_date DATE NOT NULL,
+            inspection_type TEXT NOT NULL,
+            inspector_name TEXT NOT NULL,
+            area_inspected TEXT NOT NULL,
+            findings TEXT,
+            recommendations TEXT,
+            status TEXT DEFAULT 'Completed',
+            created_by TEXT NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS room_bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_name TEXT NOT NULL,
+            room_type TEXT NOT NULL,
+            booking_date DATE NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            booked_by TEXT NOT NULL,
+            purpose TEXT NOT NULL,
+            attendees_count INTEGER,
+            status TEXT DEFAULT 'Confirmed',
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            notes TEXT
+        )
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS ppm_assignments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            schedule_id INTEGER NOT NULL,
+            vendor_username TEXT NOT NULL,
+            assigned_date DATE NOT NULL,
+            due_date DATE NOT NULL,
+            status TEXT DEFAULT 'Assigned',
+            assigned_by TEXT NOT NULL,
+            completed_date DATE,
+            completion_notes TEXT,
+            invoice_number TEXT,
+            FOREIGN KEY (schedule_id) REFERENCES ppm_schedules(id)
+        )
+    ''',
+]
+
+def _seed_demo_data(conn):
+    cursor = conn.cursor()
+    
+    # Insert sample users if table is empty
+    cursor.execute('SELECT COUNT(*) FROM users')
+    user_count = cursor.fetchone()[0]
+    
+    if user_count == 0:
+        sample_users = [
+            ('facility_user', '0123456', 'facility_user', None),
+            ('facility_manager', '0123456', 'facility_manager', None),
+            ('hvac_vendor', '0123456', 'vendor', 'HVAC'),
+            ('generator_vendor', '0123456', 'vendor', 'Generator'),
+            ('fixture_vendor', '0123456', 'vendor', 'Fixture and Fittings'),
+            ('building_vendor', '0123456', 'vendor', 'Building Maintenance'),
+            ('hse_vendor', '0123456', 'vendor', 'HSE'),
+            ('space_vendor', '0123456', 'vendor', 'Space Management'),
+            ('plumbing_vendor', '0123456', 'vendor', 'Plumbing'),
+            ('electrical_vendor', '0123456', 'vendor', 'Electrical'),
+            ('cleaning_vendor', '0123456', 'vendor', 'Cleaning')
+        ]
+        
+        for username, password, role, vendor_type in sample_users:
+            try:
+                cursor.execute(
+                    'INSERT INTO users (username, password_hash, role, vendor_type) VALUES (?, ?, ?, ?)',
+                    (username, password, role, vendor_type)
+                )
+            except:
+                pass
+    
+    # Insert sample vendors if table is empty
+    cursor.execute('SELECT COUNT(*) FROM vendors')
+    vendor_count = cursor.fetchone()[0]
+    
+    if vendor_count == 0:
+        sample_vendors = [
+            ('hvac_vendor', 'HVAC Solutions Inc.', 'John HVAC', 'hvac@example.com', '123-456-7890', 'HVAC', 
+             'HVAC installation, maintenance and repair services', 500000.00, 'TIN123456', 'RC789012',
+             'John Smith (CEO), Jane Doe (Operations Manager)', 'Bank: ABC Bank, Acc: 123456789', 
+             'HVAC Certified', '123 HVAC Street, City, State'),
+            ('generator_vendor', 'Generator Pros Ltd.', 'Mike Generator', 'generator@example.com', '123-456-7891', 'Generator',
+             'Generator installation and maintenance', 300000.00, 'TIN123457', 'RC789013',
+             'Mike Johnson (Director)', 'Bank: XYZ Bank, Acc: 987654321', 
+             'Generator Specialist', '456 Power Ave, City, State'),
+            ('fixture_vendor', 'Fixture Masters Co.', 'Sarah Fixtures', 'fixtures@example.com', '123-456-7892', 'Fixture and Fittings',
+             'Fixture installation and repairs', 250000.00, 'TIN123458', 'RC789014',
+             'Sarah Wilson (Owner)', 'Bank: DEF Bank, Acc: 456123789', 
+             'Fixture Expert', '789 Fixture Road, City, State'),
+            ('building_vendor', 'Building Care Services', 'David Builder', 'building@example.com', '123-456-7893', 'Building Maintenance',
+             'General building maintenance and repairs', 400000.00, 'TIN123459', 'RC789015',
+             'David Brown (Manager)', 'Bank: GHI Bank, Acc: 789456123', 
+             'Building Maintenance Certified', '321 Builders Lane, City, State')
+        ]
+        
+        for vendor_data in sample_vendors:
+            try:
+                cursor.execute('''
+                    INSERT INTO vendors 
+                    (username, company_name, contact_person, email, phone, vendor_type, services_offered, 
+                     annual_turnover, tax_identification_number, rc_number, key_management_staff, 
+                     account_details, certification, address) 
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', vendor_data)
+            except:
+                pass
+
+
+# Secondary indexes for the predicates used on every page render. Partial
+# indexes cover the approval queues, which only ever look at a few rows.
+HOT_PATH_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_requests_vendor_status ON maintenance_requests (assigned_vendor, status)',
+    'CREATE INDEX IF NOT EXISTS idx_requests_vendor_created ON maintenance_requests (assigned_vendor, created_date)',
+    'CREATE INDEX IF NOT EXISTS idx_requests_creator_created ON maintenance_requests (created_by, created_date)',
+    'CREATE INDEX IF NOT EXISTS idx_requests_status ON maintenance_requests (status)',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_requests_user_approval
+        ON maintenance_requests (created_by, completed_date)
+        WHERE status = 'Completed' AND requesting_dept_approval = 0
+    ''',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_requests_manager_approval
+        ON maintenance_requests (status, department_approval_date)
+        WHERE status = 'Completed' AND requesting_dept_approval = 1 AND facilities_manager_approval = 0
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_invoices_request ON invoices (request_id)',
+    'CREATE INDEX IF NOT EXISTS idx_invoices_vendor_status ON invoices (vendor_username, status, total_amount)',
+    'CREATE INDEX IF NOT EXISTS idx_vendors_username ON vendors (username)',
+    'CREATE INDEX IF NOT EXISTS idx_ppm_assignments_schedule ON ppm_assignments (schedule_id)',
+    'CREATE INDEX IF NOT EXISTS idx_ppm_assignments_vendor_due ON ppm_assignments (vendor_username, due_date)',
+    'CREATE INDEX IF NOT EXISTS idx_ppm_next_date ON ppm_schedules (next_maintenance_date)',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_ppm_user_approval
+        ON ppm_schedules (created_by, actual_completion_date)
+        WHERE status = 'Completed' AND user_approved = 0
+    ''',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_ppm_manager_approval
+        ON ppm_schedules (actual_completion_date)
+        WHERE status = 'Completed' AND user_approved = 1 AND manager_approved = 0
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_room_date ON room_bookings (room_name, booking_date)',
+    'CREATE INDEX IF NOT EXISTS idx_bookings_date ON room_bookings (booking_date, start_time)',
+    'CREATE INDEX IF NOT EXISTS idx_generator_date ON generator_records (record_date)',
+    'CREATE INDEX IF NOT EXISTS idx_generator_type_date ON generator_records (generator_type, record_date)',
+    'CREATE INDEX IF NOT EXISTS idx_hse_incidents_date ON hse_incidents (incident_date)',
+]
+
+# Headline counters for the dashboards, kept current by triggers on the source
+# tables. Each counter is (key, value, condition) written against {row}, which
+# is NEW/OLD inside a trigger and the table itself when backfilling.
+KPI_COUNTER_SOURCES = [
+    ('requests', 'maintenance_requests', ['status', 'priority', 'created_date'], [
+        ("'requests.total'", '1', '1'),
+        ("'requests.status.' || {row}.status", '1', '{row}.status IS NOT NULL'),
+        ("'requests.priority.' || {row}.priority", '1', '{row}.priority IS NOT NULL'),
+        ("'requests.month.' || substr({row}.created_date, 1, 7)", '1', '{row}.created_date IS NOT NULL'),
+    ]),
+    ('ppm', 'ppm_schedules', ['status', 'assigned_vendor'], [
+        ("'ppm.total'", '1', '1'),
+        ("'ppm.status.' || {row}.status", '1', '{row}.status IS NOT NULL'),
+        ("'ppm.vendor.' || {row}.assigned_vendor || '.total'", '1', '{row}.assigned_vendor IS NOT NULL'),
+        ("'ppm.vendor.' || {row}.assigned_vendor || '.completed'", '1',
+         "{row}.assigned_vendor IS NOT NULL AND {row}.status = 'Completed'"),
+    ]),
+    ('invoices', 'invoices', ['status', 'total_amount'], [
+        ("'invoices.total'", '1', '1'),
+        ("'invoices.status.' || {row}.status", '1', '{row}.status IS NOT NULL'),
+        ("'invoices.amount'", 'COALESCE({row}.total_amount, 0)', '1'),
+        ("'invoices.amount.' || {row}.status", 'COALESCE({row}.total_amount, 0)', '{row}.status IS NOT NULL'),
+    ]),
+    ('incidents', 'hse_incidents', ['status', 'severity'], [
+        ("'incidents.total'", '1', '1'),
+        ("'incidents.status.' || {row}.status", '1', '{row}.status IS NOT NULL'),
+        ("'incidents.severity.' || {row}.severity", '1', '{row}.severity IS NOT NULL'),
+    ]),
+]
+
+def _counter_statements(counters, row, sign):
+    return ''.join(
+        f'''
+            INSERT INTO kpi_counters (key, value)
+            SELECT {key.format(row=row)}, {sign}({value.format(row=row)})
+            WHERE {condition.format(row=row)}
+            ON CONFLICT(key) DO UPDATE SET value = value + excluded.value;'''
+        for key, value, condition in counters
+    )
+
+def _kpi_counter_steps():
+    steps = ['''
+        CREATE TABLE IF NOT EXISTS kpi_counters (
+            key TEXT PRIMARY KEY,
+            value NUMERIC NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''']
+    for name, table, watched, counters in KPI_COUNTER_SOURCES:
+        changed = ' OR '.join(f'OLD.{column} IS NOT NEW.{column}' for column in watched)
+        steps += [
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_{name}_insert AFTER INSERT ON {table}
+        BEGIN{_counter_statements(counters, 'NEW', '')}
+        END
+    ''',
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_{name}_delete AFTER DELETE ON {table}
+        BEGIN{_counter_statements(counters, 'OLD', '-')}
+        END
+    ''',
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_kpi_{name}_update AFTER UPDATE OF {', '.join(watched)} ON {table}
+        WHEN {changed}
+        BEGIN{_counter_statements(counters, 'OLD', '-')}{_counter_statements(counters, 'NEW', '')}
+        END
+    ''',
+        ]
+        # Backfill from the rows already in the table
+        steps += [
+            f'''
+        INSERT INTO kpi_counters (key, value)
+        SELECT key, SUM(value) FROM (
+            SELECT {key.format(row=table)} AS key, {value.format(row=table)} AS value
+            FROM {table} WHERE {condition.format(row=table)}
+        ) WHERE true GROUP BY key
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    '''
+            for key, value, condition in counters
+        ]
+    return steps
+
+# Per-vendor scorecards. Triggers only mark a vendor dirty when one of its jobs,
+# invoices or PPM assignments changes; kpis.refresh_vendor_scorecards recomputes
+# the dirty vendors in one grouped query the next time scorecards are read.
+SCORECARD_SOURCES = [
+    ('requests', 'maintenance_requests', 'assigned_vendor', ['assigned_vendor', 'status', 'created_date', 'completed_date']),
+    ('invoices', 'invoices', 'vendor_username', ['vendor_username', 'status', 'total_amount']),
+    ('ppm', 'ppm_assignments', 'vendor_username', ['vendor_username', 'status', 'due_date', 'completed_date']),
+]
+
+def _mark_dirty(row, column):
+    return f'''
+            INSERT OR IGNORE INTO vendor_scorecard_dirty (vendor_username)
+            SELECT {row}.{column} WHERE {row}.{column} IS NOT NULL;'''
+
+def _vendor_scorecard_steps():
+    steps = [
+        '''
+        CREATE TABLE IF NOT EXISTS vendor_scorecards (
+            vendor_username TEXT PRIMARY KEY,
+            jobs_assigned INTEGER NOT NULL DEFAULT 0,
+            jobs_completed INTEGER NOT NULL DEFAULT 0,
+            avg_turnaround_days REAL,
+            invoiced_pending REAL NOT NULL DEFAULT 0,
+            invoiced_approved REAL NOT NULL DEFAULT 0,
+            invoiced_total REAL NOT NULL DEFAULT 0,
+            ppm_assigned INTEGER NOT NULL DEFAULT 0,
+            ppm_completed INTEGER NOT NULL DEFAULT 0,
+            ppm_on_time INTEGER NOT NULL DEFAULT 0,
+            updated_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS vendor_scorecard_dirty (
+            vendor_username TEXT PRIMARY KEY
+        ) WITHOUT ROWID
+    ''',
+    ]
+    for name, table, column, watched in SCORECARD_SOURCES:
+        changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in watched)
+        steps += [
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_scorecard_{name}_insert AFTER INSERT ON {table}
+        BEGIN{_mark_dirty('NEW', column)}
+        END
+    ''',
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_scorecard_{name}_delete AFTER DELETE ON {table}
+        BEGIN{_mark_dirty('OLD', column)}
+        END
+    ''',
+            f'''
+        CREATE TRIGGER IF NOT EXISTS trg_scorecard_{name}_update AFTER UPDATE OF {', '.join(watched)} ON {table}
+        WHEN {changed}
+        BEGIN{_mark_dirty('OLD', column)}{_mark_dirty('NEW', column)}
+        END
+    ''',
+            # Every vendor with existing activity starts dirty
+            f'''
+        INSERT OR IGNORE INTO vendor_scorecard_dirty (vendor_username)
+        SELECT DISTINCT {column} FROM {table} WHERE {column} IS NOT NULL
+    ''',
+        ]
+    steps.append('INSERT OR IGNORE INTO vendor_scorecard_dirty (vendor_username) SELECT username FROM vendors')
+    return steps
+
+# Daily and monthly generator totals per generator type, plus an '*' row per
+# period covering all types. Triggers apply each record's contribution as a
+# delta, so inserting or correcting a record touches a handful of rollup rows.
+GENERATOR_ROLLUP_TABLES = [
+    '''
+        CREATE TABLE IF NOT EXISTS generator_daily (
+            generator_type TEXT NOT NULL,
+            record_date DATE NOT NULL,
+            record_count INTEGER NOT NULL DEFAULT 0,
+            net_hours REAL NOT NULL DEFAULT 0,
+            net_diesel REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (generator_type, record_date)
+        ) WITHOUT ROWID
+    ''',
+    '''
+        CREATE TABLE IF NOT EXISTS generator_monthly (
+            generator_type TEXT NOT NULL,
+            month TEXT NOT NULL,
+            record_count INTEGER NOT NULL DEFAULT 0,
+            active_days INTEGER NOT NULL DEFAULT 0,
+            net_hours REAL NOT NULL DEFAULT 0,
+            net_diesel REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (generator_type, month)
+        ) WITHOUT ROWID
+    ''',
+]
+
+def _generator_rollup_statements(row, sign):
+    types = f"(SELECT {row}.generator_type AS generator_type UNION ALL SELECT '*')"
+    month = f"substr({row}.record_date, 1, 7)"
+    return f'''
+            INSERT INTO generator_daily (generator_type, record_date, record_count, net_hours, net_diesel)
+            SELECT t.generator_type, {row}.record_date, {sign}1,
+                   {sign}COALESCE({row}.net_hours, 0), {sign}COALESCE({row}.net_diesel_consumed, 0)
+            FROM {types} t WHERE true
+            ON CONFLICT(generator_type, record_date) DO UPDATE SET
+                record_count = record_count + excluded.record_count,
+                net_hours = net_hours + excluded.net_hours,
+                net_diesel = net_diesel + excluded.net_diesel;
+            DELETE FROM generator_daily
+            WHERE generator_type IN ({row}.generator_type, '*') AND record_date = {row}.record_date
+            AND record_count <= 0;
+            INSERT INTO generator_monthly (generator_type, month, record_count, net_hours, net_diesel)
+            SELECT t.generator_type, {month}, {sign}1,
+                   {sign}COALESCE({row}.net_hours, 0), {sign}COALESCE({row}.net_diesel_consumed, 0)
+            FROM {types} t WHERE true
+            ON CONFLICT(generator_type, month) DO UPDATE SET
+                record_count = record_count + excluded.record_count,
+                net_hours = net_hours + excluded.net_hours,
+                net_diesel = net_diesel + excluded.net_diesel;
+            UPDATE generator_monthly SET active_days = (
+                SELECT COUNT(*) FROM generator_daily d
+                WHERE d.generator_type = generator_monthly.generator_type
+                AND d.record_date >= {month} || '-01' AND d.record_date < {month} || '-32'
+            )
+            WHERE generator_type IN ({row}.generator_type, '*') AND month = {month};'''
+
+GENERATOR_ROLLUPS = GENERATOR_ROLLUP_TABLES + [
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_rollup_insert AFTER INSERT ON generator_records
+        BEGIN{_generator_rollup_statements('NEW', '')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_rollup_delete AFTER DELETE ON generator_records
+        BEGIN{_generator_rollup_statements('OLD', '-')}
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_rollup_update
+        AFTER UPDATE OF record_date, generator_type, net_hours, net_diesel_consumed ON generator_records
+        WHEN OLD.record_date IS NOT NEW.record_date OR OLD.generator_type IS NOT NEW.generator_type
+          OR OLD.net_hours IS NOT NEW.net_hours OR OLD.net_diesel_consumed IS NOT NEW.net_diesel_consumed
+        BEGIN{_generator_rollup_statements('OLD', '-')}{_generator_rollup_statements('NEW', '')}
+        END
+    ''',
+    # Backfill from the records already stored
+    '''
+        INSERT INTO generator_daily (generator_type, record_date, record_count, net_hours, net_diesel)
+        SELECT generator_type, record_date, COUNT(*),
+               SUM(COALESCE(net_hours, 0)), SUM(COALESCE(net_diesel_consumed, 0))
+        FROM generator_records GROUP BY generator_type, record_date
+        UNION ALL
+        SELECT '*', record_date, COUNT(*),
+               SUM(COALESCE(net_hours, 0)), SUM(COALESCE(net_diesel_consumed, 0))
+        FROM generator_records GROUP BY record_date
+    ''',
+    '''
+        INSERT INTO generator_monthly (generator_type, month, record_count, active_days, net_hours, net_diesel)
+        SELECT generator_type, substr(record_date, 1, 7), SUM(record_count), COUNT(*),
+               SUM(net_hours), SUM(net_diesel)
+        FROM generator_daily GROUP BY generator_type, substr(record_date, 1, 7)
+    ''',
+]
+
+# Fuel anomalies found by generator_analytics.refresh_generator_anomalies. The
+# triggers only record, per generator type, the earliest record date whose
+# anomalies may have changed; the refresh recomputes from that date onwards.
+GENERATOR_ANOMALY_WATCHED = ['record_date', 'generator_type', 'net_hours', 'net_diesel_consumed',
+                             'opening_inventory_liters', 'closing_inventory_liters']
+
+def _mark_anomaly_dirty(row):
+    return f'''
+            INSERT INTO generator_anomaly_dirty (generator_type, from_date)
+            SELECT {row}.generator_type, {row}.record_date WHERE true
+            ON CONFLICT(generator_type) DO UPDATE SET from_date = MIN(from_date, excluded.from_date);'''
+
+def _generator_anomaly_steps():
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in GENERATOR_ANOMALY_WATCHED)
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS generator_anomalies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            record_id INTEGER NOT NULL,
+            generator_type TEXT NOT NULL,
+            record_date DATE NOT NULL,
+            anomaly_type TEXT NOT NULL,
+            observed REAL,
+            expected REAL,
+            score REAL,
+            detail TEXT,
+            detected_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (record_id, anomaly_type),
+            FOREIGN KEY (record_id) REFERENCES generator_records(id)
+        )
+    ''',
+        'CREATE INDEX IF NOT EXISTS idx_generator_anomalies_type_date ON generator_anomalies (generator_type, record_date)',
+        'CREATE INDEX IF NOT EXISTS idx_generator_anomalies_date ON generator_anomalies (record_date)',
+        '''
+        CREATE TABLE IF NOT EXISTS generator_anomaly_dirty (
+            generator_type TEXT PRIMARY KEY,
+            from_date DATE NOT NULL
+        ) WITHOUT ROWID
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_anomaly_insert AFTER INSERT ON generator_records
+        BEGIN{_mark_anomaly_dirty('NEW')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_anomaly_delete AFTER DELETE ON generator_records
+        BEGIN{_mark_anomaly_dirty('OLD')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_generator_anomaly_update
+        AFTER UPDATE OF {', '.join(GENERATOR_ANOMALY_WATCHED)} ON generator_records
+        WHEN {changed}
+        BEGIN{_mark_anomaly_dirty('OLD')}{_mark_anomaly_dirty('NEW')}
+        END
+    ''',
+        # Every type with existing records is scanned from its first record
+        '''
+        INSERT OR IGNORE INTO generator_anomaly_dirty (generator_type, from_date)
+        SELECT generator_type, MIN(record_date) FROM generator_records GROUP BY generator_type
+    ''',
+    ]
+
+# Occupied minutes per room, day and hour, with overlapping bookings merged so
+# double-booked time counts once. Triggers mark the (room, day) pairs whose
+# bookings changed; space.refresh_room_occupancy recomputes just those days.
+ROOM_OCCUPANCY_WATCHED = ['room_name', 'booking_date', 'start_time', 'end_time', 'status']
+
+def _mark_occupancy_dirty(row):
+    return f'''
+            INSERT OR IGNORE INTO room_occupancy_dirty (room_name, booking_date)
+            VALUES ({row}.room_name, {row}.booking_date);'''
+
+def _room_occupancy_steps():
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in ROOM_OCCUPANCY_WATCHED)
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS room_occupancy_hourly (
+            room_name TEXT NOT NULL,
+            booking_date DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            occupied_minutes INTEGER NOT NULL,
+            PRIMARY KEY (booking_date, room_name, hour)
+        ) WITHOUT ROWID
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS room_occupancy_dirty (
+            room_name TEXT NOT NULL,
+            booking_date DATE NOT NULL,
+            PRIMARY KEY (room_name, booking_date)
+        ) WITHOUT ROWID
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_occupancy_insert AFTER INSERT ON room_bookings
+        BEGIN{_mark_occupancy_dirty('NEW')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_occupancy_delete AFTER DELETE ON room_bookings
+        BEGIN{_mark_occupancy_dirty('OLD')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_occupancy_update
+        AFTER UPDATE OF {', '.join(ROOM_OCCUPANCY_WATCHED)} ON room_bookings
+        WHEN {changed}
+        BEGIN{_mark_occupancy_dirty('OLD')}{_mark_occupancy_dirty('NEW')}
+        END
+    ''',
+        # Every day with existing bookings starts dirty
+        '''
+        INSERT OR IGNORE INTO room_occupancy_dirty (room_name, booking_date)
+        SELECT DISTINCT room_name, booking_date FROM room_bookings
+    ''',
+    ]
+
+# Each ppm_schedules row is one occurrence. ppm.generate_next_occurrences links
+# the occurrence it creates to the completed one, and the unique index lets a
+# completed occurrence have only one successor however often generation runs.
+PPM_RECURRENCE = [
+    'ALTER TABLE ppm_schedules ADD COLUMN parent_schedule_id INTEGER REFERENCES ppm_schedules(id)',
+    '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_ppm_parent
+        ON ppm_schedules (parent_schedule_id)
+        WHERE parent_schedule_id IS NOT NULL
+    ''',
+    # Finished occurrences only, for the scan for ones still missing a successor
+    '''
+        CREATE INDEX IF NOT EXISTS idx_ppm_finished
+        ON ppm_schedules (frequency)
+        WHERE status IN ('Completed', 'Approved')
+    ''',
+]
+
+# Open occurrences only, for ppm.evaluate_statuses. Partial so the approval
+# and recurrence queries on finished statuses keep their own indexes.
+PPM_STATUS_DATES = [
+    '''
+        CREATE INDEX IF NOT EXISTS idx_ppm_status_date
+        ON ppm_schedules (status, next_maintenance_date)
+        WHERE status IN ('Not Due', 'Prepare', 'Due')
+    ''',
+]
+
+def _minutes_column(column):
+    return f"(CAST(substr({column}, 1, 2) AS INTEGER) * 60 + CAST(substr({column}, 4, 2) AS INTEGER))"
+
+# Booking times as minutes after midnight for space.book_room's overlap test.
+# Generated from the HH:MM text so every writer keeps them in step; the slot
+# index stores them, and its (room_name, booking_date) prefix replaces
+# idx_bookings_room_date.
+ROOM_BOOKING_MINUTES = [
+    f'ALTER TABLE room_bookings ADD COLUMN start_minute INTEGER GENERATED ALWAYS AS {_minutes_column("start_time")} VIRTUAL',
+    f'ALTER TABLE room_bookings ADD COLUMN end_minute INTEGER GENERATED ALWAYS AS {_minutes_column("end_time")} VIRTUAL',
+    '''
+        CREATE INDEX IF NOT EXISTS idx_bookings_slot
+        ON room_bookings (room_name, booking_date, start_minute, end_minute)
+    ''',
+    'DROP INDEX IF EXISTS idx_bookings_room_date',
+]
+
+# Bookable rooms and a per-room, per-day bitmap of busy 15-minute slots for
+# space.find_free_rooms. The 96 slots of a day are split over two integers of
+# 48 bits each (before and after noon) to stay inside SQLite's signed 64 bits.
+# A new booking ORs its slots in; cancellations, deletes and edits rebuild the
+# affected days from the live bookings. Rooms first seen in a booking are added
+# to the catalogue with that booking's type and attendee count.
+SLOT_MINUTES = 15
+SLOTS_PER_HALF_DAY = 12 * 60 // SLOT_MINUTES
+
+def _slot_mask(start, end, half):
+    """SQL for the bits of [start, end) minutes in one half-day bitmap"""
+    offset = f' - {half * SLOTS_PER_HALF_DAY}' if half else ''
+    first = f'max(0, min({SLOTS_PER_HALF_DAY}, {start} / {SLOT_MINUTES}{offset}))'
+    last = f'max(0, min({SLOTS_PER_HALF_DAY}, ({end} + {SLOT_MINUTES - 1}) / {SLOT_MINUTES}{offset}))'
+    return f'((1 << max({first}, {last})) - (1 << {first}))'
+
+def _rebuild_slot_bitmaps(where, key='room_name'):
+    return f'''
+            INSERT OR REPLACE INTO room_slot_bitmaps (booking_date, {key}, am_slots, pm_slots)
+            SELECT booking_date, {key},
+                   SUM(CASE WHEN slot < {SLOTS_PER_HALF_DAY} THEN 1 << slot ELSE 0 END),
+                   SUM(CASE WHEN slot >= {SLOTS_PER_HALF_DAY} THEN 1 << (slot - {SLOTS_PER_HALF_DAY}) ELSE 0 END)
+            FROM (
+                SELECT DISTINCT b.booking_date, b.{key}, t.slot
+                FROM room_bookings b
+                JOIN time_slots t ON b.start_minute < t.end_minute AND b.end_minute > t.start_minute
+                WHERE b.status != 'Cancelled' AND {where}
+            )
+            GROUP BY booking_date, {key};'''
+
+def _rebuild_room_day(row, key='room_name'):
+    # Clears the day first so a day left with no live bookings reads as free
+    return f'''
+            DELETE FROM room_slot_bitmaps WHERE booking_date = {row}.booking_date AND {key} = {row}.{key};''' + \
+        _rebuild_slot_bitmaps(f'b.{key} = {row}.{key} AND b.booking_date = {row}.booking_date', key)
+
+def _add_room(row):
+    # A booking's headcount says nothing about the room's size, so capacity
+    # is left for the catalogue to set
+    return f'''
+            INSERT OR IGNORE INTO rooms (room_name, room_type)
+            VALUES ({row}.room_name, {row}.room_type);'''
+
+def _room_availability_steps():
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in ROOM_OCCUPANCY_WATCHED)
+    return [
+        '''
+        CREATE TABLE IF NOT EXISTS rooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_name TEXT NOT NULL UNIQUE,
+            room_type TEXT NOT NULL,
+            capacity INTEGER,
+            active INTEGER DEFAULT 1,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS room_slot_bitmaps (
+            booking_date DATE NOT NULL,
+            room_name TEXT NOT NULL,
+            am_slots INTEGER NOT NULL DEFAULT 0,
+            pm_slots INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (booking_date, room_name)
+        ) WITHOUT ROWID
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS time_slots (
+            slot INTEGER PRIMARY KEY,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL
+        )
+    ''',
+        f'''
+        INSERT OR IGNORE INTO time_slots (slot, start_minute, end_minute)
+        WITH RECURSIVE slots(slot) AS (
+            SELECT 0 UNION ALL SELECT slot + 1 FROM slots WHERE slot < {2 * SLOTS_PER_HALF_DAY - 1}
+        )
+        SELECT slot, slot * {SLOT_MINUTES}, (slot + 1) * {SLOT_MINUTES} FROM slots
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_slots_insert AFTER INSERT ON room_bookings
+        BEGIN{_add_room('NEW')}
+            INSERT INTO room_slot_bitmaps (booking_date, room_name, am_slots, pm_slots)
+            SELECT NEW.booking_date, NEW.room_name,
+                   {_slot_mask('NEW.start_minute', 'NEW.end_minute', 0)},
+                   {_slot_mask('NEW.start_minute', 'NEW.end_minute', 1)}
+            WHERE NEW.status != 'Cancelled'
+            ON CONFLICT (booking_date, room_name) DO UPDATE SET
+                am_slots = am_slots | excluded.am_slots,
+                pm_slots = pm_slots | excluded.pm_slots;
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_slots_delete AFTER DELETE ON room_bookings
+        BEGIN{_rebuild_room_day('OLD')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_slots_update
+        AFTER UPDATE OF {', '.join(ROOM_OCCUPANCY_WATCHED)} ON room_bookings
+        WHEN {changed}
+        BEGIN{_add_room('NEW')}{_rebuild_room_day('OLD')}{_rebuild_room_day('NEW')}
+        END
+    ''',
+        # Rooms and busy slots of the bookings made so far
+        '''
+        INSERT OR IGNORE INTO rooms (room_name, room_type)
+        SELECT room_name,
+               (SELECT l.room_type FROM room_bookings l WHERE l.room_name = b.room_name ORDER BY l.id DESC LIMIT 1)
+        FROM room_bookings b
+        GROUP BY room_name
+    ''',
+        _rebuild_slot_bitmaps('1'),
+    ]
+
+# Rooms become a registry keyed by id. Names that differ only in case or
+# spacing are merged into the room with the most bookings, and bookings,
+# hourly occupancy and slot bitmaps switch from the free-text room_name to
+# room_id. room_name stays on bookings as the room's registered name. Bookings
+# written without a room_id (older code, imports) are matched to the registry
+# by case-insensitive name, normalized as utils.normalize_room_name does, and
+# register the room if it is new.
+ROOM_BOOKING_WATCHED = ['room_id', 'booking_date', 'start_time', 'end_time', 'status']
+
+def _normalized_room_name(name):
+    # utils.normalize_room_name in SQL: tabs and line breaks become spaces, each
+    # pass halves the runs of spaces (six passes cover runs of up to 64), then trim
+    name = f"replace(replace(replace({name}, char(9), ' '), char(10), ' '), char(13), ' ')"
+    for _ in range(6):
+        name = f"replace({name}, '  ', ' ')"
+    return f'trim({name})'
+
+def _register_rooms(conn):
+    """Rebuild rooms with a case-insensitive unique name, merging duplicate spellings"""
+    conn.execute('''
+        CREATE TABLE room_registry (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            room_type TEXT NOT NULL,
+            capacity INTEGER,
+            floor TEXT,
+            amenities TEXT,
+            active INTEGER DEFAULT 1,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    rooms = conn.execute('''
+        SELECT r.id, r.room_name, r.room_type, r.capacity, r.active, r.created_date,
+               (SELECT COUNT(*) FROM room_bookings b WHERE b.room_name = r.room_name) AS bookings
+        FROM rooms r
+        ORDER BY bookings DESC, r.id
+    ''').fetchall()
+    
+    canonical = {}
+    renames = []
+    for room_id, room_name, room_type, capacity, active, created_date, _ in rooms:
+        name = normalize_room_name(room_name)
+        key = name.casefold()
+        if key not in canonical:
+            canonical[key] = name
+            conn.execute(
+                '''INSERT INTO room_registry (id, room_name, room_type, capacity, active, created_date)
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                (room_id, name, room_type, capacity, active, created_date)
+            )
+        else:
+            # Merged rooms keep the larger known capacity and stay bookable if either was
+            conn.execute(
+                '''UPDATE room_registry SET capacity = COALESCE(max(capacity, ?1), capacity, ?1),
+                active = max(COALESCE(active, 0), COALESCE(?2, 0)) WHERE room_name = ?3''',
+                (capacity, active, canonical[key])
+            )
+        if room_name != canonical[key]:
+            renames.append((canonical[key], room_name))
+    
+    conn.executemany('UPDATE room_bookings SET room_name = ? WHERE room_name = ?', renames)
+    conn.execute('DROP TABLE rooms')
+    conn.execute('ALTER TABLE room_registry RENAME TO rooms')
+
+def _mark_room_day_dirty(row):
+    return f'''
+            INSERT OR IGNORE INTO room_occupancy_dirty (room_id, booking_date)
+            SELECT {row}.room_id, {row}.booking_date WHERE {row}.room_id IS NOT NULL;'''
+
+def _room_registry_steps():
+    changed = ' OR '.join(f'OLD.{c} IS NOT NEW.{c}' for c in ROOM_BOOKING_WATCHED)
+    registered_name = _normalized_room_name('NEW.room_name')
+    registered_id = f"(SELECT id FROM rooms WHERE room_name = {registered_name})"
+    return [
+        *[f'DROP TRIGGER IF EXISTS {trigger}' for trigger in (
+            'trg_room_occupancy_insert', 'trg_room_occupancy_delete', 'trg_room_occupancy_update',
+            'trg_room_slots_insert', 'trg_room_slots_delete', 'trg_room_slots_update')],
+        'DROP TABLE IF EXISTS room_occupancy_hourly',
+        'DROP TABLE IF EXISTS room_occupancy_dirty',
+        'DROP TABLE IF EXISTS room_slot_bitmaps',
+        _register_rooms,
+        'ALTER TABLE room_bookings ADD COLUMN room_id INTEGER REFERENCES rooms(id)',
+        '''
+        UPDATE room_bookings SET room_id = (SELECT id FROM rooms WHERE rooms.room_name = room_bookings.room_name)
+    ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_bookings_room_slot
+        ON room_bookings (room_id, booking_date, start_minute, end_minute)
+    ''',
+        'DROP INDEX IF EXISTS idx_bookings_slot',
+        '''
+        CREATE TABLE IF NOT EXISTS room_occupancy_hourly (
+            room_id INTEGER NOT NULL,
+            booking_date DATE NOT NULL,
+            hour INTEGER NOT NULL,
+            occupied_minutes INTEGER NOT NULL,
+            PRIMARY KEY (booking_date, room_id, hour)
+        ) WITHOUT ROWID
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS room_occupancy_dirty (
+            room_id INTEGER NOT NULL,
+            booking_date DATE NOT NULL,
+            PRIMARY KEY (room_id, booking_date)
+        ) WITHOUT ROWID
+    ''',
+        '''
+        CREATE TABLE IF NOT EXISTS room_slot_bitmaps (
+            booking_date DATE NOT NULL,
+            room_id INTEGER NOT NULL,
+            am_slots INTEGER NOT NULL DEFAULT 0,
+            pm_slots INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (booking_date, room_id)
+        ) WITHOUT ROWID
+    ''',
+        # Setting room_id fires the update triggers below, which take the booking into account
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_register AFTER INSERT ON room_bookings
+        WHEN NEW.room_id IS NULL
+        BEGIN
+            INSERT OR IGNORE INTO rooms (room_name, room_type)
+            VALUES ({registered_name}, NEW.room_type);
+            UPDATE room_bookings
+            SET room_id = {registered_id},
+                room_name = (SELECT room_name FROM rooms WHERE id = {registered_id})
+            WHERE id = NEW.id;
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_bookings_insert AFTER INSERT ON room_bookings
+        WHEN NEW.room_id IS NOT NULL
+        BEGIN{_mark_room_day_dirty('NEW')}
+            INSERT INTO room_slot_bitmaps (booking_date, room_id, am_slots, pm_slots)
+            SELECT NEW.booking_date, NEW.room_id,
+                   {_slot_mask('NEW.start_minute', 'NEW.end_minute', 0)},
+                   {_slot_mask('NEW.start_minute', 'NEW.end_minute', 1)}
+            WHERE NEW.status != 'Cancelled'
+            ON CONFLICT (booking_date, room_id) DO UPDATE SET
+                am_slots = am_slots | excluded.am_slots,
+                pm_slots = pm_slots | excluded.pm_slots;
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_bookings_delete AFTER DELETE ON room_bookings
+        BEGIN{_mark_room_day_dirty('OLD')}{_rebuild_room_day('OLD', 'room_id')}
+        END
+    ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_room_bookings_update
+        AFTER UPDATE OF {', '.join(ROOM_BOOKING_WATCHED)} ON room_bookings
+        WHEN {changed}
+        BEGIN{_mark_room_day_dirty('OLD')}{_mark_room_day_dirty('NEW')}{_rebuild_room_day('OLD', 'room_id')}{_rebuild_room_day('NEW', 'room_id')}
+        END
+    ''',
+        # Occupancy is recomputed on the next read; bitmaps are rebuilt now
+        '''
+        INSERT OR IGNORE INTO room_occupancy_dirty (room_id, booking_date)
+        SELECT DISTINCT room_id, booking_date FROM room_bookings WHERE room_id IS NOT NULL
+    ''',
+        _rebuild_slot_bitmaps('b.room_id IS NOT NULL', 'room_id'),
+    ]
+
+MIGRATIONS = [
+    (1, 'Core tables', CORE_TABLES),
+    (2, 'Demo users and vendors', [_seed_demo_data]),
+    (3, 'Hot path indexes', HOT_PATH_INDEXES),
+    (4, 'Trigger-maintained KPI counters', _kpi_counter_steps()),
+    (5, 'Vendor scorecards', _vendor_scorecard_steps()),
+    (6, 'Generator daily and monthly rollups', GENERATOR_ROLLUPS),
+    (7, 'Generator fuel anomalies', _generator_anomaly_steps()),
+    (8, 'Hourly room occupancy', _room_occupancy_steps()),
+    (9, 'PPM recurrence links', PPM_RECURRENCE),
+    (10, 'PPM status dates', PPM_STATUS_DATES),
+    (11, 'Room booking minute offsets', ROOM_BOOKING_MINUTES),
+    (12, 'Room availability bitmaps', _room_availability_steps()),
+    (13, 'Room registry', _room_registry_steps()),
+]
+
+_migrate_lock = threading.Lock()
+_migrated_path = None
+
+def get_schema_version(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    return row[0] or 0
+
+def _apply(conn, version, description, steps):
+    # BEGIN IMMEDIATE so two processes starting together cannot both apply it
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if get_schema_version(conn) >= version:
+            conn.execute('ROLLBACK')
+            return False
+        for step in steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+        conn.execute(
+            'INSERT INTO schema_version (version, description) VALUES (?, ?)',
+            (version, description)
+        )
+        conn.execute('COMMIT')
+        return True
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def migrate():
+    """Bring the database up to the latest schema version, once per process"""
+    global _migrated_path
+    
+    with _migrate_lock:
+        if _migrated_path == db.DB_PATH:
+            return
+        
+        conn = db.get_connection()
+        conn.isolation_level = None
+        try:
+            current = get_schema_version(conn)
+            for version, description, steps in MIGRATIONS:
+                if version > current and _apply(conn, version, description, steps):
+                    print(f"Applied migration {version}: {description}")
+        finally:
+            conn.close()
+        
+        _migrated_path = db.DB_PATH
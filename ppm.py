@@ -0,0 +1,434 @@
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+import db
+from db import execute_query, execute_query_df, execute_update, executemany, executemany_rowcount, transaction
+
+# =============================================
+# PPM RECURRENCE
+# =============================================
+# A completed occurrence gets one successor on the schedule's cadence, linked
+# through parent_schedule_id (migration 9). Cycles that passed before the work
+# was completed are skipped, so the successor is always the next one still
+# ahead of the completion date.
+FREQUENCY_STEPS = {
+    'Daily': ('D', 1),
+    'Weekly': ('D', 7),
+    'Monthly': ('M', 1),
+    'Quarterly': ('M', 3),
+    'Bi-annual': ('M', 6),
+    'Annual': ('M', 12),
+}
+
+# Occurrences in these states are finished and due a successor; written into
+# the SQL so the partial index idx_ppm_finished (migration 9) applies
+FINISHED_STATUSES = ('Completed', 'Approved')
+
+# Copied from the finished occurrence to its successor. The vendor is not: an
+# assignment is made per occurrence through ppm_assignments, so the successor
+# starts unassigned and goes through the usual assignment
+CARRIED_COLUMNS = ['schedule_name', 'facility_category', 'sub_category', 'frequency',
+                   'created_by', 'description', 'estimated_duration_hours', 'estimated_cost']
+
+_PENDING_SQL = f'''
+    FROM ppm_schedules s
+    WHERE s.status IN ({', '.join(f"'{status}'" for status in FINISHED_STATUSES)})
+    AND s.frequency IN ({', '.join('?' * len(FREQUENCY_STEPS))})
+    AND NOT EXISTS (SELECT 1 FROM ppm_schedules c WHERE c.parent_schedule_id = s.id)
+'''
+_PENDING_PARAMS = tuple(FREQUENCY_STEPS)
+
+def _add_months(start, months):
+    """start (datetime64[D]) plus whole months, clamped to the end of shorter months"""
+    month = start.astype('datetime64[M]')
+    day = (start - month.astype('datetime64[D]')).astype(int)
+    target = month + months
+    month_days = ((target + 1).astype('datetime64[D]') - target.astype('datetime64[D]')).astype(int)
+    return target.astype('datetime64[D]') + np.minimum(day, month_days - 1)
+
+def next_occurrence_dates(planned, frequencies, completed):
+    """First date on each cadence after both the planned date and the completion date.
+    
+    planned and completed are array-likes of dates; frequencies are names
+    from FREQUENCY_STEPS. Frequencies that do not recur give NaT.
+    """
+    planned = pd.to_datetime(pd.Series(planned), errors='coerce').to_numpy().astype('datetime64[D]')
+    completed = pd.to_datetime(pd.Series(completed), errors='coerce').to_numpy().astype('datetime64[D]')
+    completed = np.where(np.isnat(completed), planned, completed)
+    frequencies = pd.Series(frequencies)
+    units = frequencies.map(lambda f: FREQUENCY_STEPS.get(f, (None, 0))[0]).to_numpy()
+    steps = frequencies.map(lambda f: FREQUENCY_STEPS.get(f, (None, 0))[1]).to_numpy(dtype=int)
+    units[np.isnat(planned)] = None
+    result = np.full(len(planned), np.datetime64('NaT'), dtype='datetime64[D]')
+    
+    # Day-based cadences: the cycle count follows directly from the gap
+    days = units == 'D'
+    gap = (completed[days] - planned[days]).astype(int)
+    cycles = np.maximum(gap // steps[days] + 1, 1)
+    result[days] = planned[days] + cycles * steps[days]
+    
+    # Month-based cadences: estimate the cycle count from the month gap, then
+    # step past any cycle that still falls on or before the completion date
+    months = units == 'M'
+    start, done, step = planned[months], completed[months], steps[months]
+    gap = (done.astype('datetime64[M]') - start.astype('datetime64[M]')).astype(int)
+    cycles = np.maximum(gap // step, 1)
+    candidate = _add_months(start, cycles * step)
+    for _ in range(2):
+        late = candidate <= done
+        cycles = np.where(late, cycles + 1, cycles)
+        candidate = np.where(late, _add_months(start, cycles * step), candidate)
+    result[months] = candidate
+    return result
+
+def generate_next_occurrences(schedule_ids=None):
+    """Create the next occurrence for finished recurring schedules that have none yet.
+    
+    Limited to schedule_ids when given, otherwise every schedule still
+    missing its successor is caught up, all in one transaction. Returns the
+    number of occurrences created; successors another writer already added
+    are skipped and not counted.
+    """
+    if schedule_ids is None and not execute_query(f'SELECT 1 {_PENDING_SQL} LIMIT 1', _PENDING_PARAMS):
+        return 0
+    
+    query = f"SELECT s.id, s.next_maintenance_date, s.actual_completion_date, {', '.join(f's.{c}' for c in CARRIED_COLUMNS)} {_PENDING_SQL}"
+    params = _PENDING_PARAMS
+    if schedule_ids is not None:
+        schedule_ids = list(schedule_ids)
+        if not schedule_ids:
+            return 0
+        query += f" AND s.id IN ({', '.join('?' * len(schedule_ids))})"
+        params += tuple(schedule_ids)
+    
+    with transaction():
+        pending = execute_query_df(query, params)
+        if pending.empty:
+            return 0
+        
+        next_dates = next_occurrence_dates(pending['next_maintenance_date'], pending['frequency'],
+                                           pending['actual_completion_date'])
+        pending['next_maintenance_date'] = pd.Series(next_dates).dt.strftime('%Y-%m-%d').to_numpy()
+        pending = pending[~np.isnat(next_dates)]
+        
+        columns = ['parent_schedule_id', 'next_maintenance_date', *CARRIED_COLUMNS]
+        rows = pending.rename(columns={'id': 'parent_schedule_id'})[columns].astype(object)
+        rows = rows.where(pd.notna(rows), None)
+        created = executemany_rowcount(
+            f'''INSERT OR IGNORE INTO ppm_schedules ({', '.join(columns)}, status)
+            VALUES ({', '.join('?' * len(columns))}, 'Not Due')''',
+            list(rows.itertuples(index=False, name=None))
+        )
+    return created
+
+# =============================================
+# STATUS EVALUATION
+# =============================================
+# Open occurrences move Not Due -> Prepare -> Due -> Overdue as their
+# next_maintenance_date approaches and passes. One UPDATE moves every schedule
+# that has crossed a threshold. The status list and the prepare_by bound match
+# the partial index idx_ppm_status_date (migration 10), so each open status is
+# read only up to prepare_by. Statuses only move forward, so a schedule marked
+# Prepare by hand stays Prepare.
+PREPARE_LEAD_DAYS = int(os.environ.get('FM_PPM_PREPARE_DAYS', 14))
+DUE_LEAD_DAYS = int(os.environ.get('FM_PPM_DUE_DAYS', 3))
+
+# Minimum seconds between evaluations in one process
+STATUS_REFRESH_SECONDS = float(os.environ.get('FM_PPM_STATUS_REFRESH_SECONDS', 300))
+
+STATUS_UPDATE_SQL = '''
+    UPDATE ppm_schedules 
+    SET status = CASE 
+            WHEN next_maintenance_date < :today THEN 'Overdue' 
+            WHEN next_maintenance_date <= :due_by THEN 'Due' 
+            ELSE 'Prepare' 
+        END, 
+        last_updated = CURRENT_TIMESTAMP 
+    WHERE status IN ('Not Due', 'Prepare', 'Due') 
+    AND next_maintenance_date <= :prepare_by 
+    AND ((status = 'Not Due') 
+         OR (status = 'Prepare' AND next_maintenance_date <= :due_by) 
+         OR (status = 'Due' AND next_maintenance_date < :today))
+'''
+
+_status_lock = threading.Lock()
+_status_evaluated = {'at': None, 'day': None}
+
+def status_thresholds(today=None, prepare_days=PREPARE_LEAD_DAYS, due_days=DUE_LEAD_DAYS):
+    """Parameters for STATUS_UPDATE_SQL; the prepare window never ends before the due window"""
+    today = today or date.today()
+    due_by = today + timedelta(days=max(due_days, 0))
+    prepare_by = max(today + timedelta(days=prepare_days), due_by)
+    return {
+        'today': today.strftime('%Y-%m-%d'),
+        'due_by': due_by.strftime('%Y-%m-%d'),
+        'prepare_by': prepare_by.strftime('%Y-%m-%d'),
+    }
+
+def evaluate_statuses(force=False):
+    """Move open schedules whose dates have come closer to their next status.
+    
+    Runs at most once per STATUS_REFRESH_SECONDS per process (and whenever
+    the date changes) unless force is set. Returns True if it ran.
+    """
+    with _status_lock:
+        now = time.monotonic()
+        today = date.today()
+        last = _status_evaluated['at']
+        if (not force and last is not None and now - last < STATUS_REFRESH_SECONDS
+                and _status_evaluated['day'] == today):
+            return False
+        
+        if not execute_update(STATUS_UPDATE_SQL, status_thresholds(today)):
+            return False
+        _status_evaluated['at'] = now
+        _status_evaluated['day'] = today
+        return True
+
+# =============================================
+# WORKLOAD PROJECTION
+# =============================================
+# Every open occurrence is expanded along its cadence over the horizon. The
+# open occurrence itself counts from this week if it is overdue, since the work
+# is still outstanding; later cycles that have already passed are dropped, as
+# generate_next_occurrences skips them when the work is completed.
+PROJECTION_MONTHS = 12
+
+PROJECTION_COLUMNS = ['schedule_id', 'schedule_name', 'occurrence_date', 'week', 'facility_category',
+                      'assigned_vendor', 'estimated_duration_hours', 'estimated_cost']
+
+_projection_lock = threading.Lock()
+_projection_cache = {}
+
+def expand_occurrences(planned, frequencies, start, end):
+    """Occurrences of each schedule on its cadence from its planned date up to end.
+    
+    Returns (source row index, cycle number, date) arrays. Cycle 0 is the
+    planned date moved up to start if earlier; later cycles on or before start
+    are dropped. Frequencies outside FREQUENCY_STEPS only give cycle 0.
+    """
+    planned = pd.to_datetime(pd.Series(planned), errors='coerce').to_numpy().astype('datetime64[D]')
+    start, end = np.datetime64(start, 'D'), np.datetime64(end, 'D')
+    frequencies = pd.Series(frequencies)
+    units = frequencies.map(lambda f: FREQUENCY_STEPS.get(f, (None, 0))[0]).to_numpy()
+    steps = frequencies.map(lambda f: FREQUENCY_STEPS.get(f, (None, 0))[1]).to_numpy(dtype=int)
+    valid = ~np.isnat(planned)
+    
+    # Cycles up to end; month cadences can overshoot by one and are cut below
+    counts = valid.astype(int)
+    days = valid & (units == 'D')
+    counts[days] = (end - planned[days]).astype(int) // steps[days] + 1
+    months = valid & (units == 'M')
+    counts[months] = (end.astype('datetime64[M]') - planned[months].astype('datetime64[M]')).astype(int) // steps[months] + 1
+    counts[valid] = np.maximum(counts[valid], 1)
+    
+    source = np.repeat(np.arange(len(planned)), counts)
+    cycle = np.arange(len(source)) - np.repeat(np.cumsum(counts) - counts, counts)
+    base, offset = planned[source], cycle * steps[source]
+    dates = base.copy()
+    by_day = units[source] == 'D'
+    dates[by_day] = base[by_day] + offset[by_day]
+    by_month = units[source] == 'M'
+    dates[by_month] = _add_months(base[by_month], offset[by_month])
+    
+    dates = np.where(cycle == 0, np.maximum(dates, start), dates)
+    keep = ((cycle == 0) | (dates > start)) & (dates <= end)
+    return source[keep], cycle[keep], dates[keep]
+
+def _project_workload(start, end):
+    schedules = execute_query_df(f'''
+        SELECT id, schedule_name, next_maintenance_date, frequency, facility_category, 
+               assigned_vendor, estimated_duration_hours, estimated_cost 
+        FROM ppm_schedules 
+        WHERE status NOT IN ({', '.join(f"'{status}'" for status in FINISHED_STATUSES)})
+    ''', dtypes={'estimated_duration_hours': 'float64', 'estimated_cost': 'float64'})
+    
+    source, _, dates = expand_occurrences(schedules['next_maintenance_date'], schedules['frequency'], start, end)
+    occurrences = schedules.iloc[source].reset_index(drop=True).rename(columns={'id': 'schedule_id'})
+    occurrences['occurrence_date'] = pd.to_datetime(dates)
+    occurrences['week'] = occurrences['occurrence_date'] - pd.to_timedelta(occurrences['occurrence_date'].dt.weekday, unit='D')
+    occurrences = occurrences.fillna({'assigned_vendor': 'Unassigned', 'estimated_duration_hours': 0.0,
+                                      'estimated_cost': 0.0})
+    occurrences = occurrences[PROJECTION_COLUMNS]
+    
+    weekly = (
+        occurrences.groupby(['week', 'facility_category', 'assigned_vendor'], as_index=False)
+        .agg(occurrences=('schedule_id', 'size'), hours=('estimated_duration_hours', 'sum'),
+             cost=('estimated_cost', 'sum'))
+    )
+    return {'occurrences': occurrences, 'weekly': weekly}
+
+def get_workload_projection(months=PROJECTION_MONTHS):
+    """Projected PPM occurrences from today over the next `months` months.
+    
+    Returns {'occurrences': one row per projected occurrence, 'weekly':
+    occurrences, hours and cost per week (Monday), facility category and
+    vendor}. Cached until ppm_schedules changes or the date moves on; the
+    result is shared, so callers must not modify it.
+    """
+    start = date.today()
+    end = (pd.Timestamp(start) + pd.DateOffset(months=months)).date()
+    key = (db.table_version('ppm_schedules'), start, months)
+    with _projection_lock:
+        if _projection_cache.get('key') != key:
+            _projection_cache['projection'] = _project_workload(start, end)
+            _projection_cache['key'] = key
+        return _projection_cache['projection']
+
+# =============================================
+# VENDOR ASSIGNMENT
+# =============================================
+# Unassigned Prepare, Due and Overdue schedules are handed out earliest due
+# date first. Each goes to a capable vendor (the same vendor_type match as the
+# manual assignment dropdown) with room for its estimated hours in the week it
+# is due, falling back to earlier weeks down to the current one; among those
+# the vendor left least loaded wins. Hours already committed to outstanding
+# assignments count against each vendor's weekly capacity.
+VENDOR_WEEKLY_HOURS = float(os.environ.get('FM_VENDOR_WEEKLY_HOURS', 40))
+
+# Hours assumed for schedules without an estimate, as the schedule form defaults to
+DEFAULT_DURATION_HOURS = 2
+
+ASSIGNABLE_STATUSES = ('Prepare', 'Due', 'Overdue')
+
+UNASSIGNED_REASONS = {
+    'no_vendor': 'No vendor handles this facility category',
+    'no_capacity': 'No capable vendor has capacity before the due date',
+}
+
+def _week_start(day):
+    return day - timedelta(days=day.weekday())
+
+def _capable(vendor_type, category):
+    """The manual dropdown's vendor_type LIKE '%category%' match"""
+    return category.lower() in vendor_type.lower()
+
+def greedy_assign(schedules, vendors, committed, today, capacity=VENDOR_WEEKLY_HOURS):
+    """Assign schedules to vendors without exceeding any vendor's weekly hours.
+    
+    schedules: DataFrame of id, facility_category, due (date), hours
+    vendors: DataFrame of username, vendor_type
+    committed: {(username, week start): hours already booked}
+    
+    Returns (assignments DataFrame of schedule_id, vendor_username, week,
+    due_date; unassigned DataFrame of schedule_id, reason; final load dict).
+    """
+    load = dict(committed)
+    current_week = _week_start(today)
+    assignments = []
+    unassigned = []
+    
+    order = schedules.assign(_hours=-schedules['hours']).sort_values(['due', '_hours', 'id'])
+    for schedule in order.itertuples(index=False):
+        capable = [v for v in vendors.itertuples(index=False)
+                   if _capable(v.vendor_type, schedule.facility_category)]
+        if not capable:
+            unassigned.append((schedule.id, 'no_vendor'))
+            continue
+        
+        due = max(schedule.due, today)
+        week = _week_start(due)
+        choice = None
+        while week >= current_week and choice is None:
+            fits = [(load.get((v.username, week), 0.0) + schedule.hours, v.username) for v in capable
+                    if load.get((v.username, week), 0.0) + schedule.hours <= capacity]
+            if fits:
+                choice = (min(fits)[1], week)
+            else:
+                week -= timedelta(days=7)
+        
+        if choice is None:
+            unassigned.append((schedule.id, 'no_capacity'))
+            continue
+        
+        username, week = choice
+        load[(username, week)] = load.get((username, week), 0.0) + schedule.hours
+        # Work moved into an earlier week is due by the end of that week
+        assignments.append((schedule.id, username, week, min(due, week + timedelta(days=6))))
+    
+    return (pd.DataFrame(assignments, columns=['schedule_id', 'vendor_username', 'week', 'due_date']),
+            pd.DataFrame(unassigned, columns=['schedule_id', 'reason']),
+            load)
+
+def propose_vendor_assignments(capacity=VENDOR_WEEKLY_HOURS):
+    """Plan vendor assignments for every unassigned Prepare, Due or Overdue schedule.
+    
+    Returns {'assignments': planned rows with schedule details, 'unassigned':
+    schedules left out with a reason, 'load': hours per vendor and week,
+    committed and planned}.
+    """
+    today = date.today()
+    schedules = execute_query_df(f'''
+        SELECT id, schedule_name, facility_category, next_maintenance_date, estimated_duration_hours 
+        FROM ppm_schedules 
+        WHERE status IN ({', '.join(f"'{status}'" for status in ASSIGNABLE_STATUSES)}) 
+        AND (assigned_vendor IS NULL OR assigned_vendor = '')
+    ''', dtypes={'estimated_duration_hours': 'float64'})
+    vendors = execute_query_df('SELECT username, company_name, vendor_type FROM vendors ORDER BY username')
+    
+    committed = {}
+    if not vendors.empty:
+        rows = execute_query(f'''
+            SELECT a.vendor_username, a.due_date, COALESCE(s.estimated_duration_hours, ?) AS hours 
+            FROM ppm_assignments a 
+            JOIN ppm_schedules s ON s.id = a.schedule_id 
+            WHERE a.vendor_username IN ({', '.join('?' * len(vendors))}) 
+            AND a.due_date >= ? AND a.status != 'Completed'
+        ''', (DEFAULT_DURATION_HOURS, *vendors['username'], _week_start(today).strftime('%Y-%m-%d')))
+        for row in rows:
+            key = (row['vendor_username'], _week_start(datetime.strptime(row['due_date'], '%Y-%m-%d').date()))
+            committed[key] = committed.get(key, 0.0) + row['hours']
+    
+    schedules['due'] = pd.to_datetime(schedules['next_maintenance_date']).dt.date
+    schedules['hours'] = schedules['estimated_duration_hours'].fillna(DEFAULT_DURATION_HOURS)
+    assignments, unassigned, load = greedy_assign(schedules, vendors, committed, today, capacity)
+    
+    details = schedules[['id', 'schedule_name', 'facility_category', 'next_maintenance_date', 'hours']]
+    assignments = assignments.merge(details, left_on='schedule_id', right_on='id').drop(columns='id')
+    unassigned = unassigned.merge(details, left_on='schedule_id', right_on='id').drop(columns='id')
+    unassigned['reason'] = unassigned['reason'].map(UNASSIGNED_REASONS)
+    
+    load = pd.DataFrame(
+        [(username, week, committed.get((username, week), 0.0), hours) for (username, week), hours in load.items()],
+        columns=['vendor_username', 'week', 'committed_hours', 'total_hours']
+    )
+    load['planned_hours'] = load['total_hours'] - load['committed_hours']
+    return {'assignments': assignments, 'unassigned': unassigned, 'load': load.sort_values(['week', 'vendor_username'])}
+
+def apply_vendor_assignments(assignments, assigned_by):
+    """Write a proposed plan into ppm_assignments and mark the schedules WIP.
+    
+    Schedules assigned or moved on since the plan was made are skipped. All
+    rows are written in one transaction; returns the number applied.
+    """
+    if assignments.empty:
+        return 0
+    
+    assigned_date = date.today().strftime('%Y-%m-%d')
+    with transaction():
+        ids = [int(schedule_id) for schedule_id in assignments['schedule_id']]
+        still_open = {row['id'] for row in execute_query(f'''
+            SELECT id FROM ppm_schedules 
+            WHERE id IN ({', '.join('?' * len(ids))}) 
+            AND status IN ({', '.join(f"'{status}'" for status in ASSIGNABLE_STATUSES)}) 
+            AND (assigned_vendor IS NULL OR assigned_vendor = '')
+        ''', tuple(ids))}
+        plan = [(int(row.schedule_id), row.vendor_username, row.due_date.strftime('%Y-%m-%d'))
+                for row in assignments.itertuples(index=False) if row.schedule_id in still_open]
+        
+        executemany(
+            "UPDATE ppm_schedules SET assigned_vendor = ?, status = 'WIP' WHERE id = ?",
+            [(vendor, schedule_id) for schedule_id, vendor, _ in plan]
+        )
+        executemany(
+            '''INSERT INTO ppm_assignments 
+            (schedule_id, vendor_username, assigned_date, due_date, assigned_by) 
+            VALUES (?, ?, ?, ?, ?)''',
+            [(schedule_id, vendor, assigned_date, due_date, assigned_by) for schedule_id, vendor, due_date in plan]
+        )
+    return len(plan)
@@ -0,0 +1,94 @@
+from datetime import date
+
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+
+# =============================================
+# SHARED REPORT STYLES
+# =============================================
+# Built once per process and reused by every PDF builder; ReportLab only reads
+# styles while laying out a document, so they are safe to share.
+APP_NAME = "A-Z Facilities Management Pro APP™"
+
+STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=STYLES['Heading1'],
+    fontSize=24,
+    spaceAfter=30,
+    textColor=colors.HexColor('#1e3a8a')
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=STYLES['Heading2'],
+    fontSize=14,
+    spaceAfter=12,
+    textColor=colors.HexColor('#3b82f6')
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'Normal',
+    parent=STYLES['Normal'],
+    fontSize=10,
+    spaceAfter=6
+)
+
+# Two-column label/value tables
+DETAIL_COL_WIDTHS = [2*inch, 4*inch]
+
+DETAIL_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+])
+
+SHADED_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f1f5f9')),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+])
+
+COST_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f1f5f9')),
+])
+
+COST_COL_WIDTHS = [3*inch, 1*inch, 1.5*inch, 1.5*inch]
+
+# =============================================
+# SHARED REPORT FLOWABLES
+# =============================================
+def detail_table(rows, style=None):
+    """Label/value table in the standard report layout"""
+    table = Table(rows, colWidths=DETAIL_COL_WIDTHS)
+    if style is not None:
+        table.setStyle(style)
+    return table
+
+def report_header(title, style=TITLE_STYLE):
+    return [Paragraph(title, style), Spacer(1, 20)]
+
+def report_footer(first_line=None, style=STYLES['Normal']):
+    """Closing lines of a report; defaults to the generation date.
+    
+    Only the date: rendered reports are cached for the rest of the day
+    (see reports.cached_pdf), so a time of day would go stale.
+    """
+    if first_line is None:
+        first_line = f"Report generated on: {date.today().isoformat()}"
+    return [Spacer(1, 40), Paragraph(first_line, style), Paragraph(APP_NAME, style)]
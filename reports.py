@@ -0,0 +1,535 @@
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date
+
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+
+import db
+from db import execute_query
+from report_templates import (
+    STYLES, HEADING_STYLE, NORMAL_STYLE, DETAIL_TABLE_STYLE, SHADED_TABLE_STYLE,
+    COST_TABLE_STYLE, COST_COL_WIDTHS, detail_table, report_header, report_footer
+)
+from utils import safe_get, safe_float, safe_str, safe_int, format_ngn, safe_bool
+
+# =============================================
+# RENDERED REPORT CACHE
+# =============================================
+# Rendered PDFs are kept on disk under a hash of the rows they were built from,
+# so a report is only rebuilt after the request, invoice or assignment changes.
+# The footer carries the date the report was generated, so the date is part of
+# the hash too and a cached file is served for at most the rest of that day.
+REPORT_CACHE_DIR = os.environ.get('FM_REPORT_CACHE_DIR', 'report_cache')
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('FM_REPORT_CACHE_MB', 200)) * 1024 * 1024
+
+# Bump when a report layout changes so files rendered by older code are not served
+REPORT_LAYOUT_VERSION = 2
+
+_report_cache_lock = threading.Lock()
+
+def _content_hash(kind, rows):
+    payload = json.dumps([REPORT_LAYOUT_VERSION, date.today().isoformat(), kind, rows],
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:20]
+
+def cached_pdf(kind, record_id, rows, build):
+    """Return the PDF for rows from the disk cache, rendering it with build() on a miss"""
+    prefix = f"{kind}_{record_id}_"
+    path = os.path.join(REPORT_CACHE_DIR, f"{prefix}{_content_hash(kind, rows)}.pdf")
+    
+    try:
+        with open(path, 'rb') as f:
+            pdf = f.read()
+        os.utime(path)  # mark as recently used for eviction
+        return io.BytesIO(pdf)
+    except OSError:
+        pass
+    
+    pdf = build()
+    try:
+        os.makedirs(REPORT_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(pdf)
+        os.replace(tmp_path, path)
+        _prune_report_cache(prefix, keep=path)
+    except OSError as e:
+        print(f"Report cache error: {e}")
+    return io.BytesIO(pdf)
+
+def _prune_report_cache(prefix, keep):
+    """Drop superseded renders of this record, then the least recently used files over budget"""
+    with _report_cache_lock:
+        entries = []
+        for entry in os.scandir(REPORT_CACHE_DIR):
+            if not entry.name.endswith('.pdf'):
+                continue
+            if entry.name.startswith(prefix) and entry.path != keep:
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= REPORT_CACHE_MAX_BYTES:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
+
+def clear_report_cache():
+    with _report_cache_lock:
+        if os.path.isdir(REPORT_CACHE_DIR):
+            for entry in os.scandir(REPORT_CACHE_DIR):
+                if entry.name.endswith('.pdf'):
+                    os.remove(entry.path)
+
+def lazy_pdf(create_report, record_id):
+    """Callable for st.download_button that renders the report only when clicked"""
+    def render():
+        pdf_buffer = create_report(record_id)
+        return pdf_buffer.getvalue() if pdf_buffer else b''
+    return render
+
+# =============================================
+# PDF REPORT GENERATION FUNCTIONS
+# =============================================
+def create_maintenance_pdf_report(request_id):
+    """Create PDF report for maintenance job completion"""
+    # Get request details
+    request = execute_query('SELECT * FROM maintenance_requests WHERE id = ?', (request_id,))
+    if not request:
+        return None
+    request = request[0]
+    
+    # Get invoice details if exists
+    invoice = execute_query('SELECT * FROM invoices WHERE request_id = ?', (request_id,))
+    
+    return cached_pdf('job', request_id, (request, invoice),
+                      lambda: _build_maintenance_pdf(request, invoice))
+
+def _build_maintenance_pdf(request, invoice):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=A4, rightMargin=72, leftMargin=72, 
+                           topMargin=72, bottomMargin=18)
+    
+    # Story container for PDF elements
+    story = []
+    
+    # Title
+    story.extend(report_header("MAINTENANCE JOB COMPLETION REPORT"))
+    
+    # Job Details
+    story.append(Paragraph("Job Details", HEADING_STYLE))
+    
+    job_data = [
+        ["Job ID:", str(safe_get(request, 'id', ''))],
+        ["Title:", safe_str(safe_get(request, 'title', ''))],
+        ["Location:", safe_str(safe_get(request, 'location', 'N/A'))],
+        ["Facility Type:", safe_str(safe_get(request, 'facility_type', ''))],
+        ["Priority:", safe_str(safe_get(request, 'priority', ''))],
+        ["Created By:", safe_str(safe_get(request, 'created_by', ''))],
+        ["Created Date:", safe_str(safe_get(request, 'created_date', ''))],
+        ["Assigned Vendor:", safe_str(safe_get(request, 'assigned_vendor', 'N/A'))],
+        ["Status:", safe_str(safe_get(request, 'status', ''))],
+        ["Completed Date:", safe_str(safe_get(request, 'completed_date', 'N/A'))]
+    ]
+    
+    job_table = detail_table(job_data, DETAIL_TABLE_STYLE)
+    
+    story.append(job_table)
+    story.append(Spacer(1, 20))
+    
+    # Description
+    story.append(Paragraph("Job Description", HEADING_STYLE))
+    story.append(Paragraph(safe_str(safe_get(request, 'description', '')), NORMAL_STYLE))
+    story.append(Spacer(1, 20))
+    
+    # Completion Notes
+    if safe_get(request, 'completion_notes'):
+        story.append(Paragraph("Completion Notes", HEADING_STYLE))
+        story.append(Paragraph(safe_str(safe_get(request, 'completion_notes', '')), NORMAL_STYLE))
+        story.append(Spacer(1, 20))
+    
+    # Job Breakdown
+    if safe_get(request, 'job_breakdown'):
+        story.append(Paragraph("Job Breakdown", HEADING_STYLE))
+        story.append(Paragraph(safe_str(safe_get(request, 'job_breakdown', '')), NORMAL_STYLE))
+        story.append(Spacer(1, 20))
+    
+    # Invoice Details
+    if invoice:
+        invoice = invoice[0]
+        story.append(Paragraph("Invoice Details", HEADING_STYLE))
+        
+        invoice_data = [
+            ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
+            ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
+            ["Details of Work:", safe_str(safe_get(invoice, 'details_of_work', ''))],
+            ["Quantity:", str(safe_int(safe_get(invoice, 'quantity', 0)))],
+            ["Unit Cost:", format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0)))],
+            ["Material Cost:", format_ngn(safe_float(safe_get(invoice, 'amount', 0)))],
+            ["Labour Charges:", format_ngn(safe_float(safe_get(invoice, 'labour_charge', 0)))],
+            ["VAT Amount:", format_ngn(safe_float(safe_get(invoice, 'vat_amount', 0)))],
+            ["Total Amount:", format_ngn(safe_float(safe_get(invoice, 'total_amount', 0)))],
+            ["Invoice Status:", safe_str(safe_get(invoice, 'status', ''))]
+        ]
+        
+        invoice_table = detail_table(invoice_data, DETAIL_TABLE_STYLE)
+        
+        story.append(invoice_table)
+        story.append(Spacer(1, 20))
+    
+    # Approval Status
+    story.append(Paragraph("Approval Status", HEADING_STYLE))
+    
+    approval_data = [
+        ["Department Approval:", "Approved" if safe_bool(safe_get(request, 'requesting_dept_approval')) else "Pending"],
+        ["Department Approval Date:", safe_str(safe_get(request, 'department_approval_date', 'N/A'))],
+        ["Manager Approval:", "Approved" if safe_bool(safe_get(request, 'facilities_manager_approval')) else "Pending"],
+        ["Manager Approval Date:", safe_str(safe_get(request, 'manager_approval_date', 'N/A'))]
+    ]
+    
+    approval_table = detail_table(approval_data, DETAIL_TABLE_STYLE)
+    
+    story.append(approval_table)
+    
+    # Footer
+    story.extend(report_footer(style=NORMAL_STYLE))
+    
+    # Build PDF
+    doc.build(story)
+    
+    return buffer.getvalue()
+
+def create_ppm_pdf_report(schedule_id):
+    """Create PDF report for PPM completion"""
+    # Get schedule details
+    schedule = execute_query('SELECT * FROM ppm_schedules WHERE id = ?', (schedule_id,))
+    if not schedule:
+        return None
+    schedule = schedule[0]
+    
+    # Get assignment details
+    assignment = execute_query('SELECT * FROM ppm_assignments WHERE schedule_id = ?', (schedule_id,))
+    
+    return cached_pdf('ppm', schedule_id, (schedule, assignment),
+                      lambda: _build_ppm_pdf(schedule, assignment))
+
+def _build_ppm_pdf(schedule, assignment):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    
+    story = []
+    
+    # Title
+    story.extend(report_header("PPM COMPLETION REPORT"))
+    
+    # Schedule Details
+    story.append(Paragraph("PPM Schedule Details", STYLES['Heading2']))
+    
+    schedule_data = [
+        ["Schedule ID:", str(safe_get(schedule, 'id', ''))],
+        ["Schedule Name:", safe_str(safe_get(schedule, 'schedule_name', ''))],
+        ["Facility Category:", safe_str(safe_get(schedule, 'facility_category', ''))],
+        ["Sub-Category:", safe_str(safe_get(schedule, 'sub_category', ''))],
+        ["Frequency:", safe_str(safe_get(schedule, 'frequency', ''))],
+        ["Next Maintenance Date:", safe_str(safe_get(schedule, 'next_maintenance_date', ''))],
+        ["Status:", safe_str(safe_get(schedule, 'status', ''))],
+        ["Assigned Vendor:", safe_str(safe_get(schedule, 'assigned_vendor', 'N/A'))],
+        ["Created By:", safe_str(safe_get(schedule, 'created_by', ''))],
+        ["Estimated Cost:", format_ngn(safe_float(safe_get(schedule, 'estimated_cost', 0)))],
+        ["Actual Completion Date:", safe_str(safe_get(schedule, 'actual_completion_date', 'N/A'))],
+        ["Actual Cost:", format_ngn(safe_float(safe_get(schedule, 'actual_cost', 0))) if safe_get(schedule, 'actual_cost') else "N/A"]
+    ]
+    
+    schedule_table = detail_table(schedule_data, SHADED_TABLE_STYLE)
+    
+    story.append(schedule_table)
+    story.append(Spacer(1, 20))
+    
+    # Description
+    story.append(Paragraph("Description", STYLES['Heading2']))
+    story.append(Paragraph(safe_str(safe_get(schedule, 'description', '')), STYLES['Normal']))
+    
+    # Notes
+    if safe_get(schedule, 'notes'):
+        story.append(Spacer(1, 10))
+        story.append(Paragraph("Notes", STYLES['Heading2']))
+        story.append(Paragraph(safe_str(safe_get(schedule, 'notes', '')), STYLES['Normal']))
+    
+    # Assignment Details
+    if assignment:
+        assignment = assignment[0]
+        story.append(Spacer(1, 20))
+        story.append(Paragraph("Assignment Details", STYLES['Heading2']))
+        
+        assign_data = [
+            ["Assigned To:", safe_str(safe_get(assignment, 'vendor_username', ''))],
+            ["Assigned Date:", safe_str(safe_get(assignment, 'assigned_date', ''))],
+            ["Due Date:", safe_str(safe_get(assignment, 'due_date', ''))],
+            ["Completed Date:", safe_str(safe_get(assignment, 'completed_date', 'N/A'))],
+            ["Status:", safe_str(safe_get(assignment, 'status', ''))]
+        ]
+        
+        assign_table = detail_table(assign_data)
+        story.append(assign_table)
+        
+        if safe_get(assignment, 'completion_notes'):
+            story.append(Spacer(1, 10))
+            story.append(Paragraph("Completion Notes", STYLES['Heading2']))
+            story.append(Paragraph(safe_str(safe_get(assignment, 'completion_notes', '')), STYLES['Normal']))
+    
+    # Approval Status
+    story.append(Spacer(1, 20))
+    story.append(Paragraph("Approval Status", STYLES['Heading2']))
+    
+    approval_data = [
+        ["User Approved:", "Yes" if safe_bool(safe_get(schedule, 'user_approved')) else "No"],
+        ["Manager Approved:", "Yes" if safe_bool(safe_get(schedule, 'manager_approved')) else "No"]
+    ]
+    
+    approval_table = detail_table(approval_data)
+    story.append(approval_table)
+    
+    # Footer
+    story.extend(report_footer())
+    
+    doc.build(story)
+    return buffer.getvalue()
+
+def create_invoice_pdf(invoice_id):
+    """Create PDF invoice"""
+    # Get invoice details
+    invoice = execute_query('SELECT * FROM invoices WHERE id = ?', (invoice_id,))
+    if not invoice:
+        return None
+    invoice = invoice[0]
+    
+    # Get request details
+    request = execute_query('SELECT * FROM maintenance_requests WHERE id = ?', (invoice['request_id'],))
+    
+    return cached_pdf('invoice', invoice_id, (invoice, request),
+                      lambda: _build_invoice_pdf(invoice, request))
+
+def _build_invoice_pdf(invoice, request):
+    buffer = io.BytesIO()
+    
+    # Create PDF
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    
+    story = []
+    
+    # Header
+    story.extend(report_header("INVOICE", STYLES['Title']))
+    
+    # Invoice Details
+    story.append(Paragraph("Invoice Details", STYLES['Heading2']))
+    
+    invoice_details = [
+        ["Invoice Number:", safe_str(safe_get(invoice, 'invoice_number', ''))],
+        ["Invoice Date:", safe_str(safe_get(invoice, 'invoice_date', ''))],
+        ["Vendor:", safe_str(safe_get(invoice, 'vendor_username', ''))],
+        ["Status:", safe_str(safe_get(invoice, 'status', ''))]
+    ]
+    
+    if request:
+        request = request[0]
+        invoice_details.append(["Job Title:", safe_str(safe_get(request, 'title', ''))])
+        invoice_details.append(["Location:", safe_str(safe_get(request, 'location', 'N/A'))])
+    
+    inv_table = detail_table(invoice_details)
+    story.append(inv_table)
+    story.append(Spacer(1, 20))
+    
+    # Work Details
+    story.append(Paragraph("Work Details", STYLES['Heading2']))
+    story.append(Paragraph(safe_str(safe_get(invoice, 'details_of_work', '')), STYLES['Normal']))
+    story.append(Spacer(1, 20))
+    
+    # Cost Breakdown
+    story.append(Paragraph("Cost Breakdown", STYLES['Heading2']))
+    
+    amount = safe_float(safe_get(invoice, 'amount', 0))
+    labour_charge = safe_float(safe_get(invoice, 'labour_charge', 0))
+    vat_amount = safe_float(safe_get(invoice, 'vat_amount', 0))
+    total_amount = safe_float(safe_get(invoice, 'total_amount', 0))
+    
+    cost_data = [
+        ["Description", "Quantity", "Unit Cost", "Amount"],
+        ["Materials", str(safe_int(safe_get(invoice, 'quantity', 0))), format_ngn(safe_float(safe_get(invoice, 'unit_cost', 0))), format_ngn(amount)],
+        ["Labour Charges", "1", format_ngn(labour_charge), format_ngn(labour_charge)],
+        ["Subtotal", "", "", format_ngn(amount + labour_charge)],
+        ["VAT (7.5%)" if safe_bool(safe_get(invoice, 'vat_applicable')) else "VAT", "", "", format_ngn(vat_amount)],
+        ["TOTAL", "", "", format_ngn(total_amount)]
+    ]
+    
+    cost_table = Table(cost_data, colWidths=COST_COL_WIDTHS)
+    cost_table.setStyle(COST_TABLE_STYLE)
+    
+    story.append(cost_table)
+    
+    # Footer
+    story.extend(report_footer("Thank you for your business!"))
+    
+    doc.build(story)
+    return buffer.getvalue()
+
+def get_pdf_download_link(pdf_buffer, filename):
+    """Generate download link for PDF"""
+    b64 = base64.b64encode(pdf_buffer.getvalue()).decode()
+    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}" class="pdf-download-btn">📥 Download {filename}</a>'
+
+# =============================================
+# BULK EXPORT
+# =============================================
+EXPORT_DIR = os.environ.get('FM_EXPORT_DIR', 'exports')
+EXPORT_MAX_BYTES = int(os.environ.get('FM_EXPORT_MB', 500)) * 1024 * 1024
+
+# Worker processes used for a bulk export; each renders one report at a time
+EXPORT_MAX_WORKERS = int(os.environ.get('FM_EXPORT_WORKERS', os.cpu_count() or 1))
+
+# A worker process starts by spawning an interpreter and importing ReportLab and
+# pandas, which costs about as much as rendering a hundred reports. Smaller
+# exports get fewer workers, and one worker renders in the calling process.
+EXPORT_REPORTS_PER_WORKER = int(os.environ.get('FM_EXPORT_REPORTS_PER_WORKER', 100))
+
+# Kind -> (report function, file name inside the ZIP)
+REPORT_KINDS = {
+    'job': (create_maintenance_pdf_report, 'job_reports/job_report_{}.pdf'),
+    'ppm': (create_ppm_pdf_report, 'ppm_reports/ppm_report_{}.pdf'),
+    'invoice': (create_invoice_pdf, 'invoices/invoice_{}.pdf'),
+}
+
+def _init_export_worker(db_path, cache_dir):
+    global REPORT_CACHE_DIR
+    db.configure(db_path)
+    REPORT_CACHE_DIR = cache_dir
+
+def _render_for_export(kind, record_id):
+    pdf_buffer = REPORT_KINDS[kind][0](record_id)
+    return kind, record_id, pdf_buffer.getvalue() if pdf_buffer else None
+
+def _export_workers(count, workers=None):
+    """Workers for an export of count reports; an explicit workers is only capped at count"""
+    if workers:
+        return max(1, min(workers, count))
+    return max(1, min(EXPORT_MAX_WORKERS, count // EXPORT_REPORTS_PER_WORKER))
+
+def _render_in_pool(items, workers):
+    """Yield (kind, id, pdf bytes or None) as worker processes finish them, in any order"""
+    # spawn, not fork: children must not inherit the parent's open SQLite connections
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=_init_export_worker,
+                               initargs=(os.path.abspath(db.DB_PATH), os.path.abspath(REPORT_CACHE_DIR)))
+    with pool:
+        queue = iter(items)
+        pending = set()
+        while True:
+            while len(pending) < workers * 2:
+                item = next(queue, None)
+                if item is None:
+                    break
+                pending.add(pool.submit(_render_for_export, *item))
+            if not pending:
+                break
+            
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+def export_reports_zip(items, zip_path, workers=None, progress=None):
+    """Render (kind, id) reports and stream them into a ZIP file.
+    
+    Large exports are spread over worker processes (see
+    EXPORT_REPORTS_PER_WORKER). At most two reports per worker are in flight,
+    so memory stays flat however many ids are exported.
+    progress(done, total, reports_per_sec) is called after each report is
+    written.
+    """
+    items = list(items)
+    workers = _export_workers(len(items), workers)
+    written = missing = 0
+    start = time.perf_counter()
+    
+    os.makedirs(os.path.dirname(os.path.abspath(zip_path)), exist_ok=True)
+    # Unique per writer, so concurrent exports of the same range don't share a partial file
+    tmp_path = f"{zip_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    
+    if workers > 1:
+        rendered = _render_in_pool(items, workers)
+    else:
+        rendered = (_render_for_export(*item) for item in items)
+    
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for kind, record_id, pdf in rendered:
+                if pdf is None:
+                    missing += 1
+                else:
+                    zf.writestr(REPORT_KINDS[kind][1].format(record_id), pdf)
+                    written += 1
+                if progress:
+                    elapsed = time.perf_counter() - start
+                    progress(written + missing, len(items), (written + missing) / elapsed if elapsed else 0.0)
+        os.replace(tmp_path, zip_path)
+    finally:
+        # Shuts the worker pool down if writing the ZIP failed part way
+        rendered.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    try:
+        _prune_exports(keep=zip_path)
+    except OSError as e:
+        print(f"Export cleanup error: {e}")
+    
+    elapsed = time.perf_counter() - start
+    return {
+        'path': zip_path,
+        'reports': written,
+        'missing': missing,
+        'workers': workers,
+        'seconds': elapsed,
+        'reports_per_sec': written / elapsed if elapsed else 0.0,
+    }
+
+def _prune_exports(keep):
+    """Drop the oldest ZIP files in EXPORT_DIR once they exceed EXPORT_MAX_BYTES"""
+    if not os.path.isdir(EXPORT_DIR):
+        return
+    with _report_cache_lock:
+        entries = []
+        for entry in os.scandir(os.path.abspath(EXPORT_DIR)):
+            if entry.name.endswith('.zip'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= EXPORT_MAX_BYTES:
+                break
+            if path != os.path.abspath(keep):
+                os.remove(path)
+                total -= size
+
+def lazy_export(path):
+    """Callable for st.download_button that reads a finished export only when clicked"""
+    def read():
+        with open(path, 'rb') as f:
+            return f.read()
+    return read
@@ -0,0 +1,371 @@
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from db import execute_insert, execute_query, execute_query_df, execute_update, executemany, transaction
+from migrations import SLOT_MINUTES, SLOTS_PER_HALF_DAY
+from utils import normalize_room_name
+
+# =============================================
+# ROOM OCCUPANCY
+# =============================================
+# room_occupancy_hourly holds merged occupied minutes per room, day and hour.
+# Triggers (migration 8, keyed by room id since migration 13) mark the
+# (room, day) pairs whose bookings changed and refresh_room_occupancy
+# recomputes only those days before a read.
+OPEN_HOUR = int(os.environ.get('FM_OPEN_HOUR', 8))
+CLOSE_HOUR = int(os.environ.get('FM_CLOSE_HOUR', 18))
+
+# Monday is 0; rooms are not expected to be used at weekends by default
+OPEN_WEEKDAYS = tuple(int(day) for day in os.environ.get('FM_OPEN_WEEKDAYS', '0,1,2,3,4').split(','))
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+MINUTES_PER_DAY = 24 * 60
+
+def _minutes(times):
+    """'HH:MM' strings as minutes after midnight"""
+    times = times.astype(str)
+    return times.str[:2].astype(int) * 60 + times.str[3:5].astype(int)
+
+def merge_intervals(keys, starts, ends):
+    """Union of [start, end) intervals within each key.
+    
+    Returns (index of each merged interval's first source row, start, end),
+    ordered by key and start. Overlapping and touching intervals are merged.
+    """
+    starts = np.asarray(starts)
+    ends = np.asarray(ends)
+    if len(starts) == 0:
+        return np.array([], dtype=int), starts, ends
+    
+    codes = pd.factorize(pd.Series(keys))[0]
+    order = np.lexsort((starts, codes))
+    codes, starts, ends = codes[order], starts[order], ends[order]
+    
+    # Furthest end seen so far within the key, up to the previous interval
+    reach = pd.Series(ends).groupby(codes).cummax().to_numpy()
+    new_key = np.r_[True, codes[1:] != codes[:-1]]
+    opens = new_key | (starts > np.r_[-1, reach[:-1]])
+    
+    first = np.flatnonzero(opens)
+    return order[first], starts[first], np.maximum.reduceat(ends, first)
+
+def hourly_minutes(starts, ends):
+    """Minutes of each [start, end) interval falling in each hour of the day, shape (n, 24)"""
+    hour_start = np.arange(24) * 60
+    overlap = np.minimum(np.asarray(ends)[:, None], hour_start + 60) - np.maximum(np.asarray(starts)[:, None], hour_start)
+    return np.clip(overlap, 0, 60)
+
+def _occupancy_rows(bookings):
+    """(room_id, booking_date, hour, occupied_minutes) rows for the bookings"""
+    if bookings.empty:
+        return []
+    
+    starts = _minutes(bookings['start_time']).clip(0, MINUTES_PER_DAY).to_numpy()
+    ends = _minutes(bookings['end_time']).clip(0, MINUTES_PER_DAY).to_numpy()
+    valid = ends > starts
+    bookings, starts, ends = bookings[valid], starts[valid], ends[valid]
+    
+    keys = bookings['room_id'].astype(str) + '\x00' + bookings['booking_date'].astype(str)
+    first, starts, ends = merge_intervals(keys.to_numpy(), starts, ends)
+    days = bookings.iloc[first][['room_id', 'booking_date']].reset_index(drop=True)
+    minutes = pd.DataFrame(hourly_minutes(starts, ends)).groupby([days['room_id'], days['booking_date']]).sum()
+    
+    hourly = minutes.stack()
+    hourly = hourly[hourly > 0]
+    return [(int(room), day, int(hour), int(occupied)) for (room, day, hour), occupied in hourly.items()]
+
+def refresh_room_occupancy():
+    """Recompute hourly occupancy for the room days whose bookings changed"""
+    if not execute_query('SELECT 1 FROM room_occupancy_dirty LIMIT 1'):
+        return 0
+    
+    with transaction():
+        bookings = execute_query_df('''
+            SELECT b.room_id, b.booking_date, b.start_time, b.end_time
+            FROM room_occupancy_dirty d
+            JOIN room_bookings b ON b.room_id = d.room_id AND b.booking_date = d.booking_date
+            WHERE b.status != 'Cancelled'
+        ''')
+        rows = _occupancy_rows(bookings)
+        
+        execute_update('''
+            DELETE FROM room_occupancy_hourly
+            WHERE (room_id, booking_date) IN (SELECT room_id, booking_date FROM room_occupancy_dirty)
+        ''')
+        executemany(
+            'INSERT INTO room_occupancy_hourly (room_id, booking_date, hour, occupied_minutes) VALUES (?, ?, ?, ?)',
+            rows
+        )
+        dirty = execute_query('SELECT COUNT(*) as count FROM room_occupancy_dirty')
+        execute_update('DELETE FROM room_occupancy_dirty')
+    return dirty[0]['count'] if dirty else 0
+
+def _open_days(start_date, end_date, weekdays):
+    days = pd.date_range(start_date, end_date, freq='D')
+    return days[days.weekday.isin(weekdays)]
+
+def get_room_utilization(start_date, end_date, open_hour=OPEN_HOUR, close_hour=CLOSE_HOUR,
+                         weekdays=OPEN_WEEKDAYS):
+    """Occupancy of every registered room against opening hours for start_date..end_date.
+    
+    Returns a dict of:
+      'overall'    - share of all open room-minutes that were occupied (0-100)
+      'by_room'    - DataFrame of occupied hours, open hours, utilization and seat fill
+                     (attendees as a share of capacity while booked) per room
+      'by_weekday' - rooms x weekday utilization (%)
+      'by_hour'    - rooms x hour-of-day occupancy (%) over open days
+    """
+    try:
+        refresh_room_occupancy()
+    except sqlite3.Error as e:
+        # Serve the stored occupancy; the dirty days are retried next read
+        print(f"Occupancy refresh error: {e}")
+    
+    date_range = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    # Bookable rooms, plus retired ones that were still booked in the range
+    rooms = execute_query('''
+        SELECT id, room_name, capacity FROM rooms
+        WHERE active = 1 OR id IN (SELECT room_id FROM room_occupancy_hourly WHERE booking_date BETWEEN ? AND ?)
+        ORDER BY room_name
+    ''', date_range)
+    room_ids = [room['id'] for room in rooms]
+    room_names = [room['room_name'] for room in rooms]
+    open_days = _open_days(start_date, end_date, weekdays)
+    hours = list(range(open_hour, close_hour))
+    open_weekdays = [day for day in range(7) if day in weekdays]
+    
+    occupancy = execute_query_df('''
+        SELECT room_id, booking_date, hour, occupied_minutes
+        FROM room_occupancy_hourly
+        WHERE booking_date BETWEEN ? AND ? AND hour >= ? AND hour < ?
+    ''', date_range + (open_hour, close_hour),
+        dtypes={'booking_date': 'datetime64[ns]', 'occupied_minutes': 'float64'})
+    occupancy = occupancy.assign(weekday=occupancy['booking_date'].dt.weekday)
+    occupancy = occupancy[occupancy['weekday'].isin(weekdays)]
+    
+    # Attendees against capacity, weighted by booked minutes, over bookings that recorded a headcount
+    seats = {row['room_id']: row for row in execute_query('''
+        SELECT room_id,
+               SUM(attendees_count * (end_minute - start_minute)) AS seat_minutes,
+               SUM(end_minute - start_minute) AS booked_minutes
+        FROM room_bookings
+        WHERE booking_date BETWEEN ? AND ? AND status != 'Cancelled'
+        AND attendees_count IS NOT NULL AND end_minute > start_minute
+        GROUP BY room_id
+    ''', date_range)}
+    seat_fill = [
+        seats[room['id']]['seat_minutes'] / (seats[room['id']]['booked_minutes'] * room['capacity']) * 100
+        if room['id'] in seats and room['capacity'] else np.nan
+        for room in rooms
+    ]
+    
+    # Open minutes per room over the range, per weekday and per hour slot
+    minutes_per_day = 60 * len(hours)
+    weekday_days = pd.Series(open_days.weekday).value_counts().reindex(open_weekdays, fill_value=0)
+    
+    occupied = occupancy.groupby('room_id')['occupied_minutes'].sum().reindex(room_ids, fill_value=0)
+    open_minutes = minutes_per_day * len(open_days)
+    by_room = pd.DataFrame({
+        'room_id': room_ids,
+        'room_name': room_names,
+        'capacity': [room['capacity'] for room in rooms],
+        'occupied_hours': (occupied / 60).to_numpy(),
+        'open_hours': open_minutes / 60,
+        'utilization': (occupied / open_minutes * 100).to_numpy() if open_minutes else 0.0,
+        'seat_fill': seat_fill,
+    })
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        by_weekday = (
+            occupancy.pivot_table(index='room_id', columns='weekday', values='occupied_minutes', aggfunc='sum')
+            .reindex(index=room_ids, columns=open_weekdays).fillna(0)
+            / (weekday_days * minutes_per_day).replace(0, np.nan) * 100
+        )
+        by_hour = (
+            occupancy.pivot_table(index='room_id', columns='hour', values='occupied_minutes', aggfunc='sum')
+            .reindex(index=room_ids, columns=hours).fillna(0)
+            / (60 * len(open_days) or np.nan) * 100
+        )
+    by_weekday.columns = [WEEKDAY_NAMES[day] for day in by_weekday.columns]
+    by_weekday.index = by_hour.index = pd.Index(room_names, name='room_name')
+    
+    total_open = open_minutes * len(rooms)
+    return {
+        'overall': float(occupied.sum() / total_open * 100) if total_open else 0.0,
+        'by_room': by_room,
+        'by_weekday': by_weekday,
+        'by_hour': by_hour,
+    }
+
+# =============================================
+# ROOM BOOKINGS
+# =============================================
+# Two bookings of a room clash when each starts before the other ends, which
+# also catches a booking inside another and exact duplicates. The test runs on
+# the start_minute/end_minute columns through idx_bookings_room_slot
+# (migration 13), and the check and the insert share one BEGIN IMMEDIATE
+# transaction, so a second writer waits for the first booking to commit and
+# then sees it.
+CONFLICT_SQL = '''
+    SELECT id, room_name, booking_date, start_time, end_time, booked_by, purpose 
+    FROM room_bookings 
+    WHERE room_id = ? 
+    AND booking_date = ? 
+    AND start_minute < ? 
+    AND end_minute > ? 
+    AND status != 'Cancelled' 
+    ORDER BY start_minute
+'''
+
+def _slot_params(room_id, booking_date, start_time, end_time):
+    return (room_id, booking_date.strftime('%Y-%m-%d'),
+            end_time.hour * 60 + end_time.minute, start_time.hour * 60 + start_time.minute)
+
+def find_booking_conflicts(room_id, booking_date, start_time, end_time):
+    """Live bookings of room room_id on booking_date that overlap start_time..end_time"""
+    return execute_query(CONFLICT_SQL, _slot_params(room_id, booking_date, start_time, end_time))
+
+def book_room(room_id, booking_date, start_time, end_time, booked_by, purpose,
+              attendees_count=None, notes=None):
+    """Book a registered room unless the slot overlaps a live booking of the same room.
+    
+    Returns (new booking id, []) or (None, the conflicting bookings).
+    Database errors, including an unknown room_id, are raised and roll the
+    booking back; a failed check is never taken for an empty result.
+    """
+    with transaction():
+        room = execute_query('SELECT room_name, room_type FROM rooms WHERE id = ?', (room_id,))
+        if not room:
+            raise sqlite3.IntegrityError(f"Room {room_id} is not registered")
+        
+        conflicts = execute_query(CONFLICT_SQL, _slot_params(room_id, booking_date, start_time, end_time))
+        if conflicts:
+            return None, conflicts
+        
+        booking_id = execute_insert(
+            '''INSERT INTO room_bookings 
+            (room_id, room_name, room_type, booking_date, start_time, end_time,
+             booked_by, purpose, attendees_count, notes) 
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (room_id, room[0]['room_name'], room[0]['room_type'], booking_date.strftime('%Y-%m-%d'),
+             start_time.strftime('%H:%M'), end_time.strftime('%H:%M'),
+             booked_by, purpose, attendees_count, notes)
+        )
+    return booking_id, []
+
+# =============================================
+# ROOM AVAILABILITY
+# =============================================
+# room_slot_bitmaps (migration 12, keyed by room id since migration 13) marks
+# each room's busy 15-minute slots per day, kept current by triggers on
+# room_bookings. A room is free for a window when none of the window's slots
+# are set, so one query over the rooms registry answers a search. A quarter
+# hour touched by any booking counts as busy, so a window sharing a slot with a
+# booking is reported as taken; book_room still makes the exact check. Rooms
+# whose capacity is not known yet only match searches without a minimum.
+AVAILABILITY_SQL = '''
+    SELECT r.id, r.room_name, r.room_type, r.capacity, r.floor, r.amenities 
+    FROM rooms r 
+    LEFT JOIN room_slot_bitmaps m ON m.booking_date = ? AND m.room_id = r.id 
+    WHERE r.active = 1 
+    AND (? IS NULL OR r.room_type = ?) 
+    AND COALESCE(r.capacity, 0) >= ? 
+    AND COALESCE(m.am_slots, 0) & ? = 0 
+    AND COALESCE(m.pm_slots, 0) & ? = 0 
+    ORDER BY r.capacity, r.room_name
+'''
+
+def slot_masks(start_minute, end_minute):
+    """(before noon, after noon) bitmaps of the 15-minute slots [start_minute, end_minute) touches"""
+    first = start_minute // SLOT_MINUTES
+    last = -(-end_minute // SLOT_MINUTES)
+    masks = []
+    for offset in (0, SLOTS_PER_HALF_DAY):
+        low = min(max(first - offset, 0), SLOTS_PER_HALF_DAY)
+        high = min(max(last - offset, low), SLOTS_PER_HALF_DAY)
+        masks.append((1 << high) - (1 << low))
+    return tuple(masks)
+
+def find_free_rooms(booking_date, start_time, end_time, min_capacity=0, room_type=None):
+    """Active rooms of room_type (any if None) seating min_capacity that are free for the window"""
+    am_mask, pm_mask = slot_masks(start_time.hour * 60 + start_time.minute, end_time.hour * 60 + end_time.minute)
+    return execute_query(AVAILABILITY_SQL, (booking_date.strftime('%Y-%m-%d'), room_type, room_type,
+                                            min_capacity, am_mask, pm_mask))
+
+# =============================================
+# ROOM REGISTRY
+# =============================================
+# Rooms are identified by id (migration 13). Names are unique ignoring case and
+# stored with whitespace collapsed; bookings keep a copy of the registered name
+# for display, so a rename updates both in one transaction.
+def get_rooms(active_only=True):
+    """The rooms registry, by name"""
+    query = 'SELECT * FROM rooms'
+    if active_only:
+        query += ' WHERE active = 1'
+    return execute_query(query + ' ORDER BY room_name')
+
+def save_room(room_id, room_name, room_type, capacity=None, floor=None, amenities=None, active=True):
+    """Register a room (room_id None) or update one, returning its id.
+    
+    A name already taken by another room, ignoring case, raises sqlite3.IntegrityError.
+    """
+    room_name = normalize_room_name(room_name)
+    with transaction():
+        if room_id is None:
+            room_id = execute_insert(
+                '''INSERT INTO rooms (room_name, room_type, capacity, floor, amenities, active) 
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                (room_name, room_type, capacity, floor, amenities, int(active))
+            )
+        else:
+            execute_update(
+                '''UPDATE rooms SET room_name = ?, room_type = ?, capacity = ?, floor = ?, amenities = ?, active = ? 
+                WHERE id = ?''',
+                (room_name, room_type, capacity, floor, amenities, int(active), room_id)
+            )
+            execute_update(
+                'UPDATE room_bookings SET room_name = ?, room_type = ? WHERE room_id = ? AND (room_name != ? OR room_type != ?)',
+                (room_name, room_type, room_id, room_name, room_type)
+            )
+    return room_id
+
+def merge_rooms(source_id, target_id):
+    """Move every booking of room source_id to target_id and drop source_id from the registry.
+    
+    For duplicate entries of one physical room. Refused when live bookings of
+    the two rooms overlap, since the merged room would be double-booked.
+    Returns (number of bookings moved, []) or (None, the overlapping pairs).
+    """
+    if source_id == target_id:
+        return 0, []
+    
+    with transaction():
+        target = execute_query('SELECT room_name, room_type FROM rooms WHERE id = ?', (target_id,))
+        if not target:
+            raise sqlite3.IntegrityError(f"Room {target_id} is not registered")
+        
+        clashes = execute_query('''
+            SELECT s.id, s.booking_date, s.start_time, s.end_time, s.booked_by, 
+                   t.id AS clash_id, t.start_time AS clash_start_time, t.end_time AS clash_end_time, 
+                   t.booked_by AS clash_booked_by 
+            FROM room_bookings s 
+            JOIN room_bookings t ON t.room_id = ? AND t.booking_date = s.booking_date 
+            AND t.start_minute < s.end_minute AND t.end_minute > s.start_minute AND t.status != 'Cancelled' 
+            WHERE s.room_id = ? AND s.status != 'Cancelled' 
+            ORDER BY s.booking_date, s.start_minute
+        ''', (target_id, source_id))
+        if clashes:
+            return None, clashes
+        
+        moved = execute_query('SELECT COUNT(*) as count FROM room_bookings WHERE room_id = ?', (source_id,))
+        execute_update(
+            'UPDATE room_bookings SET room_id = ?, room_name = ?, room_type = ? WHERE room_id = ?',
+            (target_id, target[0]['room_name'], target[0]['room_type'], source_id)
+        )
+        execute_update('DELETE FROM rooms WHERE id = ?', (source_id,))
+    return moved[0]['count'], []
@@ -0,0 +1,46 @@
+# =============================================
+# SAFE DATA ACCESS FUNCTIONS
+# =============================================
+def safe_get(data, key, default=None):
+    if not data or key not in data:
+        return default
+    return data.get(key, default)
+
+def safe_float(value, default=0.0):
+    try:
+        if value is None:
+            return default
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+def safe_str(value, default="N/A"):
+    if value is None:
+        return default
+    return str(value)
+
+def safe_int(value, default=0):
+    try:
+        if value is None:
+            return default
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+def format_ngn(amount):
+    return f"₦{safe_float(amount):,.2f}"
+
+def safe_bool(value, default=False):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value == 1
+    if isinstance(value, str):
+        return value.lower() in ['true', '1', 'yes', 'y']
+    return default
+
+def normalize_room_name(name):
+    """Room name with surrounding spaces trimmed and inner runs of whitespace collapsed"""
+    return ' '.join(str(name).split())